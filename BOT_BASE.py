@@ -1,3 +1,6 @@
+# BOT_BASE.py — прежняя однофайловая версия бота, main.py её не запускает.
+# Запросы к задачам в рабочей версии — repository.TaskRepository (SQL — в queries.py).
+
 import os  # для работы с переменными окружения и файловой системой
 import re  # модуль для работы с регулярными выражениями (не используется напрямую, но оставлен для потенциальных проверок)
 
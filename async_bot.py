@@ -0,0 +1,458 @@
+# async_bot.py
+
+import asyncio
+import hmac
+import re
+import signal
+from contextlib import contextmanager
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+from config import (
+    API_TOKEN, BOT_MODE,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+    ASYNC_MAX_UPDATES, ASYNC_MAX_PENDING, ASYNC_CHAT_PENDING,
+    TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST,
+    STATE_BACKEND, STATE_TTL, STATE_MAX_SIZE, STATE_CACHE_TTL,
+    REMINDERS_ENABLED, REMINDER_LEAD, REMINDER_HORIZON,
+    SWEEPER_ENABLED, SWEEPER_INTERVAL, SWEEPER_BATCH,
+    PERSISTENT_MENU,
+    KNOWN_USERS_MAX, KNOWN_USERS_BLOOM,
+    METRICS_PORT, METRICS_LISTEN,
+    ADMIN_IDS, PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_UPDATES, PROFILE_MAX_SECONDS,
+    QUERY_REPORT_TOP,
+)
+from db import Database
+from queries import PREPARED_STATEMENTS
+from repository import TaskRepository
+from parser import DeadlineParser
+from formatter import TaskFormatter
+from bot_utils import BotUI, ReplyKeyboardTracker
+from handlers.async_handlers import AsyncTaskHandler, AsyncCallbackHandler
+from dispatcher import update_chat_id
+from sender import AsyncRateLimitedBot
+from conversation import ConversationManager, MemoryStateStore, PostgresStateStore
+from reminders import ReminderScheduler
+from users import KnownUsers
+from sweeper import OverdueSweeper
+from metrics import Metrics, MetricsServer
+from profiler import SamplingProfiler
+
+
+class AsyncDispatchingTeleBot(AsyncTeleBot):
+    """
+    AsyncTeleBot с порядком обработки внутри чата: обновления одного чата
+    выполняются друг за другом (важно для шагов диалога), разных — параллельно.
+    Одновременно обрабатывается не больше max_updates обновлений, ждут своей
+    очереди — не больше max_pending всего и chat_pending в одном чате
+    (как ограниченные очереди ChatDispatcher в BotApp).
+      - dispatch(update)                       — поставить обновление без ожидания;
+                                                 False — места нет, обновление не принято
+      - process_new_updates(updates, block=True) — поставить обновления по порядку,
+                                                 дожидаясь места (polling)
+      - get_updates(...)                       — не читает новые обновления, пока места нет
+      - drain()                                — дождаться обработки всех поставленных
+      - pending / stats()                      — сколько обновлений ждёт, сколько отклонено
+    """
+
+    def __init__(self, token, max_updates=1000, max_pending=5000, chat_pending=32, **kwargs):
+        """
+        :param max_updates: сколько обновлений обрабатывать одновременно
+        :param max_pending: предел поставленных и ещё не обработанных обновлений
+        :param chat_pending: тот же предел для одного чата
+        """
+        super().__init__(token, **kwargs)
+        self.max_pending = max_pending
+        self.chat_pending = chat_pending
+        self._slots = asyncio.Semaphore(max_updates)
+        self._tails = {}      # chat_id → последняя задача чата
+        self._chats = {}      # chat_id → сколько обновлений чата поставлено
+        self._room = asyncio.Event()        # взводится, когда обновление обработано
+        self._intake = asyncio.Lock()       # пачки polling-а ставятся строго по очереди
+        self._waiting = 0     # получено polling-ом, ждёт места
+        self.pending = 0
+        self.rejected = 0
+
+    def _has_room(self, key=None):
+        """
+        key=None — есть ли место для новой пачки getUpdates (с учётом ждущих),
+        иначе — для ещё одного обновления чата key.
+        """
+        if key is None:
+            return self.pending + self._waiting < self.max_pending
+        return self.pending < self.max_pending and self._chats.get(key, 0) < self.chat_pending
+
+    async def _wait_room(self, key=None):
+        while not self._has_room(key):
+            self._room.clear()
+            await self._room.wait()
+
+    def _submit(self, key, update):
+        task = asyncio.get_running_loop().create_task(self._process_after(self._tails.get(key), update))
+        self._tails[key] = task
+        self._chats[key] = self._chats.get(key, 0) + 1
+        self.pending += 1
+        task.add_done_callback(lambda done, key=key: self._release(key, done))
+
+    def dispatch(self, update):
+        """
+        Webhook: поставить обновление, если есть место, иначе отказ (ответ 503 —
+        Telegram повторит доставку).
+        """
+        key = update_chat_id(update)
+        if not self._has_room(key):
+            self.rejected += 1
+            return False
+        self._submit(key, update)
+        return True
+
+    async def process_new_updates(self, updates, block=True):
+        """
+        :param block: ждать места (polling); False — лишние обновления отклоняются
+        :return: False, если какое-то обновление отклонено
+        """
+        if not block:
+            accepted = [self.dispatch(update) for update in updates]
+            return all(accepted)
+        left = len(updates)
+        self._waiting += left
+        try:
+            async with self._intake:
+                for update in updates:
+                    key = update_chat_id(update)
+                    await self._wait_room(key)
+                    self._submit(key, update)
+                    self._waiting -= 1
+                    left -= 1
+        finally:
+            # Отменённая пачка (остановка бота) не должна держать место
+            self._waiting -= left
+        return True
+
+    async def get_updates(self, *args, **kwargs):
+        # polling: новые обновления читаются, только когда для них есть место
+        await self._wait_room()
+        return await super().get_updates(*args, **kwargs)
+
+    def _release(self, key, task):
+        self.pending -= 1
+        left = self._chats[key] - 1
+        if left:
+            self._chats[key] = left
+        else:
+            del self._chats[key]
+        if self._tails.get(key) is task:
+            del self._tails[key]
+        self._room.set()
+
+    def stats(self):
+        return {'pending': self.pending, 'waiting': self._waiting, 'chats': len(self._chats),
+                'rejected': self.rejected}
+
+    async def _process_after(self, previous, update):
+        if previous is not None:
+            await asyncio.wait([previous])
+        async with self._slots:
+            try:
+                await super().process_new_updates([update])
+            except Exception as e:
+                print(f"Ошибка в обработчике обновления: {e}")
+
+    async def drain(self):
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+class AsyncBotApp:
+    """
+    TaskMaster Bot в asyncio-режиме (BOT_RUNTIME=asyncio): AsyncTeleBot,
+    асинхронные обработчики и пул psycopg 3. Разбор дедлайнов, форматирование,
+    клавиатуры и шаги диалогов — те же объекты, что у BotApp; напоминания и
+    пометка просроченных задач работают в своих потоках на синхронном пуле.
+    Метрики (/metrics, /queries), /profile и SIGUSR1 — как у BotApp.
+    """
+
+    def __init__(self, mode=BOT_MODE):
+        if not API_TOKEN:
+            raise RuntimeError("API_TOKEN не задан в окружении")
+        if mode not in ('polling', 'webhook'):
+            raise RuntimeError(f"Неизвестный режим BOT_MODE: {mode}")
+        self.mode = mode
+        self.bot = AsyncDispatchingTeleBot(
+            API_TOKEN, max_updates=ASYNC_MAX_UPDATES,
+            max_pending=ASYNC_MAX_PENDING, chat_pending=ASYNC_CHAT_PENDING,
+        )
+
+        # Метрики обработчиков (/metrics) — только если задан METRICS_PORT
+        self.metrics = Metrics() if METRICS_PORT else None
+        # Профилирование по запросу (/profile, SIGUSR1); выключенное ничего не стоит
+        self.profiler = SamplingProfiler(
+            PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000, max_seconds=PROFILE_MAX_SECONDS
+        )
+
+        # Лимиты Telegram и порядок отправки внутри чата — без потоков-отправителей
+        self.keyboards = ReplyKeyboardTracker() if PERSISTENT_MENU else None
+        self.api = AsyncRateLimitedBot(
+            self.bot,
+            global_rate=TG_GLOBAL_RATE,
+            chat_rate=TG_CHAT_RATE,
+            chat_burst=TG_CHAT_BURST,
+            keyboards=self.keyboards,
+            observer=self.metrics.observe_api if self.metrics else None,
+        )
+
+        self.db = Database()
+        if self.db.statements is not None:
+            # В asyncio-режиме TaskRepository готовит эти запросы через execute(prepare=True)
+            self.db.statements.register_all(PREPARED_STATEMENTS)
+            self.db.statements.register_all(TaskRepository.page_statements())
+        if self.metrics:
+            # Время запросов обоих пулов: асинхронного (обработчики) и синхронного (фоновые задачи)
+            self.db.observer = self.metrics.observe_db
+        self.parser = DeadlineParser()
+        self.formatter = TaskFormatter()
+        self.ui = BotUI(self.api, self.keyboards)
+
+        if STATE_BACKEND == 'postgres':
+            store = PostgresStateStore(
+                self.db, ttl=STATE_TTL, cache_ttl=STATE_CACHE_TTL, cache_size=STATE_MAX_SIZE
+            )
+        else:
+            store = MemoryStateStore(max_size=STATE_MAX_SIZE, ttl=STATE_TTL)
+        self.conversation = ConversationManager(store)
+
+        self.reminders = None
+        if REMINDERS_ENABLED:
+            self.reminders = ReminderScheduler(
+                self.db, self.api, self.formatter, lead=REMINDER_LEAD, horizon=REMINDER_HORIZON
+            )
+
+        self.sweeper = None
+        if SWEEPER_ENABLED:
+            self.sweeper = OverdueSweeper(self.db, batch_size=SWEEPER_BATCH, interval=SWEEPER_INTERVAL)
+
+        # Пользователи, которых уже записали в users (регистрация — один раз на процесс)
+        self.users = KnownUsers(KNOWN_USERS_MAX, bloom_capacity=KNOWN_USERS_BLOOM)
+
+        # Один TaskRepository на все обработчики: SQL, транзакции и разбор строк
+        self.repo = TaskRepository(self.db)
+        self.task_handler = AsyncTaskHandler(
+            self.api, self.db, self.parser, self.formatter, self.ui,
+            self.conversation, self.reminders, self.users, repo=self.repo
+        )
+        self.callback_handler = AsyncCallbackHandler(
+            self.api, self.db, self.parser, self.formatter, self.ui,
+            self.conversation, self.reminders, repo=self.repo
+        )
+
+        self._register_handlers()
+        if self.metrics:
+            self._register_gauges()
+
+    @contextmanager
+    def _track(self, name):
+        """
+        Как BotApp._track: контекст задачи asyncio свой у каждого обновления,
+        поэтому время БД и Bot API относится к своему обработчику.
+        """
+        with self.api.handler_scope(name):
+            if self.metrics is None:
+                yield
+            else:
+                with self.metrics.track(name):
+                    yield
+
+    async def _call(self, name, handler, *args):
+        with self._track(name):
+            return await self.profiler.run_async(name, handler, *args)
+
+    def _scoped(self, name, handler):
+        async def wrapper(update):
+            return await self._call(name, handler, update)
+        return wrapper
+
+    async def _dispatch_step(self, message):
+        state = getattr(message, 'conversation_state', None)
+        name = state[0] if state else 'conversation'
+        await self._call(name, self.conversation.dispatch_async, message)
+
+    async def _on_callback(self, call):
+        await self._call(call.data.split('_', 1)[0], self.callback_handler.handle_task_action, call)
+
+    async def _profile_command(self, message):
+        """
+        /profile [N | Ns | stop] — как у BotApp. Только для ADMIN_IDS.
+        """
+        chat_id = message.chat.id
+
+        def notify(path, samples, count):
+            # Из потока-сэмплера: queue_message передаст отправку в цикл бота
+            self.api.queue_message(chat_id, f"📊 Профиль записан: {path}\nСэмплов: {samples}, обновлений: {count}")
+
+        reply = self.profiler.command(message.text, PROFILE_UPDATES, notify)
+        if reply:
+            await self.api.send_message(chat_id, reply)
+
+    def _register_gauges(self):
+        """
+        Текущие значения, которые читаются только при запросе /metrics
+        (из потока MetricsServer: только чтение счётчиков).
+        """
+        self.metrics.gauge('active_conversations', "Незавершённые пошаговые диалоги",
+                           self.conversation.active_count)
+        self.metrics.gauge('dispatch_queue_depth', "Обновления, ожидающие обработки",
+                           lambda: self.bot.pending)
+        self.metrics.gauge('dispatch_rejected', "Обновления, отклонённые из-за переполнения (503)",
+                           lambda: self.bot.rejected)
+        self.metrics.gauge('send_queue_depth', "Исходящие вызовы, ожидающие отправки",
+                           lambda: self._send_queue_depth())
+        if self.sweeper is not None:
+            self.sweeper.register_gauges(self.metrics)
+        self.metrics.gauge('db_pool_in_use', "Выданные соединения асинхронного пула БД",
+                           lambda: self._async_pool_in_use())
+
+    def _send_queue_depth(self):
+        stats = self.api.sender_stats()
+        return stats['submitted'] - stats['sent'] - stats['failed']
+
+    def _async_pool_in_use(self):
+        stats = self.db.async_pool_stats()
+        if 'pool_size' not in stats:
+            return None
+        return stats['pool_size'] - stats.get('pool_available', 0)
+
+    def _register_handlers(self):
+        """
+        Те же команды и callback-запросы, что у BotApp.
+        """
+        if ADMIN_IDS:
+            self.bot.register_message_handler(
+                self._scoped('profile', self._profile_command),
+                commands=['profile'],
+                func=lambda m: m.from_user.id in ADMIN_IDS
+            )
+        self.bot.register_message_handler(
+            self._dispatch_step,
+            func=self.conversation.has_state_async,
+            content_types=['text']
+        )
+        self.bot.register_message_handler(
+            self._scoped('start', self.task_handler.send_welcome), commands=['start']
+        )
+        self.bot.register_message_handler(
+            self._scoped('newtask', self.task_handler.new_task), commands=['newtask']
+        )
+        self.bot.register_message_handler(
+            self._scoped('mytasks', self.task_handler.show_tasks), commands=['mytasks']
+        )
+        self.bot.register_callback_query_handler(
+            self._on_callback,
+            func=lambda c: bool(re.match(r'^(complete|delete|reschedule|edit|open)_\d+$', c.data))
+        )
+        self.bot.register_callback_query_handler(
+            self._scoped('page', self.task_handler.handle_page_callback),
+            func=lambda c: c.data.startswith('pg:')
+        )
+
+    def process_update(self, update_json):
+        """
+        Ставит одно обновление (dict из webhook-а) в очередь чата.
+        :return: False, если места нет — webhook ответит 503
+        """
+        update = types.Update.de_json(update_json)
+        return self.bot.dispatch(update)
+
+    async def run(self):
+        """
+        Инициализация БД, открытие асинхронного пула и запуск polling или webhook.
+        """
+        try:
+            self.db.init_db()
+        except Exception as e:
+            print(f"Ошибка при инициализации БД: {e}")
+        await self.db.open_async()
+
+        # Напоминания отправляются из своего потока через цикл событий бота
+        self.api.attach(asyncio.get_running_loop())
+        if self.reminders:
+            self.reminders.start()
+        if self.sweeper:
+            self.sweeper.start()
+        # Сигнал для профилирования без доступа к чату (нет на Windows)
+        if hasattr(signal, 'SIGUSR1'):
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGUSR1, self.profiler.toggle, PROFILE_UPDATES
+            )
+        metrics_server = None
+        if self.metrics:
+            metrics_server = MetricsServer(
+                self.metrics, host=METRICS_LISTEN, port=METRICS_PORT,
+                pages={'/queries': lambda: self.db.query_report(QUERY_REPORT_TOP)},
+            )
+            metrics_server.start()
+            print(f"Метрики: http://{METRICS_LISTEN}:{METRICS_PORT}/metrics")
+
+        try:
+            await self.bot.delete_webhook()
+            if self.mode == 'webhook':
+                await self._run_webhook()
+            else:
+                print("Database initialized. Starting async bot polling...")
+                await self.bot.infinity_polling()
+        finally:
+            if self.reminders:
+                self.reminders.stop()
+            if self.sweeper:
+                self.sweeper.stop()
+            if metrics_server:
+                metrics_server.shutdown()
+            if self.profiler.active:
+                self.profiler.stop(timeout=5)
+            await self.bot.drain()
+            print(f"Исходящие вызовы по обработчикам: {self.api.stats()}, главное меню: {self.ui.stats()}, "
+                  f"регистрации: {self.users.stats()}, обновления: {self.bot.stats()}")
+            if self.db.query_log is not None:
+                print(f"Запросы к БД по суммарному времени:\n{self.db.query_report(QUERY_REPORT_TOP)}")
+            await self.bot.close_session()
+            await self.db.close_async()
+            self.db.close()
+
+    async def _run_webhook(self):
+        """
+        Webhook на aiohttp (он уже нужен AsyncTeleBot): 200, как только обновление поставлено
+        в очередь чата, 503 — если места нет (Telegram повторит доставку).
+        """
+        from aiohttp import web
+
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL не задан в окружении")
+
+        async def handle(request):
+            if WEBHOOK_SECRET:
+                got = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+                if not hmac.compare_digest(got, WEBHOOK_SECRET):
+                    return web.Response(status=403)
+            try:
+                update_json = await request.json()
+            except ValueError:
+                return web.Response(status=400)
+            if not self.process_update(update_json):
+                return web.Response(status=503)
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+        await self.bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None)
+
+        print(f"Database initialized. Listening for webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}...")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(AsyncBotApp().run())
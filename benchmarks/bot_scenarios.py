@@ -0,0 +1,262 @@
+# benchmarks/bot_scenarios.py
+"""
+Сквозной бенчмарк бота: обновления Telegram проходят весь путь BotApp —
+TeleBot, ChatDispatcher, ConversationManager, TaskHandler / CallbackHandler,
+RateLimitedBot и OutboundSender — до Bot API и БД, заменённых заглушками
+внутри процесса (benchmarks/fake_bot_api.py и benchmarks/memory_db.py).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bot_scenarios --users 20 --rounds 3 --api-ms 30 --db-ms 2 --rate-limit 0.01
+
+Сценарии (каждый пользователь — свой чат, пользователи работают одновременно):
+  create    — /newtask и шесть шагов диалога
+  list_500  — /mytasks, «📋 Все задачи» и листание до конца списка из 500 задач
+  edit      — кнопка «Редактировать» и шесть шагов диалога
+  complete  — кнопка «Завершить» под карточкой задачи
+Для каждого сценария выводятся p50/p95/p99 времени обработки одного обновления
+(до возврата из обработчика, без фоновой отправки «Главного меню»), а также
+обмены с БД и вызовы Bot API на один прогон сценария. Лимиты Telegram на чат
+по умолчанию сняты (TG_CHAT_RATE): в тесте шаги диалога идут без пауз на ввод.
+Если обработчик сообщил пользователю об ошибке (❌), скрипт завершается с кодом 1.
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import threading
+import time
+
+# Настройки бота читаются при импорте config — задаём их до импорта BotApp
+os.environ.setdefault('API_TOKEN', '123456:BENCHMARK')
+os.environ.setdefault('TG_GLOBAL_RATE', '10000')
+os.environ.setdefault('TG_CHAT_RATE', '1000')
+os.environ.setdefault('TG_CHAT_BURST', '100')
+os.environ['STATE_BACKEND'] = 'memory'
+os.environ['SWEEPER_ENABLED'] = '0'
+
+
+from bot import BotApp
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.memory_db import MemoryDatabase
+
+
+FIRST_CHAT = 1000
+
+
+class Client:
+    """
+    Пользователь в своём чате: отправляет сообщения и нажимает кнопки
+    и ждёт, пока бот обработает обновление.
+    """
+
+    _update_ids = itertools.count(1)
+
+    def __init__(self, app, api, chat_id):
+        self.app = app
+        self.api = api
+        self.chat_id = chat_id
+        self.user = {'id': chat_id, 'is_bot': False, 'first_name': 'Bench', 'username': f'user{chat_id}'}
+        self.latencies = []
+
+    def _message(self, text, message_id=None):
+        return {
+            'message_id': message_id or next(self._update_ids),
+            'date': int(time.time()),
+            'chat': {'id': self.chat_id, 'type': 'private'},
+            'from': self.user,
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+            if text.startswith('/') else [],
+        }
+
+    def _process(self, update_json):
+        # Очередь чата в ChatDispatcher выполняется по порядку: задание после
+        # обновления завершится, когда обработчик вернёт управление
+        done = threading.Event()
+        started = time.perf_counter()
+        self.app.process_update(update_json)
+        self.app.dispatcher.submit(self.chat_id, done.set, block=True)
+        done.wait()
+        self.latencies.append(time.perf_counter() - started)
+
+    def send(self, text):
+        self._process({'update_id': next(self._update_ids), 'message': self._message(text)})
+
+    def press(self, data, message_id):
+        self._process({
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._update_ids)),
+                'from': self.user,
+                'message': self._message('', message_id),
+                'chat_instance': str(self.chat_id),
+                'data': data,
+            },
+        })
+
+    def next_page(self):
+        """
+        callback_data кнопки «вперёд» последнего списка и id сообщения или None.
+        """
+        message_id, keyboard = self.api.last_inline(self.chat_id)
+        for button in keyboard[-1]:
+            if button['callback_data'].startswith('pg:') and ':n:' in button['callback_data']:
+                return button['callback_data'], message_id
+        return None
+
+
+def create(client, db, api):
+    client.send('/newtask')
+    for text in ('Подготовить отчёт', 'Квартальный отчёт для руководства', '🔴 Высокий',
+                 'Работа', 'важное, отчёты', 'завтра 18:00'):
+        client.send(text)
+
+
+def list_500(client, db, api):
+    client.send('/mytasks')
+    client.send('📋 Все задачи')
+    pages = 1
+    while True:
+        page = client.next_page()
+        if page is None:
+            break
+        client.press(*page)
+        pages += 1
+    return pages
+
+
+def edit(client, db, api):
+    task_id = db.seed(client.chat_id, 1)[0]
+    message_id = api.add_message(client.chat_id, 'Карточка', client.app.ui.create_task_actions_markup(task_id))
+    client.press(f'edit_{task_id}', message_id)
+    for text in ('Новое название', '/skip', '🟢 Низкий', 'Дом', 'дом, выходные', 'через 2 дня'):
+        client.send(text)
+
+
+def complete(client, db, api):
+    task_id = db.seed(client.chat_id, 1)[0]
+    message_id = api.add_message(client.chat_id, 'Карточка', client.app.ui.create_task_actions_markup(task_id))
+    client.press(f'complete_{task_id}', message_id)
+
+
+SCENARIOS = {
+    'create': create,
+    'list_500': list_500,
+    'edit': edit,
+    'complete': complete,
+}
+
+
+def wait_sender_idle(sender):
+    """
+    Ждёт, пока OutboundSender отправит всё поставленное (в т.ч. «Главное меню»).
+    """
+    while True:
+        stats = sender.stats()
+        if not any(stats['queued']) and not stats['in_flight'] \
+                and stats['sent'] + stats['failed'] >= stats['submitted']:
+            return
+        time.sleep(0.001)
+
+
+def percentiles(latencies):
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return q[49], q[94], q[98]
+
+
+def run_scenario(app, db, api, clients, scenario, rounds):
+    """
+    Все клиенты одновременно выполняют сценарий rounds раз.
+    """
+    for client in clients:
+        client.latencies = []
+    wait_sender_idle(app.sender)
+    db.reset_stats()
+    api.reset_stats()
+    retries_before = app.sender.stats()['retries_429']
+
+    def worker(client):
+        for _ in range(rounds):
+            scenario(client, db, api)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wait_sender_idle(app.sender)
+    elapsed = time.perf_counter() - started
+
+    runs = len(clients) * rounds
+    latencies = [lat for c in clients for lat in c.latencies]
+    api_stats = api.stats()
+    return {
+        'runs': runs,
+        'updates': len(latencies),
+        'elapsed': elapsed,
+        'latency': percentiles(latencies),
+        'db_round_trips': db.stats()['round_trips'] / runs,
+        'db_statements': {k: v / runs for k, v in db.stats()['statements'].items()},
+        'api_calls': sum(api_stats['calls'].values()) / runs,
+        'api_methods': {k: v / runs for k, v in api_stats['calls'].items()},
+        'rate_limited': api_stats['rate_limited'],
+        'retries_429': app.sender.stats()['retries_429'] - retries_before,
+        'errors': api_stats['errors'],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--scenarios', default=','.join(SCENARIOS), help='сценарии через запятую')
+    ap.add_argument('--users', type=int, default=20, help='одновременных пользователей (чатов)')
+    ap.add_argument('--rounds', type=int, default=3, help='прогонов сценария на пользователя')
+    ap.add_argument('--tasks', type=int, default=500, help='задач у пользователя для list_500')
+    ap.add_argument('--api-ms', type=float, default=30.0, help='задержка вызова Bot API')
+    ap.add_argument('--db-ms', type=float, default=2.0, help='задержка обмена с БД')
+    ap.add_argument('--pool', type=int, default=10, help='соединений с БД')
+    ap.add_argument('--rate-limit', type=float, default=0.0, help='доля вызовов Bot API с ответом 429')
+    ap.add_argument('--retry-after', type=int, default=1, help='retry_after в ответе 429, секунд')
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+
+    api = FakeBotAPI(args.api_ms / 1000, args.rate_limit, args.retry_after, seed=args.seed)
+    api.install()
+    db = MemoryDatabase(args.db_ms / 1000, args.pool)
+    app = BotApp(db=db)
+
+    clients = [Client(app, api, FIRST_CHAT + i) for i in range(args.users)]
+    for client in clients:
+        db.seed(client.chat_id, args.tasks)
+
+    errors = 0
+    try:
+        print(
+            f"{'сценарий':<10} {'прогонов':>8} {'обновл.':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} "
+            f"{'БД/прогон':>10} {'API/прогон':>11} {'429':>5}"
+        )
+        for name in args.scenarios.split(','):
+            result = run_scenario(app, db, api, clients, SCENARIOS[name], args.rounds)
+            p50, p95, p99 = result['latency']
+            print(
+                f"{name:<10} {result['runs']:>8} {result['updates']:>8} "
+                f"{p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {p99 * 1000:>9.1f} "
+                f"{result['db_round_trips']:>10.1f} {result['api_calls']:>11.1f} {result['rate_limited']:>5}"
+            )
+            methods = ', '.join(f"{k} {v:.1f}" for k, v in sorted(result['api_methods'].items()))
+            statements = ', '.join(f"{k} {v:.1f}" for k, v in sorted(result['db_statements'].items()))
+            print(f"{'':<12}API: {methods}")
+            print(f"{'':<12}SQL: {statements}")
+            errors += result['errors']
+    finally:
+        app.dispatcher.stop()
+        app.sender.stop()
+        api.uninstall()
+
+    if errors:
+        raise SystemExit(f"Обработчики сообщили об ошибках: {errors}")
+
+
+if __name__ == '__main__':
+    main()
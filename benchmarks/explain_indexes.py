@@ -0,0 +1,130 @@
+# benchmarks/explain_indexes.py
+"""
+Проверка планов: каждый запрос списков из обработчиков должен идти по индексу,
+а не последовательным сканированием tasks.
+
+Запуск из корня репозитория (нужна доступная PostgreSQL из .env):
+    python -m benchmarks.explain_indexes --users 200 --tasks-per-user 100
+
+Скрипт создаёт схему (Database.init_db), в отдельной транзакции наполняет
+tasks синтетическими данными, выполняет ANALYZE и EXPLAIN для каждого
+запроса, а в конце откатывает транзакцию. Код возврата 1 — если хоть один
+запрос получил Seq Scan по tasks.
+"""
+
+import argparse
+import json
+import sys
+
+from db import Database
+from queries import FILTER_WHERE, CATEGORIES_SQL, TASK_BY_ID_SQL, USER_TASK_SQL
+from repository import TaskRepository
+from sweeper import SWEEP_BATCH_SQL
+
+
+def plan_scans(plan):
+    """
+    Все узлы сканирования плана: [(тип узла, таблица, индекс)].
+    """
+    scans = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if 'Relation Name' in node or 'Index Name' in node:
+            scans.append((node['Node Type'], node.get('Relation Name'), node.get('Index Name')))
+        stack.extend(node.get('Plans', []))
+    return scans
+
+
+def handler_queries(user_id):
+    """
+    (название, sql, параметры) для запросов, которые выполняют обработчики.
+    """
+    queries = []
+    for key, (title, where) in FILTER_WHERE.items():
+        sql, args = TaskRepository.build_page_query(user_id, where)
+        queries.append((f"список {key} ({title})", sql, args))
+        sql, args = TaskRepository.build_page_query(user_id, where, cursor=(2, 'infinity', 10**9))
+        queries.append((f"список {key}, след. страница", sql, args))
+
+    sql, args = TaskRepository.build_page_query(user_id, "category = %s", ('cat3',))
+    queries.append(("список по категории", sql, args))
+    sql, args = TaskRepository.build_page_query(user_id, "tags @> ARRAY[%s]::varchar(255)[]", ('tag7',))
+    queries.append(("список по тегу", sql, args))
+
+    queries.append(("категории", CATEGORIES_SQL, [user_id, 100]))
+    queries.append(("задача по id", TASK_BY_ID_SQL, [1]))
+    queries.append(("задача пользователя по id", USER_TASK_SQL, [1, user_id]))
+    queries.append(("порция OverdueSweeper", SWEEP_BATCH_SQL, [500]))
+    return queries
+
+
+def seed(cur, users, per_user):
+    """
+    Синтетические данные: разные приоритеты, статусы, дедлайны, категории и теги.
+    """
+    cur.execute(
+        """
+        INSERT INTO users (user_id, username)
+        SELECT u, 'bench' || u FROM generate_series(1, %s) AS u
+        ON CONFLICT (user_id) DO NOTHING
+        """,
+        (users,)
+    )
+    cur.execute(
+        """
+        INSERT INTO tasks (user_id, title, priority, category, tags, deadline, status)
+        SELECT
+            1 + (i %% %s),
+            'task ' || i,
+            (ARRAY['high', 'medium', 'low'])[1 + i %% 3],
+            'cat' || (i %% 10),
+            ARRAY['tag' || (i %% 17), 'tag' || (i %% 5)]::varchar(255)[],
+            CASE WHEN i %% 7 = 0 THEN NULL ELSE NOW() + ((i %% 200) - 50) * INTERVAL '1 day' END,
+            (ARRAY['active', 'active', 'overdue', 'completed'])[1 + i %% 4]
+        FROM generate_series(1, %s) AS i
+        """,
+        (users, users * per_user)
+    )
+    cur.execute("ANALYZE tasks;")
+    cur.execute("ANALYZE users;")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--users', type=int, default=200)
+    ap.add_argument('--tasks-per-user', type=int, default=100)
+    args = ap.parse_args()
+
+    db = Database()
+    db.init_db()
+
+    failed = 0
+    conn = db.get_db_connection()
+    try:
+        cur = conn.cursor()
+        seed(cur, args.users, args.tasks_per_user)
+
+        for name, sql, params in handler_queries(user_id=1):
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans = [s for s in plan_scans(plan[0]['Plan']) if s[1] in (None, 'tasks')]
+            seq = [s for s in scans if s[0] == 'Seq Scan']
+            status = 'FAIL' if seq or not scans else 'ok'
+            failed += status == 'FAIL'
+            used = ', '.join(f"{t}{' ' + i if i else ''}" for t, _, i in scans) or '—'
+            print(f"[{status:>4}] {name}: {used}")
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+        db.close()
+
+    print(f"\n{'Все запросы идут по индексам.' if not failed else f'Запросов без индекса: {failed}'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# benchmarks/fake_bot_api.py
+
+import collections
+import itertools
+import json
+import random
+import threading
+import time
+
+from telebot import apihelper
+
+
+class _Response:
+    """
+    Ответ HTTP в объёме, который читает apihelper._check_result.
+    """
+
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self.reason = 'OK' if status_code == 200 else 'Error'
+        self.text = json.dumps(payload, ensure_ascii=False)
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeBotAPI:
+    """
+    Bot API внутри процесса — подменяет HTTP-запросы telebot
+    (apihelper.CUSTOM_REQUEST_SENDER), поэтому TeleBot, OutboundSender
+    и обработчики работают как с настоящим Telegram:
+      - каждый вызов ждёт latency секунд и записывается по имени метода
+      - с вероятностью rate_limit отвечает 429 с retry_after
+      - сообщения получают message_id; повторная правка тем же текстом —
+        400 «message is not modified», как у Telegram
+      - install() / uninstall() — подключить / вернуть прежний отправитель
+      - stats() / reset_stats() — вызовы по методам, ответы 429, сообщения об ошибках (❌)
+      - add_message(chat_id, text, markup) → message_id — сообщение, уже отправленное в чат
+      - last_inline(chat_id) → (message_id, inline-клавиатура) последнего сообщения с кнопками
+    """
+
+    def __init__(self, latency=0.0, rate_limit=0.0, retry_after=1, seed=None):
+        """
+        :param latency: задержка одного вызова, секунд
+        :param rate_limit: доля вызовов, на которые приходит 429
+        :param retry_after: retry_after в ответе 429, секунд
+        :param seed: зерно генератора 429 (для повторяемых прогонов)
+        """
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._messages = {}      # (chat_id, message_id) → (текст, reply_markup)
+        self._inline = {}        # chat_id → (message_id, inline_keyboard)
+        self._previous = None
+        self.reset_stats()
+
+    def install(self):
+        self._previous = apihelper.CUSTOM_REQUEST_SENDER
+        apihelper.CUSTOM_REQUEST_SENDER = self
+
+    def uninstall(self):
+        apihelper.CUSTOM_REQUEST_SENDER = self._previous
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': dict(self._calls),
+                'rate_limited': self._rate_limited,
+                'errors': self._errors,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._calls = collections.Counter()
+            self._rate_limited = 0
+            self._errors = 0
+
+    def add_message(self, chat_id, text, markup=None):
+        with self._lock:
+            message_id = next(self._message_ids)
+            self._message(chat_id, message_id, text, json.loads(markup) if isinstance(markup, str) else markup)
+        return message_id
+
+    def last_inline(self, chat_id):
+        with self._lock:
+            return self._inline.get(chat_id)
+
+    # ── Подмена HTTP ──────────────────────────────────────────────
+
+    def __call__(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        name = url.rsplit('/', 1)[-1]
+        params = params or {}
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._calls[name] += 1
+            if name != 'getMe' and self.rate_limit and self._random.random() < self.rate_limit:
+                self._rate_limited += 1
+                return self._error(429, 'Too Many Requests: retry later',
+                                   parameters={'retry_after': self.retry_after})
+            handler = getattr(self, '_' + name, None)
+            if handler is None:
+                return _Response({'ok': True, 'result': True})
+            return handler(params)
+
+    @staticmethod
+    def _error(code, description, **extra):
+        return _Response({'ok': False, 'error_code': code, 'description': description, **extra}, code)
+
+    @staticmethod
+    def _markup(params):
+        markup = params.get('reply_markup')
+        return json.loads(markup) if isinstance(markup, str) else markup
+
+    def _message(self, chat_id, message_id, text, markup):
+        self._messages[(chat_id, message_id)] = (text, markup)
+        if markup and 'inline_keyboard' in markup:
+            self._inline[chat_id] = (message_id, markup['inline_keyboard'])
+        result = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+            'text': text,
+        }
+        if markup and 'inline_keyboard' in markup:
+            result['reply_markup'] = markup
+        return _Response({'ok': True, 'result': result})
+
+    def _getMe(self, params):
+        return _Response({'ok': True, 'result': {
+            'id': 1, 'is_bot': True, 'first_name': 'TaskMaster', 'username': 'taskmaster_bench_bot',
+        }})
+
+    def _sendMessage(self, params):
+        text = params.get('text', '')
+        if text.startswith('❌'):
+            self._errors += 1
+        return self._message(int(params['chat_id']), next(self._message_ids), text, self._markup(params))
+
+    def _answerCallbackQuery(self, params):
+        if params.get('text', '').startswith('❌'):
+            self._errors += 1
+        return _Response({'ok': True, 'result': True})
+
+    def _editMessageText(self, params):
+        chat_id, message_id = int(params['chat_id']), int(params['message_id'])
+        text, markup = params.get('text', ''), self._markup(params)
+        if self._messages.get((chat_id, message_id)) == (text, markup):
+            return self._error(400, 'Bad Request: message is not modified')
+        return self._message(chat_id, message_id, text, markup)
+
+    def _editMessageReplyMarkup(self, params):
+        chat_id, message_id = int(params['chat_id']), int(params['message_id'])
+        text, old_markup = self._messages.get((chat_id, message_id), ('', None))
+        markup = self._markup(params)
+        if markup == old_markup:
+            return self._error(400, 'Bad Request: message is not modified')
+        return self._message(chat_id, message_id, text, markup)
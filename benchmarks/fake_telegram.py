@@ -0,0 +1,115 @@
+# benchmarks/fake_telegram.py
+
+import http.client
+import itertools
+import json
+import threading
+import time
+
+
+class FakeTelegramClient:
+    """
+    Локальная замена серверов Telegram: шлёт синтетические обновления
+    в webhook бота по HTTP так же, как это делает Bot API.
+      - make_message_update(chat_id, text) → dict
+      - post(update) → HTTP-статус
+      - run_load(total, concurrency, chats) → dict со статистикой
+    """
+
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+    def __init__(self, host, port, path='/webhook', secret_token=''):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._update_ids = itertools.count(1)
+        self._local = threading.local()
+
+    def make_message_update(self, chat_id, text='/mytasks'):
+        """
+        Минимальный Update с текстовым сообщением от пользователя chat_id.
+        """
+        update_id = next(self._update_ids)
+        return {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Bench', 'username': f'user{chat_id}'},
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+                if text.startswith('/') else [],
+            },
+        }
+
+    def _connection(self):
+        # Keep-alive соединение на поток, как у Telegram
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def post(self, update):
+        body = json.dumps(update).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.secret_token:
+            headers[self.SECRET_HEADER] = self.secret_token
+        conn = self._connection()
+        try:
+            conn.request('POST', self.path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def run_load(self, total=5000, concurrency=16, chats=100):
+        """
+        Отправляет total обновлений из concurrency потоков по chats разным чатам.
+        Возвращает пропускную способность и задержки подтверждения.
+        """
+        counter = itertools.count()
+        latencies = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def worker():
+            local_lat = []
+            local_st = {}
+            while True:
+                i = next(counter)
+                if i >= total:
+                    break
+                update = self.make_message_update(1000 + i % chats)
+                t0 = time.perf_counter()
+                status = self.post(update)
+                local_lat.append(time.perf_counter() - t0)
+                local_st[status] = local_st.get(status, 0) + 1
+            with lock:
+                latencies.extend(local_lat)
+                for k, v in local_st.items():
+                    statuses[k] = statuses.get(k, 0) + v
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        n = len(latencies)
+        return {
+            'sent': n,
+            'elapsed': elapsed,
+            'rps': n / elapsed if elapsed else 0.0,
+            'ack_p50_ms': latencies[n // 2] * 1000 if n else 0.0,
+            'ack_p99_ms': latencies[min(n - 1, int(n * 0.99))] * 1000 if n else 0.0,
+            'statuses': statuses,
+        }
@@ -0,0 +1,124 @@
+# benchmarks/formatter_throughput.py
+"""
+Замер отрисовки карточек задач: прежний format_task по одной задаче
+против TaskFormatter.format_tasks на одной пачке.
+
+Запуск из корня репозитория:
+    python -m benchmarks.formatter_throughput --tasks 10000 --rounds 5
+
+«До» — прежняя реализация (часы и перевод «сейчас» в местное время на каждую
+задачу, строка собирается конкатенацией), скопированная сюда как эталон.
+Перед замером результаты сверяются на задачах с дедлайном не «сегодня»
+(у «сегодня через HH:MM» текст зависит от секунды вызова).
+
+Последний вариант — повторная отрисовка тех же версий задач через кеш
+карточек (как при листании списка).
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from formatter import TaskFormatter
+
+
+def legacy_format_deadline(tz, deadline):
+    if not deadline:
+        return ""
+    dl_local = deadline.astimezone(tz)
+    now_local = datetime.now(pytz.utc).astimezone(tz)
+    date_str = dl_local.strftime('%d.%m.%Y %H:%M')
+    secs = (dl_local - now_local).total_seconds()
+    date_diff = (dl_local.date() - now_local.date()).days
+    hours = int(abs(secs) // 3600)
+    minutes = int((abs(secs) % 3600) // 60)
+    if date_diff == 0:
+        if secs >= 0:
+            return f"⏰ {date_str}, сегодня через {hours:02d}:{minutes:02d}"
+        return f"❗️ {date_str}, сегодня {hours:02d}:{minutes:02d} назад"
+    if date_diff > 0:
+        rel = "завтра" if date_diff == 1 else f"через {date_diff} дн."
+        return f"⏰ {date_str}, {rel}"
+    ago = abs(date_diff)
+    rel = "1 дн. назад" if ago == 1 else f"{ago} дн. назад"
+    return f"❗️ {date_str}, {rel}"
+
+
+def legacy_format_task(tz, task):
+    emoji = {'high': '🔴', 'medium': '🟡', 'low': '🟢'}.get(task.get('priority', ''), '')
+    deadline_text = legacy_format_deadline(tz, task.get('deadline'))
+    tags = task.get('tags') or []
+    tags_text = f"\n🏷 {' '.join('#' + t for t in tags)}" if tags else ""
+    message = f"{emoji} *{task.get('title', '')}*"
+    if task.get('description'):
+        message += f"\n📝 {task['description']}"
+    if deadline_text:
+        message += f"\n{deadline_text}"
+    if tags_text:
+        message += tags_text
+    message += "\n──────────────────"
+    return message
+
+
+def synthetic_tasks(count, seed=1):
+    rnd = random.Random(seed)
+    now = datetime.now(pytz.utc)
+    tasks = []
+    for i in range(count):
+        deadline = None
+        if rnd.random() < 0.85:
+            deadline = now + timedelta(minutes=rnd.randint(-30 * 1440, 60 * 1440))
+        tasks.append({
+            'task_id': i,
+            'title': f"Задача {i}",
+            'description': "Описание задачи" if rnd.random() < 0.5 else None,
+            'priority': rnd.choice(('high', 'medium', 'low')),
+            'tags': [f"tag{rnd.randint(1, 30)}" for _ in range(rnd.randint(0, 3))],
+            'deadline': deadline,
+            'updated_at': now - timedelta(days=1),
+        })
+    return tasks
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--tasks', type=int, default=10000)
+    ap.add_argument('--rounds', type=int, default=5)
+    args = ap.parse_args()
+
+    fmt = TaskFormatter(cache_size=0)
+    cached = TaskFormatter(cache_size=args.tasks)
+    tasks = synthetic_tasks(args.tasks)
+
+    now = datetime.now(pytz.utc)
+    today = now.astimezone(fmt.timezone).date()
+    stable = [t for t in tasks if not t['deadline'] or t['deadline'].astimezone(fmt.timezone).date() != today]
+    if [legacy_format_task(fmt.timezone, t) for t in stable] != fmt.format_tasks(stable, now=now):
+        print("Расхождение с прежней реализацией")
+        raise SystemExit(1)
+    if cached.format_tasks(tasks, now=now) != fmt.format_tasks(tasks, now=now):
+        print("Расхождение кеша карточек")
+        raise SystemExit(1)
+
+    variants = (
+        ('до: format_task по одной', lambda: [legacy_format_task(fmt.timezone, t) for t in tasks]),
+        ('после: format_task по одной', lambda: [fmt.format_task(t) for t in tasks]),
+        ('после: format_tasks', lambda: fmt.format_tasks(tasks)),
+        ('после: format_tasks + кеш', lambda: cached.format_tasks(tasks)),
+    )
+    base = None
+    for name, fn in variants:
+        t0 = time.perf_counter()
+        for _ in range(args.rounds):
+            fn()
+        elapsed = (time.perf_counter() - t0) / args.rounds
+        base = base or elapsed
+        print(f"{name:<30} {elapsed * 1000:>9.2f} мс на {len(tasks)} задач  ×{base / elapsed:.2f}")
+    print(f"кеш карточек: {cached.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/handler_stubs.py
+"""
+Заглушки для прогона обработчиков без Telegram и PostgreSQL: записывающая
+БД, боты (синхронный и asyncio), сообщения и нажатия кнопок.
+  - RecordingDatabase         — не выполняет запросы, а записывает их текст в statements
+  - StubBot / AsyncStubBot    — ответы Bot API без сети
+  - scenarios(tasks, callbacks) — (имя, вызов) для каждого сценария
+  - build(...)                — TaskHandler и CallbackHandler на заглушках
+
+Используются в benchmarks/statement_count.py и tests/test_statement_count.py.
+"""
+
+import contextlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+from bot_utils import BotUI
+from formatter import TaskFormatter
+from parser import DeadlineParser
+from queries import TASK_COLUMNS
+from users import KnownUsers
+
+
+USER_ID = 42
+TASK_ID = 7
+
+def task_row():
+    now = datetime.now(pytz.utc)
+    values = {
+        'task_id': TASK_ID, 'title': "Задача", 'description': None, 'priority': 'medium',
+        'tags': ['тег'], 'deadline': now + timedelta(days=1), 'updated_at': now,
+        'user_id': USER_ID, 'category': None, 'status': 'active',
+    }
+    return tuple(values[c] for c in TASK_COLUMNS)
+
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+        self._row = None
+
+    def execute(self, query, args=None):
+        self.db.statements.append(' '.join(query.split()))
+        self._row = ("Задача",) if 'RETURNING title' in query else task_row()
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class _AsyncCursor(_Cursor):
+    async def execute(self, query, args=None, prepare=None):
+        super().execute(query, args)
+
+    async def fetchone(self):
+        return self._row
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class RecordingDatabase:
+    """
+    Database, которая не выполняет запросы, а записывает их текст.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def is_prepared(self, sql):
+        return False
+
+    def _conn(self, cursor_cls):
+        return SimpleNamespace(cursor=lambda: cursor_cls(self), commit=lambda: None, rollback=lambda: None)
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self._conn(_Cursor)
+
+    @contextlib.asynccontextmanager
+    async def connection_async(self):
+        yield self._conn(_AsyncCursor)
+
+
+class StubBot:
+    def send_message(self, chat_id, text, **kwargs):
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id))
+
+    def queue_message(self, chat_id, text, **kwargs):
+        return None
+
+    def edit_message_text(self, *args, **kwargs):
+        return None
+
+    def edit_message_reply_markup(self, *args, **kwargs):
+        return None
+
+    def answer_callback_query(self, *args, **kwargs):
+        return None
+
+
+class AsyncStubBot(StubBot):
+    async def send_message(self, chat_id, text, **kwargs):
+        return StubBot.send_message(self, chat_id, text)
+
+    async def edit_message_text(self, *args, **kwargs):
+        return None
+
+    async def edit_message_reply_markup(self, *args, **kwargs):
+        return None
+
+    async def answer_callback_query(self, *args, **kwargs):
+        return None
+
+
+def message(text):
+    user = SimpleNamespace(id=USER_ID, username='bench')
+    return SimpleNamespace(text=text, chat=SimpleNamespace(id=USER_ID), from_user=user, message_id=1)
+
+
+def call(data):
+    return SimpleNamespace(id='1', data=data, from_user=message('').from_user, message=message(''))
+
+
+def scenarios(tasks, callbacks):
+    """
+    (имя, вызов) для каждого сценария; вызов возвращает None или корутину.
+    """
+    edit_data = {
+        'task_id': TASK_ID,
+        'old': {'deadline': None},
+        'new': {'title': "Задача", 'description': None, 'priority': 'low', 'category': None, 'tags': None},
+    }
+    return (
+        ('send_welcome (повторно)', lambda: tasks.send_welcome(message('/start'))),
+        ('show_tasks (повторно)', lambda: tasks.show_tasks(message('/mytasks'))),
+        ('process_task_deadline', lambda: tasks.process_task_deadline(
+            message('/skip'), {'title': "Задача", 'user_id': USER_ID})),
+        ('complete_task', lambda: callbacks.complete_task(call(f'complete_{TASK_ID}'), TASK_ID)),
+        ('process_reschedule_deadline', lambda: callbacks.process_reschedule_deadline(
+            message('завтра 18:00'), {'task_id': TASK_ID})),
+        ('process_edit_deadline', lambda: callbacks.process_edit_deadline(message('/skip'), edit_data)),
+        ('delete_task', lambda: callbacks.delete_task(call(f'delete_{TASK_ID}'), TASK_ID)),
+        ('open_task', lambda: callbacks.open_task(call(f'open_{TASK_ID}'), TASK_ID)),
+    )
+
+
+def build(task_cls, callback_cls, bot, db):
+    parser, formatter = DeadlineParser(), TaskFormatter()
+    ui = BotUI(bot)
+    users = KnownUsers()
+    users.remember(USER_ID)     # «повторные» /start и /mytasks
+    return (
+        task_cls(bot, db, parser, formatter, ui, users=users),
+        callback_cls(bot, db, parser, formatter, ui),
+    )
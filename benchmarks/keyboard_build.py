@@ -0,0 +1,86 @@
+# benchmarks/keyboard_build.py
+"""
+Замер сборки inline-клавиатур: объекты telebot + to_json() на каждую задачу
+против шаблонов BotUI (JSON собран один раз, подставляется только id).
+
+Запуск из корня репозитория:
+    python -m benchmarks.keyboard_build --count 100000
+"""
+
+import argparse
+import json
+import time
+
+from telebot import types
+
+from bot_utils import BotUI
+
+
+def legacy_task_actions(task_id):
+    """
+    Прежний BotUI.create_task_actions_markup + сериализация при отправке.
+    """
+    markup = types.InlineKeyboardMarkup()
+    markup.row(
+        types.InlineKeyboardButton("✅ Завершить", callback_data=f"complete_{task_id}"),
+        types.InlineKeyboardButton("🗑 Удалить", callback_data=f"delete_{task_id}")
+    )
+    markup.row(
+        types.InlineKeyboardButton("🔄 Перенести", callback_data=f"reschedule_{task_id}"),
+        types.InlineKeyboardButton("✏️ Редактировать", callback_data=f"edit_{task_id}"),
+    )
+    return markup.to_json()
+
+
+def legacy_page(task_ids, prev_data, next_data):
+    markup = types.InlineKeyboardMarkup()
+    numbers = [
+        types.InlineKeyboardButton(str(i), callback_data=f"open_{task_id}")
+        for i, task_id in enumerate(task_ids, 1)
+    ]
+    for start in range(0, len(numbers), 5):
+        markup.row(*numbers[start:start + 5])
+    nav = []
+    if prev_data:
+        nav.append(types.InlineKeyboardButton("◀️ Назад", callback_data=prev_data))
+    if next_data:
+        nav.append(types.InlineKeyboardButton("Вперёд ▶️", callback_data=next_data))
+    if nav:
+        markup.row(*nav)
+    return markup.to_json()
+
+
+def timed(fn, count):
+    t0 = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return count / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--count', type=int, default=50000)
+    args = ap.parse_args()
+
+    ui = BotUI(bot=None)
+    ids = list(range(1000, 1010))
+    prev_data, next_data = 'pg:al:1:p:1:i:1000', 'pg:al:3:n:2:i:1009'
+
+    for task_id in (1, 12345):
+        if json.loads(legacy_task_actions(task_id)) != json.loads(ui.create_task_actions_markup(task_id)):
+            raise SystemExit("Расхождение клавиатуры действий")
+    if json.loads(legacy_page(ids, prev_data, next_data)) != json.loads(ui.create_page_markup(ids, prev_data, next_data)):
+        raise SystemExit("Расхождение клавиатуры страницы")
+
+    rows = (
+        ('действия: объекты + to_json', timed(legacy_task_actions, args.count)),
+        ('действия: шаблон', timed(ui.create_task_actions_markup, args.count)),
+        ('страница: объекты + to_json', timed(lambda i: legacy_page(ids, prev_data, next_data), args.count // 10)),
+        ('страница: шаблон', timed(lambda i: ui.create_page_markup(ids, prev_data, next_data), args.count // 10)),
+    )
+    for name, rate in rows:
+        print(f"{name:<30} {rate:>12,.0f} клавиатур/с")
+
+
+if __name__ == '__main__':
+    main()
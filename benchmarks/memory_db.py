@@ -0,0 +1,324 @@
+# benchmarks/memory_db.py
+
+import contextlib
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from queries import (
+    FILTER_WHERE, CATEGORY_WHERE, TAG_WHERE, OVERDUE_STATUS_WHERE, ACTIVE_PAST_WHERE,
+    PRIORITY_RANK, RANK_SQL, LIST_COLUMNS, TASK_COLUMNS,
+    REGISTER_USER_SQL, INSERT_TASK_WITH_USER_SQL, TASK_BY_ID_SQL, USER_TASK_SQL, TASK_DEADLINE_SQL,
+    TASK_EDIT_FIELDS_SQL, COMPLETE_TASK_SQL, DELETE_TASK_SQL, RESCHEDULE_TASK_SQL,
+    UPDATE_TASK_SQL, CATEGORIES_SQL, TAGS_SQL,
+)
+
+
+INFINITY = datetime.max.replace(tzinfo=pytz.utc)
+
+# Условие фильтра списка (FILTER_WHERE) → проверка строки задачи
+_OPEN = ('active', 'overdue')
+_FILTERS = {
+    FILTER_WHERE['hi'][1]: lambda t, now: t['priority_rank'] == 1 and t['status'] in _OPEN,
+    FILTER_WHERE['md'][1]: lambda t, now: t['priority_rank'] == 2 and t['status'] in _OPEN,
+    FILTER_WHERE['lo'][1]: lambda t, now: t['priority_rank'] == 3 and t['status'] in _OPEN,
+    FILTER_WHERE['up'][1]: lambda t, now: t['status'] == 'active' and t['deadline'] is not None
+    and t['deadline'] > now,
+    FILTER_WHERE['od'][1]: lambda t, now: t['status'] == 'overdue'
+    or (t['status'] == 'active' and t['deadline'] is not None and t['deadline'] < now),
+    FILTER_WHERE['dn'][1]: lambda t, now: t['status'] == 'completed',
+    FILTER_WHERE['al'][1]: lambda t, now: t['status'] in _OPEN,
+    OVERDUE_STATUS_WHERE: lambda t, now: t['status'] == 'overdue',
+    ACTIVE_PAST_WHERE: lambda t, now: t['status'] == 'active' and t['deadline'] is not None
+    and t['deadline'] < now,
+}
+_PAGE_PREFIX = f"SELECT {', '.join(LIST_COLUMNS)} FROM tasks WHERE user_id = %s AND "
+# Страница из половин UNION_WHERE: внешний запрос и одна половина
+_UNION_PREFIX = f"SELECT {', '.join(LIST_COLUMNS)} FROM ("
+_HALF_PREFIX = f"SELECT {', '.join(LIST_COLUMNS + (RANK_SQL,))} FROM tasks WHERE user_id = %s AND "
+
+
+def _sort_key(task):
+    deadline = task['deadline']
+    return task['priority_rank'], INFINITY if deadline is None else deadline, task['task_id']
+
+
+class _Cursor:
+    """
+    Курсор psycopg2 в объёме, нужном обработчикам: execute / fetchone / fetchall.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        self.db._round_trip()
+        self._rows = self.db._execute(query, tuple(args or ()))
+        if self.db.observer is not None:
+            self.db.observer(query, time.perf_counter() - started, None)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _Cursor(self.db)
+
+    def commit(self):
+        self.db._round_trip('COMMIT')
+
+    def rollback(self):
+        self.db._round_trip('ROLLBACK')
+
+
+class MemoryDatabase:
+    """
+    Замена Database для бенчмарков: таблицы users/tasks в памяти, те же
+    запросы из queries.py (другие — NotImplementedError) и задержка
+    latency на каждый обмен с сервером (execute, commit, rollback).
+      - connection()            — как Database.connection(), пул на pool_size соединений
+      - seed(user_id, count)    — добавить пользователю count задач → их task_id
+      - stats() / reset_stats() — число обменов с сервером и запросов по видам;
+                                  COMMIT и ROLLBACK — тоже обмены и считаются среди запросов
+    Изменения видны сразу (без транзакций): обработчики коммитят каждый оператор.
+    """
+
+    statements = None   # подготовленных операторов нет — как при DB_PREPARE=0
+    observer = None     # как Database.observer
+
+    def __init__(self, latency=0.0, pool_size=10):
+        """
+        :param latency: задержка одного обмена с сервером, секунд
+        :param pool_size: сколько соединений одновременно (как DB_POOL_MAX)
+        """
+        self.latency = latency
+        self._pool = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.users = {}
+        self.tasks = {}
+        self._stats = {'round_trips': 0, 'statements': {}}
+        self._handlers = {
+            REGISTER_USER_SQL: ('register_user', self._register_user),
+            INSERT_TASK_WITH_USER_SQL: ('insert_task', self._insert_task),
+            TASK_BY_ID_SQL: ('task_by_id', self._task_by_id),
+            USER_TASK_SQL: ('user_task', self._user_task),
+            TASK_DEADLINE_SQL: ('task_deadline', self._task_deadline),
+            TASK_EDIT_FIELDS_SQL: ('task_edit_fields', self._task_edit_fields),
+            COMPLETE_TASK_SQL: ('complete_task', self._complete_task),
+            DELETE_TASK_SQL: ('delete_task', self._delete_task),
+            RESCHEDULE_TASK_SQL: ('reschedule_task', self._reschedule_task),
+            UPDATE_TASK_SQL: ('update_task', self._update_task),
+            CATEGORIES_SQL: ('user_categories', self._categories),
+            TAGS_SQL: ('user_tags', self._tags),
+        }
+
+    def is_prepared(self, sql):
+        return False
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        with self._pool:
+            yield _Connection(self)
+
+    def stats(self):
+        with self._lock:
+            return {'round_trips': self._stats['round_trips'], 'statements': dict(self._stats['statements'])}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'round_trips': 0, 'statements': {}}
+
+    def seed(self, user_id, count, status='active'):
+        """
+        count задач с разными приоритетами, дедлайнами, категориями и тегами.
+        """
+        now = datetime.now(pytz.utc)
+        priorities = list(PRIORITY_RANK)
+        ids = []
+        with self._lock:
+            self.users.setdefault(user_id, f"user{user_id}")
+            for i in range(count):
+                ids.append(self._add_task(
+                    user_id, f"Задача {i}", "Описание задачи для проверки скорости",
+                    priorities[i % 3], f"Категория {i % 5}", [f"тег{i % 7}", "работа"],
+                    None if i % 10 == 0 else now + timedelta(hours=i + 1), status,
+                ))
+        return ids
+
+    # ── Выполнение запросов ───────────────────────────────────────
+
+    def _round_trip(self, name=None):
+        with self._lock:
+            self._stats['round_trips'] += 1
+            if name is not None:
+                self._count(name)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _count(self, name):
+        statements = self._stats['statements']
+        statements[name] = statements.get(name, 0) + 1
+
+    def _execute(self, query, args):
+        with self._lock:
+            handler = self._handlers.get(query)
+            if handler is not None:
+                name, run = handler
+                self._count(name)
+                return run(*args)
+            if query.startswith(_PAGE_PREFIX) or query.startswith(_UNION_PREFIX):
+                self._count('task_page')
+                return self._page(query, args)
+        raise NotImplementedError(f"MemoryDatabase: неизвестный запрос {' '.join(query.split())[:80]}")
+
+    def _add_task(self, user_id, title, description, priority, category, tags, deadline, status='active'):
+        task_id = next(self._ids)
+        self.tasks[task_id] = {
+            'task_id': task_id, 'user_id': user_id, 'title': title, 'description': description,
+            'priority': priority, 'priority_rank': PRIORITY_RANK.get(priority, 4),
+            'category': category, 'tags': tags, 'deadline': deadline, 'status': status,
+            'updated_at': datetime.now(pytz.utc),
+        }
+        return task_id
+
+    def _returning(self, task_id):
+        task = self.tasks.get(task_id)
+        return [tuple(task[c] for c in TASK_COLUMNS)] if task else []
+
+    def _reactivate(self, task, deadline):
+        # CASE WHEN status = 'overdue' AND deadline > NOW() THEN 'active'
+        if task['status'] == 'overdue' and deadline is not None and deadline > datetime.now(pytz.utc):
+            task['status'] = 'active'
+        task['updated_at'] = datetime.now(pytz.utc)
+
+    def _register_user(self, user_id, username):
+        self.users.setdefault(user_id, username)
+        return []
+
+    def _insert_task(self, user_id, username, task_user_id, title, description, priority,
+                     category, tags, deadline):
+        self.users.setdefault(user_id, username)
+        return self._returning(self._add_task(
+            task_user_id, title, description, priority, category, tags, deadline
+        ))
+
+    def _task_by_id(self, task_id):
+        return self._returning(task_id)
+
+    def _user_task(self, task_id, user_id):
+        task = self.tasks.get(task_id)
+        return self._returning(task_id) if task and task['user_id'] == user_id else []
+
+    def _task_deadline(self, task_id):
+        task = self.tasks.get(task_id)
+        return [(task['deadline'],)] if task else []
+
+    def _task_edit_fields(self, task_id):
+        task = self.tasks.get(task_id)
+        if not task:
+            return []
+        return [tuple(task[c] for c in ('title', 'description', 'priority', 'category', 'tags', 'deadline'))]
+
+    def _complete_task(self, task_id):
+        task = self.tasks.get(task_id)
+        if task:
+            task['status'] = 'completed'
+            task['updated_at'] = datetime.now(pytz.utc)
+        return self._returning(task_id)
+
+    def _delete_task(self, task_id):
+        task = self.tasks.pop(task_id, None)
+        return [(task['title'],)] if task else []
+
+    def _reschedule_task(self, deadline, _deadline, task_id):
+        task = self.tasks.get(task_id)
+        if task:
+            task['deadline'] = deadline
+            self._reactivate(task, deadline)
+        return self._returning(task_id)
+
+    def _update_task(self, title, description, priority, category, tags, deadline, _deadline, task_id):
+        task = self.tasks.get(task_id)
+        if task:
+            task.update(
+                title=title, description=description, priority=priority,
+                priority_rank=PRIORITY_RANK.get(priority, 4), category=category, tags=tags,
+                deadline=deadline,
+            )
+            self._reactivate(task, deadline)
+        return self._returning(task_id)
+
+    def _user_tasks(self, user_id):
+        return [t for t in self.tasks.values() if t['user_id'] == user_id]
+
+    def _categories(self, user_id, limit):
+        cats = {t['category'] for t in self._user_tasks(user_id) if t['category']}
+        return [(c,) for c in sorted(cats)[:limit]]
+
+    def _tags(self, user_id, limit):
+        tags = {tag for t in self._user_tasks(user_id) for tag in (t['tags'] or ()) if tag}
+        return [(tag,) for tag in sorted(tags)[:limit]]
+
+    def _page(self, query, args):
+        """
+        Запрос TaskRepository.build_page_query: условие фильтра, курсор, порядок и LIMIT;
+        для UNION ALL — каждая половина со своими параметрами, затем слияние.
+        """
+        if query.startswith(_UNION_PREFIX):
+            body = query[len(_UNION_PREFIX) + 1:].rsplit(') AS page ORDER BY ', 1)[0][:-1]
+            rows, pos = [], 0
+            for half in body.split(') UNION ALL ('):
+                count = half.count('%s')
+                rows += self._page_rows(half[len(_HALF_PREFIX):], args[pos:pos + count])
+                pos += count
+            rows.sort(key=_sort_key, reverse=query.endswith('DESC LIMIT %s'))
+        else:
+            rows = self._page_rows(query[len(_PAGE_PREFIX):], args)
+        return [tuple(t[c] for c in LIST_COLUMNS) for t in rows[:args[-1]]]
+
+    def _page_rows(self, query, args):
+        """
+        Строки одного SELECT страницы; query — всё после «WHERE user_id = %s AND ».
+        """
+        where = query.split(' ORDER BY ')[0]
+        has_cursor = ' AND (priority_rank' in where
+        if has_cursor:
+            where = where.split(' AND (priority_rank')[0]
+        backward = query.endswith('DESC LIMIT %s')
+        user_id, limit = args[0], args[-1]
+        params = args[1:-4] if has_cursor else args[1:-1]
+
+        now = datetime.now(pytz.utc)
+        if where == CATEGORY_WHERE:
+            match = lambda t: t['category'] == params[0]
+        elif where == TAG_WHERE:
+            match = lambda t: params[0] in (t['tags'] or ())
+        else:
+            check = _FILTERS[where]
+            match = lambda t: check(t, now)
+
+        rows = sorted((t for t in self._user_tasks(user_id) if match(t)), key=_sort_key, reverse=backward)
+        if has_cursor:
+            rank, deadline, task_id = args[-4:-1]
+            cursor = (rank, INFINITY if deadline == 'infinity' else deadline, task_id)
+            if backward:
+                rows = [t for t in rows if _sort_key(t) < cursor]
+            else:
+                rows = [t for t in rows if _sort_key(t) > cursor]
+        return rows[:limit]
@@ -0,0 +1,182 @@
+# benchmarks/parser_throughput.py
+"""
+Микро-замер DeadlineParser: разборов в секунду до и после.
+
+Запуск из корня репозитория:
+    python -m benchmarks.parser_throughput --rounds 20000
+
+«До» — прежняя реализация (семь re.match подряд, список месяцев и .index()),
+скопированная сюда как эталон. «После» — DeadlineParser без кеша и с кешем.
+Затем пачка из --batch строк разбирается циклом по parse_deadline и одним
+вызовом parse_many. Перед замером результаты всех способов сверяются.
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from config import MOSCOW_TZ
+from parser import DeadlineParser
+
+
+SAMPLES = (
+    'через 2 часа', 'через 1 час 30 минут', 'через 45 минут', 'Через 3 дня',
+    'через 2 дня в 10:00', 'сегодня', 'сегодня в 18:30', 'завтра', 'завтра 09:15',
+    '31.12.2026', '01.02.27 12:00', '5 мая', '15 декабря в 20:00',
+    '5 маяя', 'через 2 часа в 10:00', 'когда-нибудь',
+)
+
+
+def legacy_parse(text, now, moscow=MOSCOW_TZ):
+    """
+    Прежний DeadlineParser.parse_deadline (с явным now для сверки).
+    """
+    text = text.lower().strip()
+
+    def local_dt(year, month, day, hour=23, minute=59):
+        naive = datetime(year, month, day, hour, minute)
+        return moscow.localize(naive).astimezone(pytz.utc)
+
+    match = re.match(
+        r'через\s+(\d+)\s*(?:час|часа|часов)'
+        r'(?:\s+(\d+)\s*(?:минута|минуты|минут|минуту))?$',
+        text
+    )
+    if match:
+        hours = int(match.group(1))
+        minutes = int(match.group(2)) if match.group(2) else 0
+        return (now + timedelta(hours=hours, minutes=minutes)).astimezone(pytz.utc)
+
+    match = re.match(r'через\s+(\d+)\s*(?:минута|минуты|минут|минуту)$', text)
+    if match:
+        return (now + timedelta(minutes=int(match.group(1)))).astimezone(pytz.utc)
+
+    time_pt = r'(?:\s*(?:в)?\s*(\d{1,2}):(\d{2}))?'
+    match = re.match(rf'через\s+(\d+)\s*(?:день|дня|дней){time_pt}$', text)
+    if match:
+        hour = int(match.group(2)) if match.group(2) else 23
+        minute = int(match.group(3)) if match.group(3) else 59
+        future = now + timedelta(days=int(match.group(1)))
+        return local_dt(future.year, future.month, future.day, hour, minute)
+
+    match = re.match(rf'сегодня{time_pt}$', text)
+    if match:
+        hour = int(match.group(1)) if match.group(1) else 23
+        minute = int(match.group(2)) if match.group(2) else 59
+        return local_dt(now.year, now.month, now.day, hour, minute)
+
+    match = re.match(rf'завтра{time_pt}$', text)
+    if match:
+        hour = int(match.group(1)) if match.group(1) else 23
+        minute = int(match.group(2)) if match.group(2) else 59
+        tm = now + timedelta(days=1)
+        return local_dt(tm.year, tm.month, tm.day, hour, minute)
+
+    match = re.match(rf'(\d{{1,2}})\.(\d{{1,2}})\.(\d{{2,4}}){time_pt}$', text)
+    if match:
+        d, m, y = map(int, match.groups()[:3])
+        y += 2000 if y < 100 else 0
+        hour = int(match.group(4)) if match.group(4) else 23
+        minute = int(match.group(5)) if match.group(5) else 59
+        return local_dt(y, m, d, hour, minute)
+
+    match = re.match(rf'(\d{{1,2}})\s+([а-яё]+){time_pt}$', text)
+    if match:
+        month_names = [
+            "января", "февраля", "марта", "апреля", "мая", "июня",
+            "июля", "августа", "сентября", "октября", "ноября", "декабря"
+        ]
+        try:
+            month = month_names.index(match.group(2)) + 1
+        except ValueError:
+            raise ValueError("Неверное название месяца")
+        hour = int(match.group(3)) if match.group(3) else 23
+        minute = int(match.group(4)) if match.group(4) else 59
+        return local_dt(now.year, month, int(match.group(1)), hour, minute)
+
+    raise ValueError("Неверный формат даты.")
+
+
+def outcome(fn, text):
+    try:
+        return fn(text)
+    except ValueError as e:
+        return f"ValueError: {e}"
+
+
+def measure(fn, texts, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            try:
+                fn(text)
+            except ValueError:
+                pass
+    elapsed = time.perf_counter() - t0
+    return rounds * len(texts) / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--rounds', type=int, default=5000)
+    ap.add_argument('--batch', type=int, default=10000)
+    args = ap.parse_args()
+
+    now = datetime.now(MOSCOW_TZ)
+    parser = DeadlineParser()
+    mismatches = 0
+    for text in SAMPLES:
+        old = outcome(lambda t: legacy_parse(t, now), text)
+        new = outcome(lambda t: parser.parse_deadline(t, now=now), text)
+        if old != new:
+            mismatches += 1
+            print(f"Расхождение для {text!r}: {old} != {new}")
+    results, errors = parser.parse_many(SAMPLES, now=now)
+    for i, text in enumerate(SAMPLES):
+        old = outcome(lambda t: legacy_parse(t, now), text)
+        new = f"ValueError: {errors[i]}" if i in errors else results[i]
+        if old != new:
+            mismatches += 1
+            print(f"Расхождение parse_many для {text!r}: {old} != {new}")
+    if mismatches:
+        raise SystemExit(1)
+
+    uncached = DeadlineParser(cache_size=0)
+    cached = DeadlineParser()
+    results = (
+        ('до (7 × re.match)', measure(lambda t: legacy_parse(t, datetime.now(MOSCOW_TZ)), SAMPLES, args.rounds)),
+        ('после, без кеша', measure(uncached.parse_deadline, SAMPLES, args.rounds)),
+        ('после, с кешем', measure(cached.parse_deadline, SAMPLES, args.rounds)),
+    )
+    base = results[0][1]
+    for name, rate in results:
+        print(f"{name:<20} {rate:>12,.0f} разборов/с  ×{rate / base:.2f}")
+    print(f"кеш: {cached.stats()}")
+
+    batch = [SAMPLES[i % len(SAMPLES)] for i in range(args.batch)]
+
+    def loop():
+        for text in batch:
+            try:
+                uncached.parse_deadline(text)
+            except ValueError:
+                pass
+
+    batch_rounds = max(1, args.rounds // 100)
+    timings = []
+    for name, fn in (('цикл parse_deadline', loop), ('parse_many', lambda: uncached.parse_many(batch))):
+        t0 = time.perf_counter()
+        for _ in range(batch_rounds):
+            fn()
+        timings.append((name, (time.perf_counter() - t0) / batch_rounds))
+    base = timings[0][1]
+    print(f"\nпачка из {len(batch)} строк:")
+    for name, elapsed in timings:
+        print(f"{name:<20} {elapsed * 1000:>10.2f} мс  ×{base / elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/prepared_statements.py
+"""
+Сколько времени экономят подготовленные операторы (db.StatementRegistry):
+один и тот же горячий запрос обработчиков выполняется обычным cur.execute
+и через PREPARE/EXECUTE на том же соединении.
+
+Запуск из корня репозитория (нужна доступная PostgreSQL из .env):
+    python -m benchmarks.prepared_statements --users 200 --tasks-per-user 100 --rounds 500
+
+Данные — как в benchmarks/explain_indexes.py, в транзакции, которая в конце
+откатывается. Для каждого запроса выводится среднее время вызова и время
+планирования из EXPLAIN (ANALYZE): у подготовленного оператора после пяти
+выполнений PostgreSQL переходит на общий план и почти не тратит время на
+планирование.
+"""
+
+import argparse
+import json
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from db import Database, PreparingConnection, StatementRegistry
+from queries import FILTER_WHERE, CATEGORIES_SQL, TASK_BY_ID_SQL, COMPLETE_TASK_SQL
+from repository import TaskRepository
+from benchmarks.explain_indexes import seed
+
+
+def hot_queries(user_id):
+    """
+    (имя оператора, sql, параметры) — запросы, которые обработчики шлют чаще всего.
+    """
+    queries = []
+    for key in ('al', 'hi', 'up'):
+        sql, args = TaskRepository.build_page_query(user_id, FILTER_WHERE[key][1])
+        queries.append((f"page_{key}", sql, args))
+    sql, args = TaskRepository.build_page_query(user_id, FILTER_WHERE['al'][1], cursor=(2, 'infinity', 10**9))
+    queries.append(("page_al_next", sql, args))
+    sql, args = TaskRepository.build_page_query(user_id, "tags @> ARRAY[%s]::varchar(255)[]", ('tag7',))
+    queries.append(("page_tag", sql, args))
+    queries.append(("user_categories", CATEGORIES_SQL, [user_id, 100]))
+    queries.append(("task_by_id", TASK_BY_ID_SQL, [1]))
+    queries.append(("complete_task", COMPLETE_TASK_SQL, [1]))
+    return queries
+
+
+def per_call(cur, sql, params, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        cur.execute(sql, params)
+        cur.fetchall()
+    return (time.perf_counter() - t0) / rounds
+
+
+def planning_time(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Planning Time'] / 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--users', type=int, default=200)
+    ap.add_argument('--tasks-per-user', type=int, default=100)
+    ap.add_argument('--rounds', type=int, default=500)
+    args = ap.parse_args()
+
+    db = Database()
+    db.init_db()
+
+    queries = hot_queries(user_id=1)
+    registry = StatementRegistry(threshold=0)
+    for name, sql, _ in queries:
+        registry.register(name, sql)
+
+    conn = psycopg2.connect(
+        connection_factory=lambda dsn, **kwargs: PreparingConnection(dsn, registry, **kwargs),
+        **db._db_config
+    )
+    try:
+        plain = conn.cursor(cursor_factory=extensions.cursor)
+        prepared = conn.cursor()
+        seed(plain, args.users, args.tasks_per_user)
+
+        print(f"{'запрос':<16} {'обычный, мс':>12} {'PREPARE, мс':>12} {'план обычн., мс':>16} {'план EXECUTE, мс':>17}")
+        for name, sql, params in queries:
+            plain_call = per_call(plain, sql, params, args.rounds)
+            prepared_call = per_call(prepared, sql, params, args.rounds)
+            statement = registry.lookup(sql)
+            plan_plain = planning_time(plain, sql, params)
+            plan_prepared = planning_time(plain, statement.execute_sql, params)
+            print(
+                f"{name:<16} {plain_call * 1000:>12.3f} {prepared_call * 1000:>12.3f} "
+                f"{plan_plain * 1000:>16.3f} {plan_prepared * 1000:>17.3f}"
+            )
+        plain.close()
+        prepared.close()
+    finally:
+        conn.rollback()
+        conn.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
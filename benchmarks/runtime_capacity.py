@@ -0,0 +1,214 @@
+# benchmarks/runtime_capacity.py
+"""
+Сравнение потокового и asyncio-режима по числу одновременно обслуживаемых
+пользователей: N пользователей одновременно открывают список задач
+(TaskHandler.send_task_list против AsyncTaskHandler.send_task_list).
+
+Запуск из корня репозитория:
+    python -m benchmarks.runtime_capacity --users 50,200,1000 --workers 16
+
+БД и Bot API заменены заглушками с задержкой (--db-ms, --api-ms): в потоковом
+режиме задержка занимает поток (time.sleep), в asyncio — нет (asyncio.sleep).
+Соединений с БД в обоих режимах не больше --pool. Потоковый режим работает
+через ChatDispatcher с --workers потоками, как BotApp. Отправка «Главного меню»
+(queue_message) в обоих режимах не ждёт ответа и в замер не входит.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+from bot_utils import BotUI
+from dispatcher import ChatDispatcher
+from formatter import TaskFormatter
+from parser import DeadlineParser
+from queries import LIST_COLUMNS
+from handlers.task_handlers import TaskHandler
+from handlers.async_handlers import AsyncTaskHandler
+
+
+def synthetic_rows(count=11):
+    now = datetime.now(pytz.utc)
+    rows = []
+    for i in range(count):
+        task = {
+            'task_id': 1000 + i,
+            'title': f"Задача {i}",
+            'description': "Описание задачи",
+            'priority': 'medium',
+            'tags': ['работа'],
+            'deadline': now + timedelta(hours=i),
+            'status': 'active',
+            'updated_at': now,
+        }
+        rows.append(tuple(task.get(c) for c in LIST_COLUMNS))
+    return rows
+
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, query, args=None):
+        time.sleep(self.db.latency)
+
+    def fetchall(self):
+        return self.db.rows
+
+    def close(self):
+        pass
+
+
+class _AsyncCursor(_Cursor):
+    async def execute(self, query, args=None):
+        await asyncio.sleep(self.db.latency)
+
+    async def fetchall(self):
+        return self.db.rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeDatabase:
+    """
+    Database с задержкой на запрос и ограниченным пулом соединений:
+    connection() — как пул psycopg2, connection_async() — как пул psycopg 3.
+    """
+
+    def __init__(self, latency, pool_size):
+        self.latency = latency
+        self.rows = synthetic_rows()
+        self._pool = threading.BoundedSemaphore(pool_size)
+        self._pool_size = pool_size
+        self._async_pool = None
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self._pool:
+            yield SimpleNamespace(cursor=lambda: _Cursor(self))
+
+    def open_async(self):
+        # Семафор привязывается к циклу событий — свой на каждый asyncio.run
+        self._async_pool = asyncio.Semaphore(self._pool_size)
+
+    @contextlib.asynccontextmanager
+    async def connection_async(self):
+        async with self._async_pool:
+            yield SimpleNamespace(cursor=lambda: _AsyncCursor(self))
+
+
+class FakeBot:
+    """
+    RateLimitedBot без лимитов: ответ Bot API приходит через latency секунд.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.errors = 0
+
+    def _reply(self, chat_id, text):
+        if text.startswith('❌'):
+            # Обработчик поймал исключение и сообщил о нём пользователю
+            self.errors += 1
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id))
+
+    def send_message(self, chat_id, text, **kwargs):
+        time.sleep(self.latency)
+        return self._reply(chat_id, text)
+
+    def queue_message(self, chat_id, text, **kwargs):
+        return None
+
+
+class FakeAsyncBot(FakeBot):
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._reply(chat_id, text)
+
+
+def percentiles(latencies):
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return q[49], q[94], q[98]
+
+
+def run_threads(handler, users, workers):
+    dispatcher = ChatDispatcher(workers)
+    latencies = []
+    lock = threading.Lock()
+    done = threading.Semaphore(0)
+
+    def job(chat_id, submitted):
+        try:
+            handler.send_task_list(chat_id, chat_id, 'al')
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - submitted)
+            done.release()
+
+    t0 = time.perf_counter()
+    for chat_id in range(1, users + 1):
+        dispatcher.submit(chat_id, job, chat_id, time.perf_counter(), block=True)
+    for _ in range(users):
+        done.acquire()
+    elapsed = time.perf_counter() - t0
+    dispatcher.stop()
+    return elapsed, latencies
+
+
+async def run_asyncio(handler, users):
+    handler.db.open_async()
+
+    async def job(chat_id):
+        started = time.perf_counter()
+        await handler.send_task_list(chat_id, chat_id, 'al')
+        return time.perf_counter() - started
+
+    t0 = time.perf_counter()
+    latencies = await asyncio.gather(*(job(chat_id) for chat_id in range(1, users + 1)))
+    return time.perf_counter() - t0, list(latencies)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--users', default='50,200,1000', help='уровни одновременных пользователей через запятую')
+    ap.add_argument('--workers', type=int, default=16, help='потоков ChatDispatcher в потоковом режиме')
+    ap.add_argument('--pool', type=int, default=20, help='соединений с БД')
+    ap.add_argument('--db-ms', type=float, default=5.0)
+    ap.add_argument('--api-ms', type=float, default=50.0)
+    args = ap.parse_args()
+
+    db = FakeDatabase(args.db_ms / 1000, args.pool)
+    parser, formatter = DeadlineParser(), TaskFormatter()
+    sync_bot, async_bot = FakeBot(args.api_ms / 1000), FakeAsyncBot(args.api_ms / 1000)
+    sync_handler = TaskHandler(sync_bot, db, parser, formatter, BotUI(sync_bot))
+    async_handler = AsyncTaskHandler(async_bot, db, parser, formatter, BotUI(async_bot))
+
+    print(f"{'режим':<10} {'польз.':>7} {'запр./с':>9} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for users in [int(u) for u in args.users.split(',')]:
+        runs = (
+            (f"потоки×{args.workers}", run_threads(sync_handler, users, args.workers)),
+            ('asyncio', asyncio.run(run_asyncio(async_handler, users))),
+        )
+        for name, (elapsed, latencies) in runs:
+            p50, p95, p99 = percentiles(latencies)
+            print(
+                f"{name:<10} {users:>7} {users / elapsed:>9.0f} "
+                f"{p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {p99 * 1000:>9.1f}"
+            )
+    if sync_bot.errors or async_bot.errors:
+        raise SystemExit(f"Ошибки в обработчиках: потоки {sync_bot.errors}, asyncio {async_bot.errors}")
+
+
+if __name__ == '__main__':
+    main()
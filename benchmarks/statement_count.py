@@ -0,0 +1,56 @@
+# benchmarks/statement_count.py
+"""
+Замер обработчиков без сети и БД: сколько микросекунд уходит на сам
+обработчик (разбор, отрисовка, клавиатуры) и сколько SQL-операторов он
+отправляет за вызов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.statement_count --rounds 2000
+
+Обработчики (синхронные и asyncio) работают на записывающей заглушке БД
+(benchmarks/handler_stubs.py). Ожидаемое число операторов проверяет
+tests/test_statement_count.py; здесь оно только печатается.
+"""
+
+import argparse
+import asyncio
+import time
+
+from handlers.task_handlers import TaskHandler
+from handlers.callback_handlers import CallbackHandler
+from handlers.async_handlers import AsyncTaskHandler, AsyncCallbackHandler
+from benchmarks.handler_stubs import RecordingDatabase, StubBot, AsyncStubBot, scenarios, build
+
+
+def measure(mode, db, runs, rounds):
+    for name, run in runs:
+        db.statements.clear()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            run()
+        elapsed = time.perf_counter() - t0
+        per_call = len(db.statements) / rounds
+        print(f"{mode:<8} {name:<30} {elapsed / rounds * 1e6:>9.1f} мкс  {per_call:>4.1f} SQL")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--rounds', type=int, default=2000, help='вызовов каждого обработчика')
+    args = ap.parse_args()
+
+    db = RecordingDatabase()
+    tasks, callbacks = build(TaskHandler, CallbackHandler, StubBot(), db)
+    measure('потоки', db, scenarios(tasks, callbacks), args.rounds)
+
+    async_db = RecordingDatabase()
+    tasks, callbacks = build(AsyncTaskHandler, AsyncCallbackHandler, AsyncStubBot(), async_db)
+    loop = asyncio.new_event_loop()
+    try:
+        runs = [(name, lambda run=run: loop.run_until_complete(run())) for name, run in scenarios(tasks, callbacks)]
+        measure('asyncio', async_db, runs, args.rounds)
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
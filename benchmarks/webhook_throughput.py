@@ -0,0 +1,59 @@
+# benchmarks/webhook_throughput.py
+"""
+Офлайн-замер пропускной способности webhook-режима.
+
+Запуск из корня репозитория:
+    python -m benchmarks.webhook_throughput --total 20000 --concurrency 32 --handler-ms 5
+
+Поднимает WebhookServer на localhost, вместо TeleBot подставляет обработчик,
+который «работает» --handler-ms миллисекунд, и нагружает сервер через
+FakeTelegramClient.
+"""
+
+import argparse
+import time
+
+from webhook import WebhookServer
+from benchmarks.fake_telegram import FakeTelegramClient
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--total', type=int, default=5000)
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--chats', type=int, default=100)
+    ap.add_argument('--workers', type=int, default=8)
+    ap.add_argument('--handler-ms', type=float, default=0.0)
+    ap.add_argument('--secret', default='bench-secret')
+    args = ap.parse_args()
+
+    def process_update(update):
+        if args.handler_ms:
+            time.sleep(args.handler_ms / 1000)
+
+    server = WebhookServer(
+        process_update,
+        host='127.0.0.1',
+        port=0,
+        secret_token=args.secret,
+        workers=args.workers,
+        max_pending=args.total,
+    )
+    server.start()
+    host, port = server.server_address
+
+    client = FakeTelegramClient(host, port, secret_token=args.secret)
+    result = client.run_load(args.total, args.concurrency, args.chats)
+    server.shutdown()
+
+    print(f"sent:        {result['sent']}")
+    print(f"elapsed:     {result['elapsed']:.2f} s")
+    print(f"throughput:  {result['rps']:.0f} updates/s")
+    print(f"ack p50:     {result['ack_p50_ms']:.2f} ms")
+    print(f"ack p99:     {result['ack_p99_ms']:.2f} ms")
+    print(f"statuses:    {result['statuses']}")
+    print(f"server:      {server.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,72 @@
 # bot.py
 
 import re
-from telebot import TeleBot
-from config import API_TOKEN
+import signal
+import threading
+from contextlib import contextmanager
+from telebot import TeleBot, types
+from config import (
+    API_TOKEN, BOT_MODE,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_SECRET, WEBHOOK_MAX_PENDING,
+    DISPATCH_WORKERS, DISPATCH_QUEUE_SIZE,
+    TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_SEND_WORKERS,
+    STATE_BACKEND, STATE_TTL, STATE_MAX_SIZE, STATE_CACHE_TTL,
+    REMINDERS_ENABLED, REMINDER_LEAD, REMINDER_HORIZON,
+    SWEEPER_ENABLED, SWEEPER_INTERVAL, SWEEPER_BATCH,
+    PERSISTENT_MENU,
+    KNOWN_USERS_MAX, KNOWN_USERS_BLOOM,
+    METRICS_PORT, METRICS_LISTEN,
+    QUERY_REPORT_TOP,
+    ADMIN_IDS, PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_UPDATES, PROFILE_MAX_SECONDS,
+)
 from db import Database
+from repository import TaskRepository
+from queries import PREPARED_STATEMENTS
 from parser import DeadlineParser
 from formatter import TaskFormatter
-from bot_utils import BotUI
+from bot_utils import BotUI, ReplyKeyboardTracker
 from handlers.task_handlers import TaskHandler
 from handlers.callback_handlers import CallbackHandler
+from webhook import WebhookServer
+from dispatcher import ChatDispatcher, update_chat_id
+from sender import OutboundSender, RateLimitedBot
+from conversation import ConversationManager, MemoryStateStore, PostgresStateStore
+from reminders import ReminderScheduler
+from users import KnownUsers
+from sweeper import OverdueSweeper
+from metrics import Metrics, MetricsServer
+from profiler import SamplingProfiler
+
+
+class DispatchingTeleBot(TeleBot):
+    """
+    TeleBot, который не обрабатывает обновления сам, а раскладывает их
+    по очередям ChatDispatcher: порядок внутри чата сохраняется
+    (важно для register_next_step_handler), разные чаты идут параллельно.
+    """
+
+    def __init__(self, token, dispatcher, **kwargs):
+        super().__init__(token, threaded=False, **kwargs)
+        self.dispatcher = dispatcher
+
+    def process_new_updates(self, updates):
+        # polling: при заполненной очереди ждём — следующий getUpdates
+        # не будет запрошен, пока диспетчер не разгрузится
+        for update in updates:
+            self.dispatch(update, block=True)
+
+    def dispatch(self, update, block=False):
+        """
+        Ставит одно обновление в очередь его чата.
+        :return: False, если очередь чата заполнена (обновление не принято)
+        """
+        # offset для getUpdates сдвигаем сразу, не дожидаясь обработки
+        if update.update_id > self.last_update_id:
+            self.last_update_id = update.update_id
+        return self.dispatcher.submit(
+            update_chat_id(update), super().process_new_updates, [update], block=block
+        )
 
 
 class BotApp:
@@ -17,50 +75,223 @@ class BotApp:
     Инкапсулирует создание TeleBot, регистрацию обработчиков и запуск бота.
     """
 
-    def __init__(self):
+    def __init__(self, mode=BOT_MODE, db=None):
+        """
+        :param mode: 'polling' или 'webhook'
+        :param db: экземпляр Database (по умолчанию — из настроек .env; бенчмарки передают свою)
+        """
         # Создаём экземпляр TeleBot
         if not API_TOKEN:
             raise RuntimeError("API_TOKEN не задан в окружении")
-        self.bot = TeleBot(API_TOKEN)
+        if mode not in ('polling', 'webhook'):
+            raise RuntimeError(f"Неизвестный режим BOT_MODE: {mode}")
+        self.mode = mode
+        # Обновления обрабатываются в ChatDispatcher с порядком внутри чата
+        self.dispatcher = ChatDispatcher(DISPATCH_WORKERS or None, DISPATCH_QUEUE_SIZE)
+        self.bot = DispatchingTeleBot(API_TOKEN, self.dispatcher)
+
+        # Метрики обработчиков (/metrics) — только если задан METRICS_PORT
+        self.metrics = Metrics() if METRICS_PORT else None
+        # Профилирование по запросу (/profile, SIGUSR1); выключенное ничего не стоит
+        self.profiler = SamplingProfiler(
+            PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000, max_seconds=PROFILE_MAX_SECONDS
+        )
+
+        # Все исходящие вызовы обработчиков идут через очередь с лимитами
+        self.sender = OutboundSender(
+            self.bot,
+            global_rate=TG_GLOBAL_RATE,
+            chat_rate=TG_CHAT_RATE,
+            chat_burst=TG_CHAT_BURST,
+            workers=TG_SEND_WORKERS,
+        )
+        # Какая постоянная клавиатура показана в чате — чтобы не слать меню повторно
+        self.keyboards = ReplyKeyboardTracker() if PERSISTENT_MENU else None
+        self.api = RateLimitedBot(
+            self.bot, self.sender, keyboards=self.keyboards,
+            observer=self.metrics.observe_api if self.metrics else None
+        )
 
         # Инициализируем зависимости
-        self.db = Database()
+        self.db = db or Database()
+        if self.db.statements is not None:
+            self.db.statements.register_all(PREPARED_STATEMENTS)
+            self.db.statements.register_all(TaskRepository.page_statements())
+        if self.metrics:
+            self.db.observer = self.metrics.observe_db
         self.parser = DeadlineParser()
         self.formatter = TaskFormatter()
-        self.ui = BotUI(self.bot)
+        self.ui = BotUI(self.api, self.keyboards)
+
+        # Шаги диалогов хранятся вне TeleBot, чтобы переживать перезапуск
+        if STATE_BACKEND == 'postgres':
+            store = PostgresStateStore(
+                self.db, ttl=STATE_TTL, cache_ttl=STATE_CACHE_TTL, cache_size=STATE_MAX_SIZE
+            )
+        else:
+            store = MemoryStateStore(max_size=STATE_MAX_SIZE, ttl=STATE_TTL)
+        self.conversation = ConversationManager(store)
+
+        # Напоминания о дедлайнах
+        self.reminders = None
+        if REMINDERS_ENABLED:
+            self.reminders = ReminderScheduler(
+                self.db, self.api, self.formatter, lead=REMINDER_LEAD, horizon=REMINDER_HORIZON
+            )
+
+        # Пометка просроченных задач
+        self.sweeper = None
+        if SWEEPER_ENABLED:
+            self.sweeper = OverdueSweeper(self.db, batch_size=SWEEPER_BATCH, interval=SWEEPER_INTERVAL)
 
         # Создаём обработчики
-        self.task_handler = TaskHandler(self.bot, self.db, self.parser, self.formatter, self.ui)
-        self.callback_handler = CallbackHandler(self.bot, self.db, self.parser, self.formatter, self.ui)
+        # Пользователи, которых уже записали в users (регистрация — один раз на процесс)
+        self.users = KnownUsers(KNOWN_USERS_MAX, bloom_capacity=KNOWN_USERS_BLOOM)
+
+        # Один TaskRepository на все обработчики: SQL, транзакции и разбор строк
+        self.repo = TaskRepository(self.db)
+        self.task_handler = TaskHandler(
+            self.api, self.db, self.parser, self.formatter, self.ui,
+            self.conversation, self.reminders, self.users, repo=self.repo
+        )
+        self.callback_handler = CallbackHandler(
+            self.api, self.db, self.parser, self.formatter, self.ui,
+            self.conversation, self.reminders, repo=self.repo
+        )
 
         # Регистрируем message- и callback-обработчики
         self._register_handlers()
+        if self.metrics:
+            self._register_gauges()
+
+    @contextmanager
+    def _track(self, name):
+        """
+        Блок обработчика name: исходящие сообщения (RateLimitedBot.stats())
+        и, если метрики включены, время, ошибки, время БД и Bot API.
+        """
+        with self.api.handler_scope(name):
+            if self.metrics is None:
+                yield
+            else:
+                with self.metrics.track(name):
+                    yield
+
+    def _call(self, name, handler, *args):
+        """
+        Вызов обработчика под именем name: учёт (_track) и, если включено, профилирование.
+        """
+        with self._track(name):
+            return self.profiler.run(name, handler, *args)
+
+    def _scoped(self, name, handler):
+        """
+        Обработчик, который учитывается под именем name (см. _call).
+        """
+        def wrapper(update):
+            return self._call(name, handler, update)
+        return wrapper
+
+    def _dispatch_step(self, message):
+        # Шаг диалога учитывается под своим именем (process_task_title и т.д.)
+        state = getattr(message, 'conversation_state', None)
+        name = state[0] if state else 'conversation'
+        self._call(name, self.conversation.dispatch, message)
+
+    def _profile_command(self, message):
+        """
+        /profile [N | Ns | stop] — см. SamplingProfiler.command. Только для ADMIN_IDS.
+        """
+        chat_id = message.chat.id
+
+        def notify(path, samples, count):
+            self.api.queue_message(chat_id, f"📊 Профиль записан: {path}\nСэмплов: {samples}, обновлений: {count}")
+
+        reply = self.profiler.command(message.text, PROFILE_UPDATES, notify)
+        if reply:
+            self.api.send_message(chat_id, reply)
+
+    def _toggle_profiler(self, signum, frame):
+        """
+        SIGUSR1: включить профилирование на PROFILE_UPDATES обновлений или выключить.
+        """
+        self.profiler.toggle(PROFILE_UPDATES)
+
+    def _register_gauges(self):
+        """
+        Текущие значения, которые читаются только при запросе /metrics.
+        """
+        self.metrics.gauge('active_conversations', "Незавершённые пошаговые диалоги",
+                           self.conversation.active_count)
+        self.metrics.gauge('dispatch_queue_depth', "Обновления в очередях ChatDispatcher",
+                           lambda: self.dispatcher.stats()['depth'])
+        self.metrics.gauge('send_queue_depth', "Исходящие вызовы в очереди OutboundSender",
+                           lambda: sum(self.sender.stats()['queued']))
+        if self.sweeper is not None:
+            self.sweeper.register_gauges(self.metrics)
+        if hasattr(self.db, 'pool_stats'):
+            self.metrics.gauge('db_pool_in_use', "Выданные соединения пула БД",
+                               lambda: self.db.pool_stats().get('in_use'))
 
     def _register_handlers(self):
         """
         Регистрация команд и callback-запросов.
         """
+        # /profile — служебная команда администраторов, раньше шагов диалогов
+        if ADMIN_IDS:
+            self.bot.register_message_handler(
+                self._scoped('profile', self._profile_command),
+                commands=['profile'],
+                func=lambda m: m.from_user.id in ADMIN_IDS
+            )
+        # Ответы на шаги диалогов — первыми, как раньше next-step хендлеры
+        self.bot.register_message_handler(
+            self._dispatch_step,
+            func=self.conversation.has_state,
+            content_types=['text']
+        )
         # /start
-        self.bot.register_message_handler(self.task_handler.send_welcome, commands=['start'])
+        self.bot.register_message_handler(
+            self._scoped('start', self.task_handler.send_welcome), commands=['start']
+        )
         # /newtask
-        self.bot.register_message_handler(self.task_handler.new_task, commands=['newtask'])
+        self.bot.register_message_handler(
+            self._scoped('newtask', self.task_handler.new_task), commands=['newtask']
+        )
         # /mytasks
-        self.bot.register_message_handler(self.task_handler.show_tasks, commands=['mytasks'])
+        self.bot.register_message_handler(
+            self._scoped('mytasks', self.task_handler.show_tasks), commands=['mytasks']
+        )
 
         # Callback-запросы для inline-кнопок задач:
         @self.bot.callback_query_handler(
-            func=lambda c: bool(re.match(r'^(complete|delete|reschedule|edit)_\d+$', c.data))
+            func=lambda c: bool(re.match(r'^(complete|delete|reschedule|edit|open)_\d+$', c.data))
         )
         def on_callback(c):
-            # Перенаправляем в обработчик
-            self.callback_handler.handle_task_action(c)
+            # Перенаправляем в обработчик; учитываем под именем действия (complete, delete, ...)
+            self._call(c.data.split('_', 1)[0], self.callback_handler.handle_task_action, c)
+
+        # Листание постраничного списка задач
+        self.bot.register_callback_query_handler(
+            self._scoped('page', self.task_handler.handle_page_callback),
+            func=lambda c: c.data.startswith('pg:')
+        )
 
         # Можно добавить другие хендлеры здесь по необходимости,
         # например для текстовых сообщений, если нужна глобальная обработка.
 
+    def process_update(self, update_json):
+        """
+        Ставит одно обновление (dict из webhook-а) в очередь ChatDispatcher.
+        :return: False, если очередь чата заполнена — webhook ответит 503
+        """
+        update = types.Update.de_json(update_json)
+        return self.bot.dispatch(update)
+
     def run(self):
         """
-        Инициализация БД (если нужно) и бесконечный polling.
+        Инициализация БД (если нужно) и запуск в выбранном режиме:
+        бесконечный polling или webhook-сервер.
         """
         # Инициализируем таблицы базы данных
         try:
@@ -71,9 +302,71 @@ class BotApp:
             # Например:
             # raise
 
-        print("Database initialized. Starting bot polling...")
-        # Запускаем бот
-        self.bot.infinity_polling()
+        if self.reminders:
+            self.reminders.start()
+        if self.sweeper:
+            self.sweeper.start()
+        # Сигнал для профилирования без доступа к чату (нет на Windows)
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._toggle_profiler)
+        metrics_server = None
+        if self.metrics:
+            metrics_server = MetricsServer(
+                self.metrics, host=METRICS_LISTEN, port=METRICS_PORT,
+                pages={'/queries': lambda: self.db.query_report(QUERY_REPORT_TOP)},
+            )
+            metrics_server.start()
+            print(f"Метрики: http://{METRICS_LISTEN}:{METRICS_PORT}/metrics")
+
+        try:
+            if self.mode == 'webhook':
+                self._run_webhook()
+            else:
+                print("Database initialized. Starting bot polling...")
+                self.bot.remove_webhook()
+                self.bot.infinity_polling()
+        finally:
+            if self.reminders:
+                self.reminders.stop()
+            if self.sweeper:
+                self.sweeper.stop()
+            if metrics_server:
+                metrics_server.shutdown()
+            if self.profiler.active:
+                self.profiler.stop(timeout=5)
+            print(f"Исходящие вызовы по обработчикам: {self.api.stats()}, главное меню: {self.ui.stats()}, "
+                  f"регистрации: {self.users.stats()}")
+            if self.db.statements is not None:
+                print(f"Подготовленные операторы: {self.db.statements.stats()}")
+            if getattr(self.db, 'query_log', None) is not None:
+                print(f"Запросы к БД по суммарному времени:\n{self.db.query_report(QUERY_REPORT_TOP)}")
+            self.dispatcher.stop()
+            self.sender.stop()
+            self.db.close()
+
+    def _run_webhook(self):
+        """
+        Регистрирует webhook в Telegram и запускает локальный HTTP-сервер.
+        """
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL не задан в окружении")
+
+        server = WebhookServer(
+            self.process_update,
+            host=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            # Разбор и постановка в очередь — в потоке запроса: так отказ
+            # ChatDispatcher превращается в ответ 503
+            workers=0,
+            max_pending=WEBHOOK_MAX_PENDING,
+        )
+        self.bot.remove_webhook()
+        self.bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET or None)
+
+        print(f"Database initialized. Listening for webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}...")
+        server.serve_forever()
 
 
 # Если нужно запускать из этого модуля напрямую:
@@ -1,56 +1,199 @@
 # bot_utils.py
 
+import threading
+from collections import OrderedDict
+
 from telebot import types
 
 
+# Место подстановки значения (task_id, callback_data) в шаблоне клавиатуры
+PLACEHOLDER = '#ID#'
+
+
+class KeyboardTemplate:
+    """
+    Клавиатура, сериализованная в JSON один раз. При отрисовке в готовую
+    строку подставляются только значения на местах PLACEHOLDER:
+      - render(value)       — одно значение на все места
+      - render(v1, v2, ...) — значения по порядку мест
+    Результат можно передавать в reply_markup как есть (telebot отправляет
+    строку без повторной сериализации).
+    """
+
+    __slots__ = ('_parts',)
+
+    def __init__(self, markup):
+        self._parts = markup.to_json().split(PLACEHOLDER)
+
+    def render(self, *values):
+        if len(values) == 1:
+            return str(values[0]).join(self._parts)
+        out = [self._parts[0]]
+        for value, part in zip(values, self._parts[1:]):
+            out.append(str(value))
+            out.append(part)
+        return "".join(out)
+
+
+def _reply_keyboard(*buttons, row_width=3):
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=row_width)
+    markup.add(*buttons)
+    return markup.to_json()
+
+
+# Постоянные клавиатуры: собираются и сериализуются один раз на процесс
+MAIN_MENU_MARKUP = _reply_keyboard('/newtask', '/mytasks')
+PRIORITY_MARKUP = _reply_keyboard('🔴 Высокий', '🟡 Средний', '🟢 Низкий')
+FILTER_MARKUP = _reply_keyboard(
+    '🔴 Высокий приоритет',
+    '🟡 Средний приоритет',
+    '🟢 Низкий приоритет',
+    '📅 Ближайшие дедлайны',
+    '❗️ Просроченные',
+    '✅ Завершенные',
+    '📂 Категории',
+    '🏷 Теги',
+    '📋 Все задачи'
+)
+REMOVE_MARKUP = types.ReplyKeyboardRemove().to_json()
+REPLY_KEYBOARDS = frozenset((MAIN_MENU_MARKUP, PRIORITY_MARKUP, FILTER_MARKUP, REMOVE_MARKUP))
+
+
+class ReplyKeyboardTracker:
+    """
+    Какая постоянная (reply) клавиатура сейчас показана в каждом чате.
+    Клавиатура Telegram остаётся на экране, пока её не заменит другая,
+    поэтому главное меню не нужно отправлять повторно.
+      - observe(chat_id, reply_markup) — учесть отправленное сообщение
+      - forget(chat_id)                — состояние неизвестно (отправка не удалась)
+      - current(chat_id) → JSON клавиатуры или None
+    Inline-клавиатуры и сообщения без reply_markup состояние не меняют.
+    """
+
+    def __init__(self, max_size=100000):
+        """
+        :param max_size: сколько чатов помнить (самые давние забываются)
+        """
+        self.max_size = max_size
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, chat_id, reply_markup):
+        if not isinstance(reply_markup, str) or reply_markup not in REPLY_KEYBOARDS:
+            return
+        with self._lock:
+            self._chats[chat_id] = reply_markup
+            self._chats.move_to_end(chat_id)
+            while len(self._chats) > self.max_size:
+                self._chats.popitem(last=False)
+
+    def forget(self, chat_id):
+        with self._lock:
+            self._chats.pop(chat_id, None)
+
+    def current(self, chat_id):
+        with self._lock:
+            return self._chats.get(chat_id)
+
+
+def _task_actions_template():
+    markup = types.InlineKeyboardMarkup()
+    # Верхний ряд: Завершить и Удалить
+    markup.row(
+        types.InlineKeyboardButton("✅ Завершить", callback_data=f"complete_{PLACEHOLDER}"),
+        types.InlineKeyboardButton("🗑 Удалить", callback_data=f"delete_{PLACEHOLDER}")
+    )
+    # Нижний ряд: Перенести и Редактировать
+    markup.row(
+        types.InlineKeyboardButton("🔄 Перенести", callback_data=f"reschedule_{PLACEHOLDER}"),
+        types.InlineKeyboardButton("✏️ Редактировать", callback_data=f"edit_{PLACEHOLDER}")
+    )
+    return KeyboardTemplate(markup)
+
+
 class BotUI:
     """
     Утилиты для отображения UI в Telegram: главные меню и inline-кнопки для задач.
+    Клавиатуры отдаются готовым JSON: постоянные сериализуются один раз,
+    inline-клавиатуры собираются из шаблонов (KeyboardTemplate) подстановкой id.
     """
 
-    def __init__(self, bot):
+    TASK_ACTIONS = _task_actions_template()
+
+    def __init__(self, bot, keyboards=None):
         """
-        :param bot: экземпляр telebot.TeleBot
+        :param bot: экземпляр RateLimitedBot (обёртка над telebot.TeleBot)
+        :param keyboards: ReplyKeyboardTracker; None — главное меню отправляется всегда
         """
         self.bot = bot
+        self.keyboards = keyboards
+        # (число задач, есть «назад», есть «вперёд») → KeyboardTemplate
+        self._page_templates = {}
+        self._lock = threading.Lock()
+        self._stats = {'menu_sent': 0, 'menu_skipped': 0}
 
-    def show_main_menu(self, chat_id):
+    def show_main_menu(self, chat_id, force=False):
         """
         Отображает главное меню с кнопками /newtask и /mytasks.
+        Если клавиатура меню в чате уже показана, повторно не отправляет
+        (force=True — отправить всё равно, например на /start).
         """
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        markup.add(
-            types.KeyboardButton('/newtask'),
-            types.KeyboardButton('/mytasks')
-        )
-        # Сообщение "Главное меню:" и клавиатура
-        self.bot.send_message(chat_id, "Главное меню:", reply_markup=markup)
+        if not force and self.keyboards and self.keyboards.current(chat_id) == MAIN_MENU_MARKUP:
+            with self._lock:
+                self._stats['menu_skipped'] += 1
+            return
+        with self._lock:
+            self._stats['menu_sent'] += 1
+        # Сообщение "Главное меню:" и клавиатура; ответ не нужен, поэтому не ждём отправки
+        self.bot.queue_message(chat_id, "Главное меню:", reply_markup=MAIN_MENU_MARKUP)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
 
     def create_task_actions_markup(self, task_id):
         """
-        Формирует InlineKeyboardMarkup с кнопками управления задачей:
+        JSON inline-клавиатуры с кнопками управления задачей:
           - Завершить (complete_{task_id})
           - Удалить (delete_{task_id})
           - Перенести (reschedule_{task_id})
           - Редактировать (edit_{task_id})
         """
+        return self.TASK_ACTIONS.render(task_id)
+
+    def create_page_markup(self, task_ids, prev_data=None, next_data=None):
+        """
+        JSON inline-клавиатуры для страницы списка задач:
+          - кнопки с номерами задач (open_{task_id}) — открывают карточку задачи
+          - ◀️ / ▶️ — листание (prev_data / next_data, None — кнопки нет)
+        """
+        key = (len(task_ids), bool(prev_data), bool(next_data))
+        template = self._page_templates.get(key)
+        if template is None:
+            template = self._page_templates[key] = self._page_template(*key)
+        values = list(task_ids)
+        if prev_data:
+            values.append(prev_data)
+        if next_data:
+            values.append(next_data)
+        return template.render(*values)
+
+    @staticmethod
+    def _page_template(count, has_prev, has_next):
         markup = types.InlineKeyboardMarkup()
-        # Верхний ряд: Завершить и Удалить
-        markup.row(
-            types.InlineKeyboardButton(
-                "✅ Завершить", callback_data=f"complete_{task_id}"
-            ),
-            types.InlineKeyboardButton(
-                "🗑 Удалить", callback_data=f"delete_{task_id}"
-            )
-        )
-        # Нижний ряд: Перенести и Редактировать
-        markup.row(
-            types.InlineKeyboardButton(
-                "🔄 Перенести", callback_data=f"reschedule_{task_id}"
-            ),
-            types.InlineKeyboardButton(
-                "✏️ Редактировать", callback_data=f"edit_{task_id}"
-            ),
-        )
-        return markup
+        numbers = [
+            types.InlineKeyboardButton(str(i), callback_data=f"open_{PLACEHOLDER}")
+            for i in range(1, count + 1)
+        ]
+        # Номера задач по пять в ряд
+        for start in range(0, len(numbers), 5):
+            markup.row(*numbers[start:start + 5])
+
+        nav = []
+        if has_prev:
+            nav.append(types.InlineKeyboardButton("◀️ Назад", callback_data=PLACEHOLDER))
+        if has_next:
+            nav.append(types.InlineKeyboardButton("Вперёд ▶️", callback_data=PLACEHOLDER))
+        if nav:
+            markup.row(*nav)
+        return KeyboardTemplate(markup)
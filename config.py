@@ -21,3 +21,76 @@ DB_CONFIG = {
 
 # Московский часовой пояс
 MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+
+# Режим получения обновлений: 'polling' (long polling) или 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+
+# Среда выполнения: 'threads' (TeleBot + psycopg2) или 'asyncio' (AsyncTeleBot + psycopg 3)
+BOT_RUNTIME = os.getenv('BOT_RUNTIME', 'threads')
+# asyncio-режим: сколько обновлений обрабатывать одновременно
+ASYNC_MAX_UPDATES = int(os.getenv('ASYNC_MAX_UPDATES', '1000'))
+# asyncio-режим: сколько обновлений может ждать обработки — всего и в одном чате.
+# Сверх предела webhook отвечает 503, polling не читает getUpdates, пока не освободится место
+ASYNC_MAX_PENDING = int(os.getenv('ASYNC_MAX_PENDING', '5000'))
+ASYNC_CHAT_PENDING = int(os.getenv('ASYNC_CHAT_PENDING', '32'))
+
+# Параметры webhook-режима
+WEBHOOK_URL         = os.getenv('WEBHOOK_URL', '')          # публичный https-адрес, например https://example.com/webhook
+WEBHOOK_LISTEN      = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT        = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH        = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET      = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', '1000'))   # запросов webhook-а в разборе одновременно
+
+# Число очередей диспетчера обновлений (0 — по два на ядро CPU, см. dispatcher.default_workers)
+DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', '0'))
+# Предел длины каждой очереди диспетчера: в webhook-режиме при заполненной
+# очереди чата Telegram получает 503 и повторит доставку, при polling-е
+# чтение getUpdates ждёт, пока очередь освободится
+DISPATCH_QUEUE_SIZE = int(os.getenv('DISPATCH_QUEUE_SIZE', '256'))
+
+# Лимиты исходящих сообщений Telegram (сообщений в секунду)
+TG_GLOBAL_RATE = float(os.getenv('TG_GLOBAL_RATE', '30'))
+TG_CHAT_RATE   = float(os.getenv('TG_CHAT_RATE', '1'))
+TG_CHAT_BURST  = int(os.getenv('TG_CHAT_BURST', '3'))
+TG_SEND_WORKERS = int(os.getenv('TG_SEND_WORKERS', '4'))
+
+# Хранилище шагов диалогов: 'memory' (LRU + TTL в процессе) или 'postgres'
+STATE_BACKEND  = os.getenv('STATE_BACKEND', 'memory')
+STATE_TTL      = int(os.getenv('STATE_TTL', '3600'))
+STATE_MAX_SIZE = int(os.getenv('STATE_MAX_SIZE', '10000'))
+# postgres: сколько секунд помнить состояние чата в памяти (в т.ч. «диалога нет»),
+# чтобы обычные сообщения не читали БД. По умолчанию — STATE_TTL. Если обновления
+# одного чата могут попасть в разные экземпляры бота — 0 или несколько секунд
+STATE_CACHE_TTL = int(os.getenv('STATE_CACHE_TTL', str(STATE_TTL)))
+
+# Напоминания о дедлайнах
+REMINDERS_ENABLED = os.getenv('REMINDERS_ENABLED', '1') == '1'
+REMINDER_LEAD     = int(os.getenv('REMINDER_LEAD_MINUTES', '60')) * 60   # за сколько секунд до дедлайна
+REMINDER_HORIZON  = int(os.getenv('REMINDER_HORIZON', '3600'))           # окно загрузки из БД, секунд
+
+# Пометка просроченных задач (status = 'overdue') фоновыми порциями
+SWEEPER_ENABLED  = os.getenv('SWEEPER_ENABLED', '1') == '1'
+SWEEPER_INTERVAL = int(os.getenv('SWEEPER_INTERVAL', '60'))    # пауза между проходами, секунд
+SWEEPER_BATCH    = int(os.getenv('SWEEPER_BATCH', '500'))      # задач в одной транзакции
+
+# Не отправлять «Главное меню:» повторно, если клавиатура меню в чате уже показана
+PERSISTENT_MENU = os.getenv('PERSISTENT_MENU', '1') == '1'
+
+# Уже зарегистрированные пользователи: INSERT в users только при первой встрече
+KNOWN_USERS_MAX   = int(os.getenv('KNOWN_USERS_MAX', '100000'))   # точный набор, пользователей
+KNOWN_USERS_BLOOM = int(os.getenv('KNOWN_USERS_BLOOM', '0'))      # фильтр Блума для вытесненных из набора (0 — выключен)
+
+# Метрики в формате Prometheus на http://METRICS_LISTEN:METRICS_PORT/metrics (0 — выключены)
+METRICS_PORT   = int(os.getenv('METRICS_PORT', '0'))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+
+# Сколько самых дорогих запросов к БД выводить при остановке бота (журнал запросов — DB_QUERY_LOG)
+QUERY_REPORT_TOP = int(os.getenv('QUERY_REPORT_TOP', '10'))
+
+# Профилирование обработчиков по команде /profile (только для ADMIN_IDS) или сигналу SIGUSR1
+ADMIN_IDS = {int(x) for x in os.getenv('ADMIN_IDS', '').replace(' ', '').split(',') if x}
+PROFILE_DIR         = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))     # период снятия стеков
+PROFILE_UPDATES     = int(os.getenv('PROFILE_UPDATES', '200'))         # обновлений по умолчанию
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '300'))   # предельная длительность
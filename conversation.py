@@ -0,0 +1,376 @@
+# conversation.py
+
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+
+def _encode(value):
+    # datetime (дедлайны) в JSON не сериализуется сам
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    raise TypeError(f"Не сериализуется: {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1 and '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    return obj
+
+
+def dump_state(step, data):
+    """
+    Компактная запись шага диалога: JSON без пробелов.
+    """
+    return json.dumps([step, data], default=_encode, separators=(',', ':'), ensure_ascii=False)
+
+
+def load_state(raw):
+    step, data = json.loads(raw, object_hook=_decode)
+    return step, data
+
+
+class MemoryStateStore:
+    """
+    Хранилище шагов диалога в памяти процесса: LRU с ограничением размера и TTL.
+      - get(chat_id) → (step, data) или None
+      - set(chat_id, step, data)
+      - delete(chat_id)
+      - stats()
+    """
+
+    # Методы не ждут ввода-вывода — в asyncio-режиме вызываются прямо в цикле событий
+    blocking = False
+
+    def __init__(self, max_size=10000, ttl=3600):
+        """
+        :param max_size: сколько диалогов держать (самые старые вытесняются)
+        :param ttl: через сколько секунд бездействия диалог забывается
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()   # chat_id → (expires_at, запись)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def get(self, chat_id):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(chat_id)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, raw = item
+            if expires_at <= now:
+                del self._items[chat_id]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+        return load_state(raw)
+
+    def set(self, chat_id, step, data):
+        raw = dump_state(step, data)
+        with self._lock:
+            self._items[chat_id] = (time.monotonic() + self.ttl, raw)
+            self._items.move_to_end(chat_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def delete(self, chat_id):
+        with self._lock:
+            self._items.pop(chat_id, None)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result['size'] = len(self._items)
+        return result
+
+
+class PostgresStateStore:
+    """
+    Хранилище шагов диалога в таблице conversation_state (см. Database.init_db):
+    переживает перезапуск и доступно всем экземплярам бота.
+    Просроченные записи не читаются и периодически удаляются.
+    Прочитанное и записанное состояние чата (в том числе «диалога нет») держится
+    в памяти cache_ttl секунд — обычное сообщение вне диалога не стоит SELECT.
+    Кеш верен, пока все обновления чата проходят через этот процесс; если чаты
+    не закреплены за экземплярами бота, cache_ttl нужно уменьшить (0 — без кеша).
+    """
+
+    # Синхронные запросы к БД — в asyncio-режиме выполняются в отдельном потоке
+    blocking = True
+
+    def __init__(self, db, ttl=3600, purge_every=500, cache_ttl=None, cache_size=10000):
+        """
+        :param db: экземпляр Database
+        :param ttl: через сколько секунд бездействия диалог забывается
+        :param purge_every: раз в сколько записей удалять просроченные диалоги
+        :param cache_ttl: сколько секунд помнить состояние чата в памяти (None — ttl, 0 — не помнить)
+        :param cache_size: сколько чатов помнить (самые старые вытесняются)
+        """
+        self.db = db
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self.cache_ttl = ttl if cache_ttl is None else cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # chat_id → (expires_at, запись или None — диалога нет)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'cached': 0, 'purged': 0}
+
+    def _inc(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _remember(self, chat_id, raw, left=None):
+        ttl = self.cache_ttl if left is None else min(self.cache_ttl, left)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._cache[chat_id] = (time.monotonic() + ttl, raw)
+            self._cache.move_to_end(chat_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, chat_id):
+        """
+        (True, запись или None), если состояние чата известно без БД, иначе (False, None).
+        """
+        with self._lock:
+            item = self._cache.get(chat_id)
+            if item is None:
+                return False, None
+            expires_at, raw = item
+            if expires_at <= time.monotonic():
+                del self._cache[chat_id]
+                return False, None
+            self._stats['cached'] += 1
+            self._stats['hits' if raw is not None else 'misses'] += 1
+        return True, raw
+
+    def get(self, chat_id):
+        known, raw = self._cached(chat_id)
+        if known:
+            return None if raw is None else load_state(raw)
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    """
+                    SELECT state,
+                           EXTRACT(EPOCH FROM updated_at + %s::integer * INTERVAL '1 second' - NOW())
+                    FROM conversation_state
+                    WHERE chat_id = %s AND updated_at > NOW() - %s::integer * INTERVAL '1 second'
+                    """,
+                    (self.ttl, chat_id, self.ttl)
+                )
+                row = cur.fetchone()
+            finally:
+                cur.close()
+            conn.rollback()
+        if row is None:
+            self._remember(chat_id, None)
+            self._inc('misses')
+            return None
+        self._remember(chat_id, row[0], float(row[1]))
+        self._inc('hits')
+        return load_state(row[0])
+
+    def set(self, chat_id, step, data):
+        raw = dump_state(step, data)
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    """
+                    INSERT INTO conversation_state (chat_id, state, updated_at)
+                    VALUES (%s, %s, NOW())
+                    ON CONFLICT (chat_id) DO UPDATE
+                        SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at
+                    """,
+                    (chat_id, raw)
+                )
+                conn.commit()
+            finally:
+                cur.close()
+        self._remember(chat_id, raw)
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, chat_id):
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("DELETE FROM conversation_state WHERE chat_id = %s", (chat_id,))
+                conn.commit()
+            finally:
+                cur.close()
+        self._remember(chat_id, None)
+
+    def purge_expired(self):
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "DELETE FROM conversation_state WHERE updated_at < NOW() - %s::integer * INTERVAL '1 second'",
+                    (self.ttl,)
+                )
+                self._inc('purged', cur.rowcount)
+                conn.commit()
+            finally:
+                cur.close()
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result['cache_size'] = len(self._cache)
+        return result
+
+
+# Шаг, выполняемый в текущей asyncio-задаче: [chat_id, назначил ли он следующий шаг]
+_current_step = contextvars.ContextVar('conversation_step', default=None)
+
+
+class ConversationManager:
+    """
+    Пошаговые диалоги поверх хранилища состояний (замена register_next_step_handler):
+      - register(*methods)               — объявить методы-шаги обработчиков
+      - next_step(chat_id, method, data) — следующий ответ чата получит method
+      - has_state(message)               — фильтр для message-хендлера
+      - dispatch(message)                — вызвать сохранённый шаг
+      - cancel(chat_id)                  — сбросить диалог
+    В хранилище попадает только имя шага и данные, поэтому диалог может
+    продолжить любой процесс бота.
+    Для asyncio-режима — next_step_async / has_state_async / dispatch_async
+    (шаги — корутины асинхронных обработчиков).
+    """
+
+    # Команды главного меню прерывают незавершённый диалог
+    RESET_COMMANDS = ('/start', '/newtask', '/mytasks')
+
+    def __init__(self, store):
+        self.store = store
+        self._steps = {}
+        # Текущий шаг в этом потоке: назначил ли он следующий шаг сам
+        self._local = threading.local()
+
+    def register(self, *methods):
+        for method in methods:
+            name = method.__name__
+            if name in self._steps and self._steps[name] != method:
+                raise ValueError(f"Шаг диалога {name} уже зарегистрирован")
+            self._steps[name] = method
+
+    def next_step(self, chat_id, method, data=None):
+        name = method.__name__
+        if name not in self._steps:
+            raise ValueError(f"Шаг диалога {name} не зарегистрирован")
+        if getattr(self._local, 'chat_id', None) == chat_id:
+            self._local.replaced = True
+        self.store.set(chat_id, name, data)
+
+    def cancel(self, chat_id):
+        self.store.delete(chat_id)
+
+    def active_count(self):
+        """
+        Сколько диалогов сейчас хранится (если хранилище это знает).
+        """
+        return self.store.stats().get('size')
+
+    def has_state(self, message):
+        text = message.text or ''
+        if text.split('@', 1)[0] in self.RESET_COMMANDS:
+            self.store.delete(message.chat.id)
+            return False
+        state = self.store.get(message.chat.id)
+        # Запоминаем на сообщении, чтобы dispatch не читал хранилище второй раз
+        message.conversation_state = state
+        return state is not None
+
+    def dispatch(self, message):
+        chat_id = message.chat.id
+        state = getattr(message, 'conversation_state', None) or self.store.get(chat_id)
+        if state is None:
+            return
+        step, data = state
+        method = self._steps.get(step)
+        if method is None:
+            print(f"Неизвестный шаг диалога: {step}")
+            self.store.delete(chat_id)
+            return
+
+        # Как и у next-step хендлеров, шаг срабатывает один раз. Если шаг сам
+        # назначил следующий, запись уже перезаписана — лишний DELETE не нужен.
+        self._local.chat_id = chat_id
+        self._local.replaced = False
+        try:
+            if data is None:
+                method(message)
+            else:
+                method(message, data)
+        finally:
+            if not self._local.replaced:
+                self.store.delete(chat_id)
+            self._local.chat_id = None
+
+    # ── asyncio-режим ─────────────────────────────────────────────
+
+    async def _store_call(self, method, *args):
+        fn = getattr(self.store, method)
+        if getattr(self.store, 'blocking', False):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def next_step_async(self, chat_id, method, data=None):
+        name = method.__name__
+        if name not in self._steps:
+            raise ValueError(f"Шаг диалога {name} не зарегистрирован")
+        current = _current_step.get()
+        if current is not None and current[0] == chat_id:
+            current[1] = True
+        await self._store_call('set', chat_id, name, data)
+
+    async def has_state_async(self, message):
+        text = message.text or ''
+        if text.split('@', 1)[0] in self.RESET_COMMANDS:
+            await self._store_call('delete', message.chat.id)
+            return False
+        state = await self._store_call('get', message.chat.id)
+        message.conversation_state = state
+        return state is not None
+
+    async def dispatch_async(self, message):
+        chat_id = message.chat.id
+        state = getattr(message, 'conversation_state', None) or await self._store_call('get', chat_id)
+        if state is None:
+            return
+        step, data = state
+        method = self._steps.get(step)
+        if method is None:
+            print(f"Неизвестный шаг диалога: {step}")
+            await self._store_call('delete', chat_id)
+            return
+
+        current = [chat_id, False]
+        token = _current_step.set(current)
+        try:
+            if data is None:
+                await method(message)
+            else:
+                await method(message, data)
+        finally:
+            _current_step.reset(token)
+            if not current[1]:
+                await self._store_call('delete', chat_id)
@@ -1,13 +1,591 @@
+import hashlib
 import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2 import extensions
+
+
+# Индексы tasks. Ключ сортировки списков — (priority_rank, дедлайн без NULL, task_id),
+# см. queries.RANK_SQL / queries.DEADLINE_SQL: выражения должны совпадать дословно.
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks(user_id);",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks(deadline);",
+    # Незавершённые (активные и просроченные) задачи пользователя в порядке вывода списка
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_open_rank
+        ON tasks (user_id, priority_rank, (COALESCE(deadline, 'infinity'::timestamptz)), task_id)
+        WHERE status IN ('active', 'overdue');
+    """,
+    # Активные задачи пользователя по дедлайну: «Ближайшие» и «Просроченные»
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_active_user_deadline
+        ON tasks (user_id, deadline)
+        WHERE status = 'active' AND deadline IS NOT NULL;
+    """,
+    # Активные задачи всех пользователей по дедлайну (sweeper.OverdueSweeper, напоминания)
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_active_deadline
+        ON tasks (deadline)
+        WHERE status = 'active' AND deadline IS NOT NULL;
+    """,
+    # Просроченные задачи пользователя (помечает sweeper.OverdueSweeper)
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_overdue_rank
+        ON tasks (user_id, priority_rank, (COALESCE(deadline, 'infinity'::timestamptz)), task_id)
+        WHERE status = 'overdue';
+    """,
+    # История завершённых задач
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_completed_rank
+        ON tasks (user_id, priority_rank, (COALESCE(deadline, 'infinity'::timestamptz)), task_id)
+        WHERE status = 'completed';
+    """,
+    # Фильтр по категории и список категорий
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_category ON tasks(user_id, category);",
+    # Поиск по тегу: tags @> ARRAY[тег]
+    "CREATE INDEX IF NOT EXISTS idx_tasks_tags_gin ON tasks USING GIN (tags);",
+)
+
+
+class _Statement:
+    """
+    Подготовленный оператор: имя, PREPARE и EXECUTE для одного текста SQL.
+    """
+
+    __slots__ = ('name', 'sql', 'prepare_sql', 'execute_sql')
+
+    def __init__(self, name, sql):
+        parts = sql.replace('%%', '%').split('%s')
+        params = len(parts) - 1
+        self.name = name
+        self.sql = sql
+        # %s → $1, $2, ... — типы параметров PostgreSQL выводит сам
+        self.prepare_sql = f"PREPARE {name} AS " + ''.join(
+            part + (f"${i}" if i <= params else '') for i, part in enumerate(parts, 1)
+        )
+        self.execute_sql = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * params)})" if params else '')
+
+
+class StatementRegistry:
+    """
+    Какие запросы выполнять как серверные подготовленные операторы (PREPARE/EXECUTE).
+    Каждое соединение пула готовит оператор один раз — при первом выполнении —
+    и дальше шлёт только EXECUTE имя (параметры), без разбора и планирования.
+      - register(name, sql)      — горячий запрос с понятным именем, готовится сразу
+      - lookup(sql) → оператор или None (выполнять как обычно)
+      - stats()                  — число обращений к подготовленным и обычным запросам
+    По умолчанию готовятся только зарегистрированные запросы (queries.PREPARED_STATEMENTS
+    и формы страниц TaskRepository.page_statements). С threshold > 0 незарегистрированный
+    запрос с параметрами становится подготовленным после threshold выполнений (имя — по
+    хешу текста), не больше max_auto таких запросов. Это относится ко всему SQL процесса,
+    включая фоновые задачи, поэтому включается явно (DB_PREPARE_THRESHOLD).
+      - is_registered(sql)       — зарегистрирован ли запрос (без учёта в stats)
+    """
+
+    def __init__(self, threshold=0, max_auto=256):
+        """
+        :param threshold: после скольких выполнений готовить незарегистрированный запрос (0 — только зарегистрированные)
+        :param max_auto: сколько незарегистрированных запросов готовить
+        """
+        self.threshold = threshold
+        self.max_auto = max_auto
+        self._statements = {}
+        self._auto = 0
+        self._counts = OrderedDict()     # SQL → число выполнений (кандидаты)
+        self._lock = threading.Lock()
+        self._stats = {'prepared_hits': 0, 'plain': 0}
+
+    def register(self, name, sql):
+        with self._lock:
+            self._statements[sql] = _Statement(name, sql)
+
+    def register_all(self, statements):
+        """
+        :param statements: dict имя → SQL
+        """
+        for name, sql in statements.items():
+            self.register(name, sql)
+
+    def is_registered(self, sql):
+        with self._lock:
+            return sql in self._statements
+
+    def lookup(self, sql):
+        with self._lock:
+            statement = self._statements.get(sql)
+            if statement is not None:
+                self._stats['prepared_hits'] += 1
+                return statement
+            self._stats['plain'] += 1
+            if not self.threshold or self._auto >= self.max_auto or '%s' not in sql:
+                return None
+            count = self._counts.pop(sql, 0) + 1
+            if count < self.threshold:
+                self._counts[sql] = count
+                while len(self._counts) > self.max_auto * 4:
+                    self._counts.popitem(last=False)
+                return None
+            name = 'q_' + hashlib.blake2b(sql.encode(), digest_size=6).hexdigest()
+            statement = self._statements[sql] = _Statement(name, sql)
+            self._auto += 1
+            return statement
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, statements=len(self._statements), auto=self._auto)
+
+
+# Нормализация текста запроса в «отпечаток»: параметры и числа → ?, списки IN (?, ?) → IN (...).
+# Строковые литералы остаются: в коде бота это константы (статусы), а не значения пользователя.
+_WHITESPACE = re.compile(r'\s+')
+_PARAMS = re.compile(r'%s|\$\d+|(?<![\w.])\d+(?:\.\d+)?(?![\w.])')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+# План строится только для запросов, которые EXPLAIN принимает
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def fingerprint(sql):
+    """
+    Текст запроса без значений: одинаковые по форме запросы дают один отпечаток.
+    """
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(...)', _PARAMS.sub('?', sql))
+
+
+class QueryLog:
+    """
+    Время выполнения запросов по отпечаткам (fingerprint):
+      - record(sql, params, seconds, rows, error) — учесть одно выполнение
+      - stats()                  — {отпечаток: число, всего/макс. секунд, строк, ошибок}
+      - report(limit, order)     — текстовый топ запросов (по total, max, count или rows)
+      - stop()                   — остановить поток построения планов
+    Запросы дольше threshold пишутся в лог вместе с планом EXPLAIN. План строит
+    функция explain(sql, params) в отдельном потоке, не чаще раза в explain_interval
+    секунд для одного отпечатка, — обработчик на это время не задерживается.
+    """
+
+    MAX_PENDING_PLANS = 100
+
+    def __init__(self, threshold=0.2, explain=None, explain_interval=300.0, max_fingerprints=1000):
+        """
+        :param threshold: с какой длительности (секунд) запрос считается медленным; None — не логировать
+        :param explain: функция (sql, params) → текст плана или None (логировать без плана)
+        :param explain_interval: как часто строить план для одного и того же отпечатка, секунд
+        :param max_fingerprints: сколько отпечатков хранить (остальные учитываются как «прочие»)
+        """
+        self.threshold = threshold
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._fingerprints = {}      # SQL → отпечаток (тексты запросов бота почти все константы)
+        self._stats = {}             # отпечаток → [число, всего, макс., строк, ошибок]
+        self._explained = {}         # отпечаток → когда последний раз строили план
+        self._plans = None
+        self._thread = None
+
+    def _fingerprint(self, sql):
+        fp = self._fingerprints.get(sql)
+        if fp is None:
+            fp = fingerprint(sql)
+            if len(self._fingerprints) >= self.max_fingerprints * 4:
+                self._fingerprints.clear()
+            self._fingerprints[sql] = fp
+        return fp
+
+    def record(self, sql, params, seconds, rows=0, error=None):
+        with self._lock:
+            fp = self._fingerprint(sql)
+            entry = self._stats.get(fp)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    fp = '<прочие запросы>'
+                    entry = self._stats.get(fp)
+                if entry is None:
+                    entry = self._stats[fp] = [0, 0.0, 0.0, 0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+            entry[3] += max(rows or 0, 0)
+            if error is not None:
+                entry[4] += 1
+
+            if self.threshold is None or seconds < self.threshold or error is not None:
+                return
+            explain = self.explain is not None and sql.lstrip()[:6].upper().startswith(_EXPLAINABLE)
+            if explain:
+                now = time.monotonic()
+                if now - self._explained.get(fp, -self.explain_interval) < self.explain_interval:
+                    explain = False
+                else:
+                    self._explained[fp] = now
+
+        if not explain:
+            print(f"Медленный запрос {seconds * 1000:.0f} мс: {fp}")
+            return
+        self._start()
+        try:
+            self._plans.put_nowait((fp, sql, params, seconds))
+        except queue.Full:
+            print(f"Медленный запрос {seconds * 1000:.0f} мс: {fp}")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._plans = queue.Queue(self.MAX_PENDING_PLANS)
+                self._thread = threading.Thread(target=self._explain_loop, name='db-explain', daemon=True)
+                self._thread.start()
+
+    def _explain_loop(self):
+        while True:
+            item = self._plans.get()
+            if item is None:
+                return
+            fp, sql, params, seconds = item
+            try:
+                plan = self.explain(sql, params)
+            except Exception as e:
+                plan = f"(не удалось построить план: {e})"
+            print(f"Медленный запрос {seconds * 1000:.0f} мс: {fp}\n{plan}")
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._plans.put(None)
+            thread.join(5)
+
+    def stats(self):
+        with self._lock:
+            return {
+                fp: {'count': e[0], 'total': e[1], 'max': e[2], 'rows': e[3], 'errors': e[4]}
+                for fp, e in self._stats.items()
+            }
+
+    def report(self, limit=10, order='total'):
+        """
+        Топ-limit запросов, отсортированных по order (total, max, count или rows).
+        """
+        stats = sorted(self.stats().items(), key=lambda item: item[1][order], reverse=True)[:limit]
+        lines = [
+            f"{'всего, мс':>10} {'вызовов':>8} {'средн., мс':>10} {'макс., мс':>10} {'строк':>8} {'ошибок':>6}  запрос"
+        ]
+        for fp, e in stats:
+            lines.append(
+                f"{e['total'] * 1000:>10.1f} {e['count']:>8} {e['total'] / e['count'] * 1000:>10.2f} "
+                f"{e['max'] * 1000:>10.1f} {e['rows']:>8} {e['errors']:>6}  {fp[:120]}"
+            )
+        return '\n'.join(lines)
+
+
+class PreparingCursor(extensions.cursor):
+    """
+    Курсор, который выполняет запросы из StatementRegistry через EXECUTE.
+    Код обработчиков не меняется: cur.execute(sql, args) как обычно.
+    Каждый запрос замеряется: время попадает в журнал запросов соединения
+    (QueryLog) и наблюдателю (Database.observer), если они заданы.
+    """
+
+    def execute(self, query, vars=None):
+        conn = self.connection
+        query_log, observer = conn.query_log, conn.observer
+        if query_log is None and observer is None:
+            return self._execute(query, vars)
+        started = time.perf_counter()
+        error = None
+        try:
+            return self._execute(query, vars)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            if query_log is not None:
+                query_log.record(query, vars, seconds, self.rowcount, error)
+            if observer is not None:
+                observer(query, seconds, error)
+
+    def _execute(self, query, vars):
+        conn = self.connection
+        statement = None
+        if conn.statements is not None and not isinstance(vars, dict):
+            statement = conn.statements.lookup(query)
+        if statement is None:
+            return super().execute(query, vars)
+        if statement.name not in conn.prepared:
+            # Оператор живёт до конца сессии: откат транзакции его не удаляет
+            super().execute(statement.prepare_sql)
+            conn.prepared.add(statement.name)
+        return super().execute(statement.execute_sql, vars)
+
+
+class PreparingConnection(extensions.connection):
+    """
+    Соединение psycopg2, которое помнит свои подготовленные операторы,
+    журнал запросов и наблюдателя.
+    """
+
+    def __init__(self, dsn, statements=None, observer=None, query_log=None, **kwargs):
+        super().__init__(dsn, **kwargs)
+        self.statements = statements
+        self.observer = observer
+        self.query_log = query_log
+        self.prepared = set()
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', PreparingCursor)
+        return super().cursor(*args, **kwargs)
+
+
+class PoolTimeoutError(Exception):
+    """
+    Не удалось получить соединение из пула за отведённое время.
+    """
+
+
+class ConnectionPool:
+    """
+    Ограниченный потокобезопасный пул соединений PostgreSQL:
+      - getconn(timeout)        — выдаёт соединение (ждёт, если пул исчерпан)
+      - putconn(conn, discard)  — возвращает соединение в пул
+      - connection()            — контекстный менеджер поверх getconn/putconn
+      - stats()                 — счётчики выдач и времени ожидания
+    """
+
+    def __init__(self, db_config, minconn=1, maxconn=10, timeout=5.0, ping_after=30.0, statements=None,
+                 observer=None, query_log=None):
+        """
+        :param db_config: параметры для psycopg2.connect
+        :param minconn: сколько соединений открыть заранее
+        :param maxconn: верхняя граница числа открытых соединений
+        :param timeout: сколько секунд ждать свободное соединение
+        :param ping_after: через сколько секунд простоя проверять соединение через SELECT 1
+        :param statements: StatementRegistry — подготовленные операторы (None — без них)
+        :param observer: функция (sql, секунд, исключение) — вызывается после каждого запроса
+        :param query_log: QueryLog — время запросов по отпечаткам и лог медленных (None — без него)
+        """
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Некорректные границы пула соединений")
+
+        self._db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.statements = statements
+        self.observer = observer
+        self.query_log = query_log
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, время возврата в пул)]
+        self._opened = 0         # всего открытых соединений (свободные + выданные)
+        self._closed = False
+
+        # Статистика
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._opened += 1
+
+    def _connect(self):
+        if self.statements is None and self.observer is None and self.query_log is None:
+            return psycopg2.connect(**self._db_config)
+        return psycopg2.connect(
+            connection_factory=lambda dsn, **kwargs: PreparingConnection(
+                dsn, self.statements, self.observer, self.query_log, **kwargs
+            ),
+            **self._db_config
+        )
+
+    def _is_healthy(self, conn, idle_since):
+        """
+        Проверка соединения при выдаче: закрытые и «сломанные» отбрасываем,
+        долго простаивавшие проверяем запросом SELECT 1.
+        """
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if self.ping_after is not None and time.monotonic() - idle_since >= self.ping_after:
+            try:
+                # Обычный курсор: проверка пула — не запрос бота, в журнал и метрики не попадает
+                cur = conn.cursor(cursor_factory=extensions.cursor)
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout=None):
+        """
+        Возвращает соединение из пула. Если все заняты и лимит исчерпан —
+        ждёт до timeout секунд, затем бросает PoolTimeoutError.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("Пул соединений закрыт")
+                while not self._idle and self._opened >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Нет свободных соединений ({self.maxconn}) за {timeout} с"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    # Резервируем слот под новое соединение
+                    conn, idle_since = None, None
+                    self._opened += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, idle_since):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._opened -= 1
+                    self._discarded += 1
+                    self._cond.notify()
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._checkouts += 1
+                self._wait_total += waited
+                if waited > self._wait_max:
+                    self._wait_max = waited
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Возвращает соединение в пул. Незавершённая транзакция откатывается;
+        сломанные соединения (или discard=True) закрываются.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if conn.closed:
+            discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._close_quietly(conn)
+                self._opened -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        with pool.connection() as conn: ...
+        При исключении транзакция откатывается, соединение возвращается в пул.
+        """
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+        except psycopg2.InterfaceError:
+            discard = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def stats(self):
+        """
+        Снимок статистики пула.
+        """
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'size': self._opened,
+                'idle': len(self._idle),
+                'in_use': self._opened - len(self._idle),
+                'max_size': self.maxconn,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'wait_total': self._wait_total,
+                'wait_avg': self._wait_total / checkouts if checkouts else 0.0,
+                'wait_max': self._wait_max,
+            }
+
+    def closeall(self):
+        """
+        Закрывает все свободные соединения; выданные закроются при возврате.
+        """
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._opened -= len(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
 
 
 class Database:
     """
     Класс для работы с PostgreSQL:
-      - get_db_connection() — возвращает новое соединение
+      - connection()        — контекстный менеджер: соединение из пула
+      - get_db_connection() — возвращает новое (не пуловое) соединение
+      - pool_stats()        — статистика пула соединений
       - init_db()           — инициализирует (создаёт) таблицы и индексы
+      - statements          — StatementRegistry: зарегистрированные горячие запросы идут
+                              через PREPARE/EXECUTE (DB_PREPARE=0 — выключить; обязательно
+                              за pgbouncer в режиме pool_mode=transaction)
+      - is_prepared(sql)    — готовить ли запрос (для execute(..., prepare=) в psycopg 3)
+      - observer            — функция (sql, секунд, исключение), которой сообщается время
+                              каждого запроса (метрики); задаётся до первого обращения к БД
+      - query_log           — QueryLog: время запросов по отпечаткам, медленные — в лог
+                              с планом EXPLAIN (DB_QUERY_LOG=0 — выключить)
+      - query_report(limit) — топ запросов по суммарному времени
+    Для asyncio-режима (AsyncBotApp) — асинхронный пул на psycopg 3
+    (пакеты psycopg и psycopg_pool нужны только в этом режиме):
+      - open_async() / close_async() — открыть / закрыть пул внутри цикла событий
+      - connection_async()          — async-контекстный менеджер: соединение из пула
+      - async_pool_stats()          — статистика асинхронного пула
     """
 
     def __init__(self):
@@ -23,52 +601,254 @@ class Database:
             'port':     os.getenv('DB_PORT', '5432'),
         }
 
+        # Параметры пула соединений
+        self._pool_config = {
+            'minconn':    int(os.getenv('DB_POOL_MIN', '1')),
+            'maxconn':    int(os.getenv('DB_POOL_MAX', '10')),
+            'timeout':    float(os.getenv('DB_POOL_TIMEOUT', '5')),
+            'ping_after': float(os.getenv('DB_POOL_PING_AFTER', '30')),
+        }
+        # Подготовленные операторы: в синхронном пуле — StatementRegistry,
+        # в асинхронном — execute(prepare=True) для тех же запросов (TaskRepository).
+        # DB_PREPARE_THRESHOLD > 0 — дополнительно готовить любой запрос после N выполнений
+        self.prepare = os.getenv('DB_PREPARE', '1') == '1'
+        self.prepare_threshold = int(os.getenv('DB_PREPARE_THRESHOLD', '0'))
+        self.statements = StatementRegistry(self.prepare_threshold) if self.prepare else None
+        self.observer = None
+
+        # Журнал запросов: DB_SLOW_QUERY_MS — порог медленного запроса (0 — не логировать),
+        # DB_EXPLAIN_SLOW=0 — логировать без плана
+        self.query_log = None
+        if os.getenv('DB_QUERY_LOG', '1') == '1':
+            slow_ms = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+            self.query_log = QueryLog(
+                threshold=slow_ms / 1000 if slow_ms > 0 else None,
+                explain=self.explain if os.getenv('DB_EXPLAIN_SLOW', '1') == '1' else None,
+            )
+
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._async_pool = None
+
+    @property
+    def pool(self):
+        """
+        Пул создаётся лениво — при первом обращении к БД.
+        """
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self._db_config, statements=self.statements, observer=self.observer,
+                        query_log=self.query_log, **self._pool_config
+                    )
+        return self._pool
+
+    def connection(self, timeout=None):
+        """
+        Соединение из пула в виде контекстного менеджера:
+            with self.db.connection() as conn:
+                ...
+        """
+        return self.pool.connection(timeout)
+
     def get_db_connection(self):
         """
-        Возвращает новое соединение к базе данных.
+        Возвращает новое соединение к базе данных (в обход пула).
         Вызывает исключение, если не получилось подключиться.
         """
         return psycopg2.connect(**self._db_config)
 
+    def is_prepared(self, sql):
+        return self.statements is not None and self.statements.is_registered(sql)
+
+    def pool_stats(self):
+        """
+        Статистика пула: число выдач, время ожидания, занятые/свободные соединения.
+        """
+        if self._pool is None:
+            return {}
+        return self._pool.stats()
+
+    def explain(self, sql, params=None):
+        """
+        План запроса (EXPLAIN без выполнения) на соединении из пула.
+        """
+        with self.connection() as conn:
+            # Обычный курсор: план не должен попадать в журнал и готовиться как оператор
+            cur = conn.cursor(cursor_factory=extensions.cursor)
+            try:
+                cur.execute("EXPLAIN " + sql, params)
+                return '\n'.join(row[0] for row in cur.fetchall())
+            finally:
+                cur.close()
+                conn.rollback()
+
+    def query_report(self, limit=10, order='total'):
+        """
+        Топ запросов из журнала (QueryLog.report) или '', если журнал выключен.
+        """
+        if self.query_log is None:
+            return ''
+        return self.query_log.report(limit, order)
+
+    def close(self):
+        """
+        Закрывает пул соединений.
+        """
+        if self.query_log is not None:
+            self.query_log.stop()
+        if self._pool is not None:
+            self._pool.closeall()
+
+    async def open_async(self):
+        """
+        Открывает асинхронный пул (вызывать из работающего цикла событий).
+        """
+        if self._async_pool is not None:
+            return
+        try:
+            from psycopg import AsyncCursor
+            from psycopg.conninfo import make_conninfo
+            from psycopg_pool import AsyncConnectionPool
+        except ImportError:
+            raise RuntimeError("Для asyncio-режима нужны пакеты psycopg и psycopg_pool")
+
+        db = self
+
+        class TimedAsyncCursor(AsyncCursor):
+            """
+            Курсор psycopg 3, который, как PreparingCursor, сообщает время каждого
+            запроса журналу (query_log) и наблюдателю (observer) Database.
+            """
+
+            async def execute(self, query, params=None, **kwargs):
+                started = time.perf_counter()
+                error = None
+                try:
+                    return await super().execute(query, params, **kwargs)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    db._record_query(query, params, time.perf_counter() - started, self.rowcount, error)
+
+        config = dict(self._db_config)
+        config['dbname'] = config.pop('database')
+        pool = AsyncConnectionPool(
+            make_conninfo(**config),
+            min_size=max(1, self._pool_config['minconn']),
+            max_size=self._pool_config['maxconn'],
+            timeout=self._pool_config['timeout'],
+            max_idle=max(self._pool_config['ping_after'], 60.0),
+            # None — драйвер сам не готовит операторы (только execute(prepare=True));
+            # N — готовит любой запрос после N выполнений (DB_PREPARE_THRESHOLD)
+            kwargs={
+                'prepare_threshold': self.prepare_threshold if self.prepare and self.prepare_threshold else None,
+                'cursor_factory': TimedAsyncCursor,
+            },
+            open=False,
+        )
+        await pool.open()
+        self._async_pool = pool
+
+    def _record_query(self, query, params, seconds, rows, error):
+        # Время запроса асинхронного пула (синхронный пул замеряет PreparingCursor)
+        if not isinstance(query, str):
+            return
+        if self.query_log is not None:
+            self.query_log.record(query, params, seconds, rows, error)
+        if self.observer is not None:
+            self.observer(query, seconds, error)
+
+    def connection_async(self, timeout=None):
+        """
+        Соединение из асинхронного пула:
+            async with self.db.connection_async() as conn:
+                ...
+        При исключении транзакция откатывается, соединение возвращается в пул.
+        """
+        if self._async_pool is None:
+            raise RuntimeError("Асинхронный пул не открыт: вызовите open_async()")
+        return self._async_pool.connection(timeout)
+
+    def async_pool_stats(self):
+        """
+        Статистика асинхронного пула (счётчики psycopg_pool).
+        """
+        if self._async_pool is None:
+            return {}
+        return self._async_pool.get_stats()
+
+    async def close_async(self):
+        if self._async_pool is not None:
+            await self._async_pool.close()
+            self._async_pool = None
+
     def init_db(self):
         """
         Создаёт необходимые таблицы и индексы, если их нет.
-        После выполнения соединение и курсор закрываются автоматически.
-        """
-        conn = self.get_db_connection()
-        cur = conn.cursor()
-
-        # Таблица пользователей
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id       BIGINT      PRIMARY KEY,
-                username      VARCHAR(100),
-                registered_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-            );
-        """)
-
-        # Таблица задач
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                task_id     SERIAL       PRIMARY KEY,
-                user_id     BIGINT       REFERENCES users(user_id),
-                title       VARCHAR(255) NOT NULL,
-                description TEXT,
-                priority    VARCHAR(10)  CHECK (priority IN ('high', 'medium', 'low')) DEFAULT 'medium',
-                category    VARCHAR(100),
-                tags        VARCHAR(255)[],
-                deadline    TIMESTAMP WITH TIME ZONE,
-                status      VARCHAR(20)  CHECK (status IN ('active', 'completed', 'overdue')) DEFAULT 'active',
-                created_at  TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                updated_at  TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-            );
-        """)
-
-        # Индексы для ускорения выборок
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_id  ON tasks(user_id);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status   ON tasks(status);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks(deadline);")
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        """
+        with self.connection() as conn:
+            cur = conn.cursor()
+
+            # Таблица пользователей
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id       BIGINT      PRIMARY KEY,
+                    username      VARCHAR(100),
+                    registered_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+            """)
+
+            # Таблица задач
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id     SERIAL       PRIMARY KEY,
+                    user_id     BIGINT       REFERENCES users(user_id),
+                    title       VARCHAR(255) NOT NULL,
+                    description TEXT,
+                    priority    VARCHAR(10)  CHECK (priority IN ('high', 'medium', 'low')) DEFAULT 'medium',
+                    category    VARCHAR(100),
+                    tags        VARCHAR(255)[],
+                    deadline    TIMESTAMP WITH TIME ZONE,
+                    status      VARCHAR(20)  CHECK (status IN ('active', 'completed', 'overdue')) DEFAULT 'active',
+                    created_at  TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    updated_at  TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+            """)
+
+            # Шаги незавершённых диалогов (conversation.PostgresStateStore)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_state (
+                    chat_id    BIGINT      PRIMARY KEY,
+                    state      TEXT        NOT NULL,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                );
+            """)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversation_state_updated ON conversation_state(updated_at);"
+            )
+
+            # Хранимый ранг приоритета: по нему сортируются все списки
+            cur.execute("""
+                ALTER TABLE tasks ADD COLUMN IF NOT EXISTS priority_rank SMALLINT
+                    GENERATED ALWAYS AS (
+                        CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 ELSE 4 END
+                    ) STORED;
+            """)
+
+            # Дедлайн, о котором уже напомнили (reminders.ReminderScheduler): напоминание
+            # забирает один экземпляр бота; новый дедлайн снова делает задачу доступной
+            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS reminded_for TIMESTAMP WITH TIME ZONE;")
+
+            # Индексы для ускорения выборок
+            for statement in INDEXES:
+                cur.execute(statement)
+            # Отдельный индекс по status почти не селективен и заменён частичными;
+            # idx_tasks_active_rank заменён на idx_tasks_open_rank (с просроченными)
+            cur.execute("DROP INDEX IF EXISTS idx_tasks_status;")
+            cur.execute("DROP INDEX IF EXISTS idx_tasks_active_rank;")
+
+            conn.commit()
+            cur.close()
@@ -0,0 +1,155 @@
+# dispatcher.py
+
+import os
+import queue
+import threading
+import time
+
+
+def default_workers():
+    """
+    Число воркеров по умолчанию: обработчики в основном ждут БД и Telegram,
+    поэтому берём по два на ядро (не меньше двух).
+    """
+    return max(2, (os.cpu_count() or 1) * 2)
+
+
+def update_chat_id(update):
+    """
+    Ключ упорядочивания для telebot.types.Update — id чата
+    (для callback-запросов — чат сообщения с кнопкой).
+    """
+    for attr in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        msg = getattr(update, attr, None)
+        if msg is not None:
+            return msg.chat.id
+    call = getattr(update, 'callback_query', None)
+    if call is not None:
+        if call.message is not None:
+            return call.message.chat.id
+        return call.from_user.id
+    return update.update_id
+
+
+class _Lane:
+    """
+    Одна очередь и её поток-воркер.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.processed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self.thread = None
+
+
+class ChatDispatcher:
+    """
+    Пул воркеров с сохранением порядка внутри чата:
+    chat_id хешируется на одну из N очередей, поэтому обновления одного чата
+    выполняются строго последовательно, а разные чаты — параллельно.
+      - submit(key, fn, *args, block=False) — поставить задачу в очередь чата key;
+                                 False — очередь полна, задача не принята
+      - stats()                — глубина очередей, загрузка воркеров, задержка, отказы
+      - stop()                 — дождаться опустошения очередей и остановить потоки
+    """
+
+    _STOP = object()
+
+    def __init__(self, workers=None, maxsize=256):
+        """
+        :param workers: число очередей/потоков (по умолчанию — default_workers())
+        :param maxsize: предел длины каждой очереди (0 — без ограничения)
+        """
+        self.workers = workers or default_workers()
+        self._lanes = [_Lane(maxsize) for _ in range(self.workers)]
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        for i, lane in enumerate(self._lanes):
+            lane.thread = threading.Thread(
+                target=self._loop, args=(lane,), name=f'dispatch-{i}', daemon=True
+            )
+            lane.thread.start()
+
+    def lane_index(self, key):
+        return hash(key) % self.workers
+
+    def submit(self, key, fn, *args, block=False):
+        """
+        Ставит fn(*args) в очередь, закреплённую за key.
+        :param block: ждать места в заполненной очереди (иначе сразу отказ)
+        :return: False, если очередь заполнена и задача не принята
+        """
+        lane = self._lanes[self.lane_index(key)]
+        try:
+            lane.queue.put((time.monotonic(), fn, args), block=block)
+        except queue.Full:
+            with self._lock:
+                lane.rejected += 1
+            return False
+        return True
+
+    def _loop(self, lane):
+        while True:
+            item = lane.queue.get()
+            if item is self._STOP:
+                lane.queue.task_done()
+                return
+            enqueued, fn, args = item
+            started = time.monotonic()
+            lag = started - enqueued
+            try:
+                fn(*args)
+            except Exception as e:
+                with self._lock:
+                    lane.errors += 1
+                print(f"Ошибка в обработчике обновления: {e}")
+            finally:
+                with self._lock:
+                    lane.processed += 1
+                    lane.busy += time.monotonic() - started
+                    lane.lag_last = lag
+                    lane.lag_total += lag
+                    if lag > lane.lag_max:
+                        lane.lag_max = lag
+                lane.queue.task_done()
+
+    def stats(self):
+        """
+        Снимок метрик по каждой очереди и в сумме.
+        """
+        uptime = max(time.monotonic() - self._started_at, 1e-9)
+        with self._lock:
+            lanes = [
+                {
+                    'depth': lane.queue.qsize(),
+                    'processed': lane.processed,
+                    'errors': lane.errors,
+                    'rejected': lane.rejected,
+                    'utilization': min(lane.busy / uptime, 1.0),
+                    'lag_last': lane.lag_last,
+                    'lag_max': lane.lag_max,
+                    'lag_avg': lane.lag_total / lane.processed if lane.processed else 0.0,
+                }
+                for lane in self._lanes
+            ]
+        return {
+            'workers': self.workers,
+            'depth': sum(l['depth'] for l in lanes),
+            'processed': sum(l['processed'] for l in lanes),
+            'errors': sum(l['errors'] for l in lanes),
+            'rejected': sum(l['rejected'] for l in lanes),
+            'utilization': sum(l['utilization'] for l in lanes) / self.workers,
+            'lanes': lanes,
+        }
+
+    def stop(self, timeout=None):
+        for lane in self._lanes:
+            lane.queue.put(self._STOP)
+        for lane in self._lanes:
+            lane.thread.join(timeout)
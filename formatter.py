@@ -1,46 +1,108 @@
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import pytz
 from config import MOSCOW_TZ
 
 
+# Максимальная длина текста сообщения Telegram (в единицах UTF-16)
+MESSAGE_LIMIT = 4096
+
+
+def tg_len(text: str) -> int:
+    """
+    Длина строки так, как её считает Telegram: в кодовых единицах UTF-16.
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+# Разметка Markdown (parse_mode='Markdown'), которая должна быть парной
+MARKDOWN_MARKS = ('`', '*', '_')
+
+
+def cut_markdown(text: str, room: int) -> str:
+    """
+    Обрезает текст до room единиц UTF-16 так, чтобы не осталось незакрытой
+    сущности Markdown (иначе Telegram отклонит всё сообщение):
+    текст после непарного `, * или _ отбрасывается.
+    """
+    while tg_len(text) > room:
+        text = text[:-max(1, tg_len(text) - room)]
+    while True:
+        odd = [text.rindex(mark) for mark in MARKDOWN_MARKS if text.count(mark) % 2]
+        if not odd:
+            return text
+        text = text[:max(odd)]
+
+
+# Эмодзи приоритетов и разделитель карточек — общие для всех вызовов
+PRIORITY_EMOJI = {
+    'high': '🔴',
+    'medium': '🟡',
+    'low': '🟢'
+}
+TASK_SEPARATOR = "──────────────────"
+
+
 class TaskFormatter:
     """
     Формирует текстовые представления задач:
-      - format_deadline(deadline) → str
+      - format_deadline(deadline, now=None) → str
       - get_priority_emoji(priority) → str
-      - format_task(task: dict) → str
+      - format_task(task: dict, now=None) → str
+      - format_tasks(tasks, now=None) → [str] — пачка карточек с одним «сейчас»
+      - format_task_page(blocks, header, tasks=None) → (str, int)
+      - invalidate(task_id) / stats() — кеш карточек
+    Карточки кешируются (LRU) по версии задачи (task_id, updated_at): при
+    повторной отрисовке пересобирается только текст дедлайна, и не чаще
+    раза в минуту.
     """
 
-    def __init__(self, timezone: pytz.BaseTzInfo = MOSCOW_TZ):
+    def __init__(self, timezone: pytz.BaseTzInfo = MOSCOW_TZ, cache_size=5000):
+        """
+        :param timezone: часовой пояс отображения дедлайнов
+        :param cache_size: сколько карточек держать в кеше (0 — без кеша)
+        """
         self.timezone = timezone
+        self.cache_size = cache_size
+        # task_id → (updated_at, заголовок, теги, дедлайн, минута, текст дедлайна)
+        self._cards = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
 
     def get_priority_emoji(self, priority: str) -> str:
 
         #Возвращает эмодзи для приоритета
-        return {
-            'high': '🔴',
-            'medium': '🟡',
-            'low': '🟢'
-        }.get(priority, '')
+        return PRIORITY_EMOJI.get(priority, '')
 
-    def format_deadline(self, deadline: datetime) -> str:
+    def _now_local(self, now=None):
+        if now is None:
+            now = datetime.now(pytz.utc)
+        return now.astimezone(self.timezone)
+
+    def format_deadline(self, deadline: datetime, now: datetime = None) -> str:
         """
         Преобразует UTC-дату дедлайна в строку вида:
           "⏰ DD.MM.YYYY HH:MM, сегодня через HH:MM"
           или "❗️ DD.MM.YYYY HH:MM, X дн. назад" и т.п.
         Если deadline is None — возвращает пустую строку.
+        now — момент отсчёта (по умолчанию текущее время).
         """
         if not deadline:
             return ""
+        now_local = self._now_local(now)
+        return self._deadline_text(deadline, now_local, now_local.date())
 
+    def _deadline_text(self, deadline, now_local, today):
         # Переводим в локальное время (Московское)
         dl_local = deadline.astimezone(self.timezone)
-        now_local = datetime.now(pytz.utc).astimezone(self.timezone)
 
-        date_str = dl_local.strftime('%d.%m.%Y %H:%M')
+        # То же, что strftime('%d.%m.%Y %H:%M'), но заметно быстрее на длинных списках
+        date_str = (f"{dl_local.day:02d}.{dl_local.month:02d}.{dl_local.year} "
+                    f"{dl_local.hour:02d}:{dl_local.minute:02d}")
         delta = dl_local - now_local
         secs = delta.total_seconds()
-        date_diff = (dl_local.date() - now_local.date()).days
+        date_diff = (dl_local.date() - today).days
 
         # часы и минуты в абсолютном значении
         hours = int(abs(secs) // 3600)
@@ -63,23 +125,141 @@ class TaskFormatter:
         rel = "1 дн. назад" if ago == 1 else f"{ago} дн. назад"
         return f"❗️ {date_str}, {rel}"
 
-    def format_task(self, task: dict) -> str:
+    def format_task(self, task: dict, now: datetime = None) -> str:
         """
         Собирает из словаря task текст сообщения:
         эмодзи приоритета, заголовок, описание, дедлайн и теги.
         """
-        emoji = self.get_priority_emoji(task.get('priority', ''))
-        deadline_text = self.format_deadline(task.get('deadline'))
-        tags = task.get('tags') or []
-        tags_text = f"\n🏷 {' '.join('#' + t for t in tags)}" if tags else ""
+        now_local = self._now_local(now)
+        return self._task_text(task, now_local, now_local.date())
+
+    def format_tasks(self, tasks, now: datetime = None) -> list:
+        """
+        То же, что format_task для каждой задачи, но «сейчас» и текущая дата
+        вычисляются один раз на всю пачку (списки, рассылки).
+        """
+        now_local = self._now_local(now)
+        today = now_local.date()
+        return [self._task_text(task, now_local, today) for task in tasks]
+
+    def _task_text(self, task, now_local, today):
+        task_id = task.get('task_id')
+        version = task.get('updated_at')
+        if not self.cache_size or task_id is None or version is None:
+            head, tail = self._card_parts(task)
+            deadline = task.get('deadline')
+            dl_text = self._deadline_text(deadline, now_local, today) if deadline else None
+            return self._join_card(head, dl_text, tail)
 
-        message = f"{emoji} *{task.get('title', '')}*"
+        minute = int(now_local.timestamp()) // 60
+        with self._lock:
+            entry = self._cards.get(task_id)
+            if entry is not None and entry[0] == version:
+                self._cards.move_to_end(task_id)
+                self._stats['hits'] += 1
+            else:
+                entry = None
+                self._stats['misses'] += 1
+
+        if entry is None:
+            head, tail = self._card_parts(task)
+            deadline = task.get('deadline')
+            dl_minute, dl_text = None, None
+        else:
+            _, head, tail, deadline, dl_minute, dl_text = entry
+
+        # Меняется со временем только текст дедлайна — пересчитываем его раз в минуту
+        if deadline and dl_minute != minute:
+            dl_text = self._deadline_text(deadline, now_local, today)
+        if entry is None or dl_minute != minute:
+            with self._lock:
+                self._cards[task_id] = (version, head, tail, deadline, minute, dl_text)
+                self._cards.move_to_end(task_id)
+                while len(self._cards) > self.cache_size:
+                    self._cards.popitem(last=False)
+        return self._join_card(head, dl_text, tail)
+
+    @staticmethod
+    def _card_parts(task):
+        """
+        Неизменные части карточки: (заголовок с описанием, теги с разделителем).
+        """
+        head = f"{PRIORITY_EMOJI.get(task.get('priority', ''), '')} *{task.get('title', '')}*"
         if task.get('description'):
-            message += f"\n📝 {task['description']}"
-        if deadline_text:
-            message += f"\n{deadline_text}"
-        if tags_text:
-            message += tags_text
-
-        message += "\n──────────────────"
-        return message
+            head = f"{head}\n📝 {task['description']}"
+        tags = task.get('tags')
+        tail = f"🏷 {' '.join('#' + t for t in tags)}\n{TASK_SEPARATOR}" if tags else TASK_SEPARATOR
+        return head, tail
+
+    @staticmethod
+    def _join_card(head, dl_text, tail):
+        if dl_text:
+            return "\n".join((head, dl_text, tail))
+        return "\n".join((head, tail))
+
+    def _fit_card(self, task, room):
+        """
+        Карточка не длиннее room: описание укорачивается до вставки в разметку
+        карточки, поэтому заголовок и теги остаются целыми.
+        """
+        head, tail = self._card_parts(dict(task, description=None))
+        dl_text = self.format_deadline(task.get('deadline'))
+        card = self._join_card(head, dl_text, tail)
+        description = task.get('description')
+        free = room - tg_len(card) - tg_len("\n📝 …")
+        if description and free > 0:
+            card = self._join_card(f"{head}\n📝 {cut_markdown(description, free)}…", dl_text, tail)
+        if tg_len(card) > room:
+            card = cut_markdown(card, room - 1) + "…"
+        return card
+
+    def invalidate(self, task_id):
+        """
+        Убирает карточку задачи из кеша (задача изменена или удалена).
+        """
+        with self._lock:
+            self._cards.pop(task_id, None)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result['size'] = len(self._cards)
+        lookups = result['hits'] + result['misses']
+        result['hit_ratio'] = result['hits'] / lookups if lookups else 0.0
+        return result
+
+    def format_task_page(self, blocks: list, header: str, reverse: bool = False,
+                         limit: int = MESSAGE_LIMIT, tasks: list = None) -> tuple:
+        """
+        Упаковывает в одно сообщение столько готовых карточек (format_task),
+        сколько помещается в limit, и нумерует их.
+        blocks идут от курсора; reverse=True — страница листается назад,
+        и отобранные карточки выводятся в обратном порядке.
+        Возвращает (текст, число вошедших карточек). Хотя бы одна карточка
+        попадает всегда: если она длиннее limit, её описание укорачивается
+        и карточка собирается заново (tasks — задачи, из которых сделаны blocks),
+        а без tasks обрезается готовый текст с закрытием разметки.
+        """
+        # Запас под номер вида "10. " и разделитель
+        prefix_len = 6
+        used = tg_len(header)
+        count = 0
+        for block in blocks:
+            size = tg_len(block) + prefix_len
+            if used + size > limit:
+                break
+            used += size
+            count += 1
+
+        chosen = list(blocks[:count])
+        if not chosen and blocks:
+            room = max(limit - tg_len(header) - prefix_len, 1)
+            if tasks:
+                chosen = [self._fit_card(tasks[0], room)]
+            else:
+                chosen = [cut_markdown(blocks[0], room - 1) + "…"]
+        if reverse:
+            chosen.reverse()
+
+        body = "\n".join(f"{i}. {block}" for i, block in enumerate(chosen, 1))
+        return f"{header}\n\n{body}", len(chosen)
@@ -0,0 +1,349 @@
+# handlers/async_handlers.py
+
+from telebot import asyncio_helper
+
+from handlers import steps
+from handlers.steps import AsyncStepSender
+from handlers.task_handlers import TaskHandler
+from handlers.callback_handlers import CallbackHandler
+
+
+def _not_modified(error):
+    return 'message is not modified' in str(error).lower()
+
+
+class AsyncTaskHandler(AsyncStepSender, TaskHandler):
+    """
+    TaskHandler для asyncio-режима (AsyncTeleBot + асинхронный пул Database).
+    Методы с теми же именами — корутины, в них только ввод-вывод: решения шагов
+    (handlers/steps.py), запросы (TaskRepository, методы *_async), форматирование,
+    клавиатуры и ключи списков — общие с синхронной версией.
+    :param bot: экземпляр AsyncRateLimitedBot
+    """
+
+    async def _register_user(self, user):
+        if not self.users.remember(user.id):
+            return
+        try:
+            await self.repo.register_user_async(user.id, user.username)
+        except Exception as e:
+            self.users.forget(user.id)
+            print(f"Error registering user: {e}")
+
+    async def send_welcome(self, message):
+        await self._register_user(message.from_user)
+        self.ui.show_main_menu(message.chat.id, force=True)
+        await self.bot.send_message(message.chat.id, steps.WELCOME_TEXT)
+
+    async def new_task(self, message):
+        await self._send_step(message.chat.id, steps.new_task())
+
+    async def process_task_title(self, message):
+        await self._send_step(message.chat.id, steps.task_title(message))
+
+    async def process_task_description(self, message, user_data):
+        await self._send_step(message.chat.id, steps.task_description(message, user_data))
+
+    async def process_task_priority(self, message, user_data):
+        await self._send_step(message.chat.id, steps.task_priority(message, user_data))
+
+    async def process_task_category(self, message, user_data):
+        await self._send_step(message.chat.id, steps.task_category(message, user_data))
+
+    async def process_task_tags(self, message, user_data):
+        await self._send_step(message.chat.id, steps.task_tags(message, user_data))
+
+    async def process_task_deadline(self, message, user_data):
+        chat_id = message.chat.id
+        retry = steps.task_deadline(message, user_data, self.parser)
+        if retry is not None:
+            await self._send_step(chat_id, retry)
+            return
+
+        try:
+            task = await self.repo.create_async(
+                message.from_user.id, message.from_user.username, **self._new_task_fields(user_data)
+            )
+        except Exception as e:
+            await self._send_step(chat_id, steps.failure(f"❌ Ошибка при создании задачи: {e}"))
+            return
+
+        self._task_created(message.from_user.id, task)
+        await self._send_step(chat_id, steps.task_saved("✅ Задача создана!\n\n", task, self.formatter, self.ui))
+
+    async def show_tasks(self, message):
+        await self._register_user(message.from_user)
+        await self._send_step(message.chat.id, steps.show_filters())
+
+    async def process_task_filter(self, message):
+        chat_id = message.chat.id
+        user_id = message.from_user.id
+        text = message.text
+
+        if text not in ('📂 Категории', '🏷 Теги'):
+            await self.send_task_list(chat_id, user_id, self.FILTER_BUTTONS.get(text, 'al'))
+            return
+
+        try:
+            if text == '📂 Категории':
+                values = await self.repo.distinct_categories_async(user_id)
+            else:
+                values = await self.repo.distinct_tags_async(user_id)
+        except Exception as e:
+            await self._send_step(chat_id, steps.failure(f"❌ Ошибка при загрузке задач: {e}"))
+            return
+        await self._send_step(chat_id, steps.filter_values(text, values))
+
+    async def show_tasks_by_category(self, message):
+        list_key = self._list_key('c', message.text.strip())
+        await self.send_task_list(message.chat.id, message.from_user.id, list_key)
+
+    async def show_tasks_by_tag(self, message):
+        list_key = self._list_key('t', message.text.strip().lstrip('#'))
+        await self.send_task_list(message.chat.id, message.from_user.id, list_key)
+
+    async def _resolve_list_arg(self, user_id, list_key):
+        known, value = self._known_list_arg(list_key)
+        if known:
+            return value
+        if list_key.startswith('c'):
+            values = await self.repo.distinct_categories_async(user_id, self.LIST_ARGS_LOOKUP)
+        elif list_key.startswith('t'):
+            values = await self.repo.distinct_tags_async(user_id, self.LIST_ARGS_LOOKUP)
+        else:
+            return None
+        return self._match_list_arg(list_key, values)
+
+    async def _render_page(self, user_id, list_key, page=1, cursor=None, backward=False):
+        list_filter = self._list_filter(list_key, await self._resolve_list_arg(user_id, list_key))
+        if list_filter is None:
+            return None
+        title, where, params = list_filter
+        result = await self.repo.list_by_filter_async(user_id, where, params, cursor, backward, self.PAGE_SIZE)
+        return self._build_page(title, list_key, result, page, cursor, backward)
+
+    async def send_task_list(self, chat_id, user_id, list_key):
+        try:
+            page = await self._render_page(user_id, list_key)
+        except Exception as e:
+            await self.bot.send_message(chat_id, f"❌ Ошибка при загрузке задач: {e}")
+            self.ui.show_main_menu(chat_id)
+            return
+
+        if page is None:
+            await self.bot.send_message(chat_id, self._empty_list_text(list_key))
+        else:
+            text, markup = page
+            await self.bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
+        self.ui.show_main_menu(chat_id)
+
+    async def handle_page_callback(self, call):
+        try:
+            list_key, page_no, backward, cursor = self._parse_page_data(call.data)
+        except ValueError:
+            await self.bot.answer_callback_query(call.id, "❌ Некорректные данные страницы")
+            return
+
+        try:
+            page = await self._render_page(call.from_user.id, list_key, page_no, cursor, backward)
+        except Exception as e:
+            await self.bot.answer_callback_query(call.id, f"❌ Ошибка: {e}")
+            return
+
+        if page is None:
+            await self.bot.answer_callback_query(call.id, "📭 Список устарел, откройте /mytasks заново")
+            return
+
+        await self.bot.answer_callback_query(call.id)
+        text, markup = page
+        try:
+            await self.bot.edit_message_text(
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                text=text,
+                reply_markup=markup,
+                parse_mode='Markdown'
+            )
+        except asyncio_helper.ApiException as e:
+            if not _not_modified(e):
+                raise
+
+
+class AsyncCallbackHandler(AsyncStepSender, CallbackHandler):
+    """
+    CallbackHandler для asyncio-режима: те же действия и шаги редактирования,
+    методы — корутины с одним вводом-выводом. Решения шагов (handlers/steps.py),
+    запросы (TaskRepository), форматирование и клавиатуры — общие с синхронной версией.
+    :param bot: экземпляр AsyncRateLimitedBot
+    """
+
+    async def handle_task_action(self, call):
+        action, task_id_str = call.data.split('_', 1)
+        try:
+            task_id = int(task_id_str)
+        except ValueError:
+            await self.bot.answer_callback_query(call.id, "❌ Некорректный идентификатор задачи")
+            return
+
+        await self.bot.answer_callback_query(call.id)
+        chat_id = call.message.chat.id
+
+        if action == 'complete':
+            return await self.complete_task(call, task_id)
+        if action == 'delete':
+            return await self.delete_task(call, task_id)
+        if action == 'open':
+            return await self.open_task(call, task_id)
+
+        if action == 'reschedule':
+            try:
+                deadline = await self.repo.deadline_async(task_id)
+            except Exception as e:
+                await self._send_step(chat_id, steps.failure(f"❌ Ошибка при получении задачи: {e}"))
+                return
+            await self._send_step(chat_id, steps.reschedule(task_id, deadline, self.parser))
+            return
+
+        if action == 'edit':
+            try:
+                old = await self.repo.edit_fields_async(task_id)
+            except Exception as e:
+                await self._send_step(chat_id, steps.failure(f"❌ Ошибка при получении задачи: {e}"))
+                return
+            await self._send_step(chat_id, steps.edit(task_id, old))
+            return
+
+        self.ui.show_main_menu(chat_id)
+
+    async def open_task(self, call, task_id):
+        chat_id = call.message.chat.id
+        try:
+            task = await self.repo.get_async(task_id, call.from_user.id)
+        except Exception as e:
+            await self.bot.send_message(chat_id, f"❌ Ошибка при получении задачи: {e}")
+            return
+
+        if not task:
+            await self.bot.send_message(chat_id, "❌ Задача не найдена.")
+            return
+
+        markup = None
+        if task.status != 'completed':
+            markup = self.ui.create_task_actions_markup(task_id)
+        await self.bot.send_message(
+            chat_id,
+            self.formatter.format_task(task),
+            reply_markup=markup,
+            parse_mode='Markdown'
+        )
+
+    async def complete_task(self, call, task_id):
+        try:
+            task = await self.repo.complete_async(task_id)
+        except Exception as e:
+            try:
+                await self.bot.answer_callback_query(call.id, f"❌ Ошибка: {e}")
+            except Exception:
+                pass
+            return
+
+        if not task:
+            await self.bot.answer_callback_query(call.id, "❌ Задача не найдена")
+            return
+
+        self.formatter.invalidate(task_id)
+        if self.reminders:
+            self.reminders.cancel(task_id)
+        text = f"✅ Задача завершена!\n\n{self.formatter.format_task(task)}"
+        try:
+            await self.bot.edit_message_text(
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                text=text,
+                parse_mode='Markdown'
+            )
+            await self.bot.edit_message_reply_markup(
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                reply_markup=None
+            )
+        except Exception as e:
+            # Сообщение уже в нужном виде — ничего не делаем, иначе отправляем новое
+            if not (isinstance(e, asyncio_helper.ApiException) and _not_modified(e)):
+                await self.bot.send_message(call.message.chat.id, text, parse_mode='Markdown')
+
+    async def delete_task(self, call, task_id):
+        try:
+            title = await self.repo.delete_async(task_id)
+        except Exception as e:
+            await self.bot.answer_callback_query(call.id, f"❌ Ошибка при удалении: {e}")
+            return
+
+        if title is None:
+            await self.bot.answer_callback_query(call.id, "❌ Задача не найдена")
+            return
+
+        self.formatter.invalidate(task_id)
+        if self.reminders:
+            self.reminders.cancel(task_id)
+        text = f"🗑 Задача '{title}' удалена"
+        try:
+            await self.bot.edit_message_text(
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                text=text,
+                reply_markup=None
+            )
+        except Exception:
+            await self.bot.send_message(call.message.chat.id, text)
+
+    async def process_reschedule_deadline(self, message, user_data):
+        chat_id = message.chat.id
+        retry = steps.reschedule_deadline(message, user_data, self.parser)
+        if retry is not None:
+            await self._send_step(chat_id, retry)
+            return
+
+        try:
+            task = await self.repo.reschedule_async(user_data['task_id'], user_data['deadline'])
+        except Exception as e:
+            await self._send_step(chat_id, steps.failure(f"❌ Не удалось обновить дедлайн: {e}"))
+            return
+        if not task:
+            await self._send_step(chat_id, steps.failure("❌ Задача не найдена."))
+            return
+        self._task_changed(task)
+        await self._send_step(chat_id, steps.task_saved("🔄 *Дедлайн обновлён!*\n\n", task, self.formatter, self.ui))
+
+    async def process_edit_title(self, message, data):
+        await self._send_step(message.chat.id, steps.edit_title(message, data))
+
+    async def process_edit_description(self, message, data):
+        await self._send_step(message.chat.id, steps.edit_description(message, data, self.formatter))
+
+    async def process_edit_priority(self, message, data):
+        await self._send_step(message.chat.id, steps.edit_priority(message, data))
+
+    async def process_edit_category(self, message, data):
+        await self._send_step(message.chat.id, steps.edit_category(message, data))
+
+    async def process_edit_tags(self, message, data):
+        await self._send_step(message.chat.id, steps.edit_tags(message, data, self.parser))
+
+    async def process_edit_deadline(self, message, data):
+        chat_id = message.chat.id
+        retry = steps.edit_deadline(message, data, self.parser)
+        if retry is not None:
+            await self._send_step(chat_id, retry)
+            return
+
+        try:
+            task = await self.repo.update_async(data['task_id'], **data['new'])
+        except Exception as e:
+            await self._send_step(chat_id, steps.failure(f"❌ Ошибка при обновлении: {e}"))
+            return
+        if not task:
+            await self._send_step(chat_id, steps.failure("❌ Ошибка при обновлении задачи."))
+            return
+        self._task_changed(task)
+        await self._send_step(chat_id, steps.task_saved("✅ Задача обновлена!\n\n", task, self.formatter, self.ui))
@@ -0,0 +1,288 @@
+# handlers/steps.py
+"""
+Шаги диалогов без ввода-вывода: по сообщению пользователя решают, что ответить,
+какой шаг ждать дальше и что сохранить в данных диалога. Общие для синхронных
+(TaskHandler, CallbackHandler) и asyncio-обработчиков — те только отправляют
+ответы (StepSender / AsyncStepSender) и ходят в БД.
+"""
+
+from collections import namedtuple
+
+import pytz
+
+from bot_utils import FILTER_MARKUP, PRIORITY_MARKUP, REMOVE_MARKUP
+
+
+# Одно сообщение бота
+Reply = namedtuple('Reply', 'text markup parse_mode', defaults=(None, None))
+
+# Решение шага: ответы по порядку, следующий шаг (имя метода обработчика) с данными
+# диалога и нужно ли после ответов показать главное меню
+Step = namedtuple('Step', 'replies next_step data menu', defaults=(None, None, False))
+
+
+SKIP = '/skip'
+
+PRIORITY_BUTTONS = {'🔴 Высокий': 'high', '🟡 Средний': 'medium', '🟢 Низкий': 'low'}
+
+WELCOME_TEXT = (
+    "👋 Привет! Я TaskMaster Bot - твой личный помощник для управления задачами.\n\n"
+    "Используй команды:\n"
+    "/newtask - создать новую задачу\n"
+    "/mytasks - просмотреть свои задачи\n\n"
+    "Или выбери действие ниже:"
+)
+DEADLINE_PROMPT = (
+    "⏰ Введите дедлайн задачи (например: 'сегодня в 9:00', 'через 2 дня', "
+    "'завтра 18:00', '31.12.2023 23:59') или /skip:"
+)
+
+
+def failure(text):
+    """
+    Сообщение об ошибке и главное меню.
+    """
+    return Step((Reply(text),), menu=True)
+
+
+def task_saved(header, task, formatter, ui):
+    """
+    Карточка созданной или изменённой задачи с кнопками и главное меню.
+    """
+    return Step(
+        (Reply(header + formatter.format_task(task), ui.create_task_actions_markup(task.task_id), 'Markdown'),),
+        menu=True,
+    )
+
+
+def local_str(deadline, parser):
+    """
+    Дедлайн в часовом поясе пользователя: дд.мм.гггг чч:мм.
+    """
+    tz = getattr(parser, 'timezone', None) or pytz.timezone('Europe/Moscow')
+    return deadline.astimezone(tz).strftime('%d.%m.%Y %H:%M')
+
+
+# ── Создание задачи ───────────────────────────────────────────
+
+def new_task():
+    return Step((Reply("📝 Введите название задачи:", REMOVE_MARKUP),), 'process_task_title')
+
+
+def task_title(message):
+    user_data = {'title': message.text.strip(), 'user_id': message.from_user.id}
+    return Step(
+        (Reply("ℹ️ Введите описание задачи (или нажмите /skip, чтобы пропустить):"),),
+        'process_task_description', user_data,
+    )
+
+
+def task_description(message, user_data):
+    if message.text != SKIP:
+        user_data['description'] = message.text.strip()
+    return Step((Reply("🚀 Выберите приоритет задачи:", PRIORITY_MARKUP),), 'process_task_priority', user_data)
+
+
+def task_priority(message, user_data):
+    user_data['priority'] = PRIORITY_BUTTONS.get(message.text, 'medium')
+    return Step(
+        (Reply("📂 Введите категорию задачи (например: Работа, Учеба, Дом) или /skip:", REMOVE_MARKUP),),
+        'process_task_category', user_data,
+    )
+
+
+def task_category(message, user_data):
+    if message.text != SKIP:
+        user_data['category'] = message.text.strip()
+    return Step(
+        (Reply("🏷 Введите теги через запятую (например: важное, проект1) или /skip:"),),
+        'process_task_tags', user_data,
+    )
+
+
+def task_tags(message, user_data):
+    if message.text != SKIP:
+        user_data['tags'] = [tag.strip() for tag in message.text.split(',') if tag.strip()]
+    return Step((Reply(DEADLINE_PROMPT),), 'process_task_deadline', user_data)
+
+
+def task_deadline(message, user_data, parser):
+    """
+    Кладёт дедлайн в user_data и возвращает None — задачу можно сохранять,
+    или Step с повторным вопросом, если дедлайн не разобран.
+    """
+    if message.text == SKIP:
+        return None
+    try:
+        user_data['deadline'] = parser.parse_deadline(message.text)
+    except ValueError as e:
+        return Step(
+            (Reply(f"❌ Ошибка: {e}\nПопробуйте ещё раз."), Reply(DEADLINE_PROMPT)),
+            'process_task_deadline', user_data,
+        )
+    return None
+
+
+# ── Просмотр задач ────────────────────────────────────────────
+
+def show_filters():
+    return Step((Reply("🔍 Выберите фильтр для отображения задач:", FILTER_MARKUP),), 'process_task_filter')
+
+
+def filter_values(text, values):
+    """
+    Выбор категории или тега из списка пользователя.
+    :param text: нажатая кнопка ('📂 Категории' или '🏷 Теги')
+    """
+    if text == '📂 Категории':
+        prompt, empty, next_step = "Введите категорию из списка:\n", "Нет категорий.", 'show_tasks_by_category'
+    else:
+        prompt, empty, next_step = "Введите тег из списка:\n", "Нет тегов.", 'show_tasks_by_tag'
+    if not values:
+        return failure(empty)
+    return Step((Reply(prompt + "\n".join(values)),), next_step)
+
+
+# ── Перенос дедлайна ──────────────────────────────────────────
+
+def reschedule(task_id, deadline, parser):
+    if not deadline:
+        return failure("❌ Нельзя перенести: дедлайн не задан или задача не найдена.")
+    text = (
+        f"🔄 *Перенос задачи {task_id}*\n"
+        f"Текущий дедлайн: `{local_str(deadline, parser)}`\n\n"
+        "Введите новый дедлайн (например 'сегодня в 9:00', 'завтра 18:00', '31.12.2025 14:30'):"
+    )
+    return Step((Reply(text, parse_mode='Markdown'),), 'process_reschedule_deadline', {'task_id': task_id})
+
+
+def reschedule_deadline(message, user_data, parser):
+    """
+    Кладёт новый дедлайн в user_data['deadline'] и возвращает None,
+    или Step с повторным вопросом, если дедлайн не разобран.
+    """
+    try:
+        user_data['deadline'] = parser.parse_deadline(message.text.strip())
+    except ValueError as e:
+        text = f"❌ Ошибка: {e}\nПопробуйте ещё раз в формате 'сегодня в 9:00', 'завтра 18:00' или '31.12.2025 14:30':"
+        return Step((Reply(text),), 'process_reschedule_deadline', user_data)
+    return None
+
+
+# ── Редактирование задачи ─────────────────────────────────────
+
+def _edit_prompt(text, next_step, data, markup=None):
+    return Step((Reply(text, markup, 'Markdown'),), next_step, data)
+
+
+def edit(task_id, old):
+    if not old:
+        return failure("❌ Задача не найдена.")
+    text = (
+        f"✏️ *Редактирование задачи {task_id}*\n\n"
+        "1️⃣ Текущий заголовок:\n"
+        f"`{old['title'] or '—'}`\n\n"
+        "Введите новый заголовок или /skip, чтобы оставить старый:"
+    )
+    return _edit_prompt(text, 'process_edit_title', {'task_id': task_id, 'old': old, 'new': {}})
+
+
+def edit_title(message, data):
+    text = message.text.strip()
+    data['new']['title'] = data['old']['title'] if text == SKIP or not text else text
+    old_desc = data['old'].get('description') or ''
+    return _edit_prompt(
+        f"2️⃣ Текущее описание:\n`{old_desc or '—'}`\n\nВведите новое описание или /skip:",
+        'process_edit_description', data,
+    )
+
+
+def edit_description(message, data, formatter):
+    text = message.text.strip()
+    data['new']['description'] = data['old'].get('description') if text == SKIP else text
+    emoji = formatter.get_priority_emoji(data['old'].get('priority'))
+    return Step(
+        (Reply(f"3️⃣ Текущий приоритет: {emoji}\nВыберите новый или /skip:", PRIORITY_MARKUP),),
+        'process_edit_priority', data,
+    )
+
+
+def edit_priority(message, data):
+    text = message.text.strip()
+    old = data['old'].get('priority')
+    data['new']['priority'] = old if text == SKIP else PRIORITY_BUTTONS.get(text, old)
+    old_cat = data['old'].get('category') or ''
+    return _edit_prompt(
+        f"4️⃣ Текущая категория: `{old_cat or '—'}`\nВведите новую или /skip:",
+        'process_edit_category', data, REMOVE_MARKUP,
+    )
+
+
+def edit_category(message, data):
+    text = message.text.strip()
+    data['new']['category'] = data['old'].get('category') if text == SKIP else text
+    old_tags = ', '.join(data['old'].get('tags') or [])
+    return _edit_prompt(
+        f"5️⃣ Текущие теги:\n`{old_tags or '—'}`\n\nВведите новые через запятую или /skip:",
+        'process_edit_tags', data,
+    )
+
+
+def edit_tags(message, data, parser):
+    text = message.text.strip()
+    if text == SKIP:
+        data['new']['tags'] = data['old'].get('tags')
+    else:
+        data['new']['tags'] = [t.strip() for t in text.split(',') if t.strip()]
+    old_dl = data['old'].get('deadline')
+    old_str = local_str(old_dl, parser) if old_dl else ''
+    return _edit_prompt(
+        f"6️⃣ Текущий дедлайн:\n`{old_str or '—'}`\n\nВведите новый дедлайн или /skip:",
+        'process_edit_deadline', data,
+    )
+
+
+def edit_deadline(message, data, parser):
+    """
+    Кладёт дедлайн в data['new'] и возвращает None — поля можно сохранять,
+    или Step с повторным вопросом, если дедлайн не разобран.
+    """
+    text = message.text.strip()
+    if text == SKIP:
+        data['new']['deadline'] = data['old'].get('deadline')
+        return None
+    try:
+        data['new']['deadline'] = parser.parse_deadline(text)
+    except ValueError as e:
+        return Step((Reply(f"❌ Ошибка: {e}\nПопробуйте ещё раз или /skip:"),), 'process_edit_deadline', data)
+    return None
+
+
+# ── Отправка решений ──────────────────────────────────────────
+
+class StepSender:
+    """
+    Отправка Step синхронным ботом (примесь к TaskHandler и CallbackHandler).
+    """
+
+    def _send_step(self, chat_id, step):
+        for reply in step.replies:
+            self.bot.send_message(chat_id, reply.text, reply_markup=reply.markup, parse_mode=reply.parse_mode)
+        if step.next_step:
+            self.conversation.next_step(chat_id, getattr(self, step.next_step), step.data)
+        if step.menu:
+            self.ui.show_main_menu(chat_id)
+
+
+class AsyncStepSender:
+    """
+    То же для asyncio-обработчиков: бот и хранилище диалогов — корутины.
+    """
+
+    async def _send_step(self, chat_id, step):
+        for reply in step.replies:
+            await self.bot.send_message(chat_id, reply.text, reply_markup=reply.markup, parse_mode=reply.parse_mode)
+        if step.next_step:
+            await self.conversation.next_step_async(chat_id, getattr(self, step.next_step), step.data)
+        if step.menu:
+            self.ui.show_main_menu(chat_id)
@@ -1,9 +1,19 @@
 # handlers/task_handlers.py
 
-import re
-from telebot import types
+import hashlib
+import threading
+from collections import OrderedDict
 
-class TaskHandler:
+from telebot import apihelper
+
+from queries import FILTER_WHERE, CATEGORY_WHERE, TAG_WHERE
+from repository import TaskRepository
+from conversation import ConversationManager, MemoryStateStore
+from users import KnownUsers
+from handlers import steps
+from handlers.steps import StepSender
+
+class TaskHandler(StepSender):
     """
     Обработчики команд и этапов диалога создания и просмотра задач.
     Имена функций:
@@ -19,268 +29,183 @@ class TaskHandler:
       - process_task_filter
       - show_tasks_by_category
       - show_tasks_by_tag
+      - send_task_list
+      - handle_page_callback
     """
 
-    def __init__(self, bot, db, parser, formatter, ui):
+    # Кнопки фильтров → ключ списка
+    FILTER_BUTTONS = {
+        '🔴 Высокий приоритет': 'hi',
+        '🟡 Средний приоритет': 'md',
+        '🟢 Низкий приоритет': 'lo',
+        '📅 Ближайшие дедлайны': 'up',
+        '❗️ Просроченные': 'od',
+        '✅ Завершенные': 'dn',
+        '📋 Все задачи': 'al',
+    }
+
+    # Сколько задач читать из БД на одну страницу
+    PAGE_SIZE = 10
+    # Сколько ключей категорий/тегов держать в памяти для кнопок листания
+    LIST_ARGS_LIMIT = 10000
+    # Сколько категорий/тегов пользователя просматривать, чтобы узнать ключ из кнопки
+    LIST_ARGS_LOOKUP = 1000
+
+    # Пустой список по ключу: категория, тег, остальные фильтры
+    EMPTY_LIST_TEXT = {
+        'c': "📭 Нет задач в этой категории.",
+        't': "📭 Нет задач с таким тегом.",
+    }
+    EMPTY_FILTER_TEXT = "📭 Нет задач по выбранному фильтру."
+
+    def __init__(self, bot, db, parser, formatter, ui, conversation=None, reminders=None, users=None,
+                 repo=None):
         """
-        :param bot: экземпляр telebot.TeleBot
+        :param bot: экземпляр RateLimitedBot (обёртка над telebot.TeleBot)
         :param db: экземпляр Database
         :param parser: экземпляр DeadlineParser
         :param formatter: экземпляр TaskFormatter
         :param ui: экземпляр BotUI
+        :param conversation: экземпляр ConversationManager (общий для всех обработчиков)
+        :param reminders: экземпляр ReminderScheduler или None (напоминания выключены)
+        :param users: экземпляр KnownUsers (уже зарегистрированные пользователи)
+        :param repo: экземпляр TaskRepository (по умолчанию — поверх db)
         """
         self.bot = bot
         self.db = db
         self.parser = parser
         self.formatter = formatter
         self.ui = ui
+        self.conversation = conversation or ConversationManager(MemoryStateStore())
+        self.reminders = reminders
+        self.users = users or KnownUsers()
+        self.repo = repo or TaskRepository(db)
+
+        # Шаги пошаговых диалогов
+        self.conversation.register(
+            self.process_task_title,
+            self.process_task_description,
+            self.process_task_priority,
+            self.process_task_category,
+            self.process_task_tags,
+            self.process_task_deadline,
+            self.process_task_filter,
+            self.show_tasks_by_category,
+            self.show_tasks_by_tag,
+        )
+
+        self._list_args = OrderedDict()   # ключ списка → категория/тег (см. _list_key)
+        self._list_args_lock = threading.Lock()
 
     def send_welcome(self, message):
         """
         Обработчик /start: регистрирует пользователя и приветствует.
         """
         # Регистрируем пользователя, если ещё нет
-        conn = self.db.get_db_connection()
-        cur = conn.cursor()
+        self._register_user(message.from_user)
+
+        # Показываем главное меню и отправляем приветственное сообщение
+        self.ui.show_main_menu(message.chat.id, force=True)
+        self.bot.send_message(message.chat.id, steps.WELCOME_TEXT)
+
+    def _register_user(self, user):
+        """
+        INSERT в users только при первой встрече пользователя в этом процессе.
+        """
+        if not self.users.remember(user.id):
+            return
         try:
-            cur.execute(
-                "INSERT INTO users (user_id, username) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING",
-                (message.from_user.id, message.from_user.username)
-            )
-            conn.commit()
+            self.repo.register_user(user.id, user.username)
         except Exception as e:
-            conn.rollback()
+            self.users.forget(user.id)
             print(f"Error registering user: {e}")
-        finally:
-            cur.close()
-            conn.close()
-
-        # Показываем главное меню и отправляем приветственное сообщение
-        self.ui.show_main_menu(message.chat.id)
-        self.bot.send_message(
-            message.chat.id,
-            "👋 Привет! Я TaskMaster Bot - твой личный помощник для управления задачами.\n\n"
-            "Используй команды:\n"
-            "/newtask - создать новую задачу\n"
-            "/mytasks - просмотреть свои задачи\n\n"
-            "Или выбери действие ниже:"
-        )
 
     def new_task(self, message):
         """
         Обработчик /newtask: начинает диалог создания задачи.
         """
-        msg = self.bot.send_message(
-            message.chat.id,
-            "📝 Введите название задачи:",
-            reply_markup=types.ReplyKeyboardRemove()
-        )
         # Следующий шаг: process_task_title
-        self.bot.register_next_step_handler(msg, self.process_task_title)
+        self._send_step(message.chat.id, steps.new_task())
 
     def process_task_title(self, message):
         """
         Сохраняет заголовок задачи и спрашивает описание.
         """
-        chat_id = message.chat.id
-        title = message.text.strip()
-        user_data = {
-            'title': title,
-            'user_id': message.from_user.id
-        }
-        msg = self.bot.send_message(
-            chat_id,
-            "ℹ️ Введите описание задачи (или нажмите /skip, чтобы пропустить):"
-        )
-        self.bot.register_next_step_handler(msg, self.process_task_description, user_data)
+        self._send_step(message.chat.id, steps.task_title(message))
 
     def process_task_description(self, message, user_data):
         """
         Сохраняет описание или пропускает, спрашивает приоритет.
         """
-        if message.text != '/skip':
-            user_data['description'] = message.text.strip()
-
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        markup.add(
-            types.KeyboardButton('🔴 Высокий'),
-            types.KeyboardButton('🟡 Средний'),
-            types.KeyboardButton('🟢 Низкий')
-        )
-        msg = self.bot.send_message(
-            message.chat.id,
-            "🚀 Выберите приоритет задачи:",
-            reply_markup=markup
-        )
-        self.bot.register_next_step_handler(msg, self.process_task_priority, user_data)
+        self._send_step(message.chat.id, steps.task_description(message, user_data))
 
     def process_task_priority(self, message, user_data):
         """
         Сохраняет приоритет и спрашивает категорию.
         """
-        priority_map = {
-            '🔴 Высокий': 'high',
-            '🟡 Средний': 'medium',
-            '🟢 Низкий': 'low'
-        }
-        user_data['priority'] = priority_map.get(message.text, 'medium')
-        msg = self.bot.send_message(
-            message.chat.id,
-            "📂 Введите категорию задачи (например: Работа, Учеба, Дом) или /skip:",
-            reply_markup=types.ReplyKeyboardRemove()
-        )
-        self.bot.register_next_step_handler(msg, self.process_task_category, user_data)
+        self._send_step(message.chat.id, steps.task_priority(message, user_data))
 
     def process_task_category(self, message, user_data):
         """
         Сохраняет категорию или пропускает, спрашивает теги.
         """
-        if message.text != '/skip':
-            user_data['category'] = message.text.strip()
-        msg = self.bot.send_message(
-            message.chat.id,
-            "🏷 Введите теги через запятую (например: важное, проект1) или /skip:"
-        )
-        self.bot.register_next_step_handler(msg, self.process_task_tags, user_data)
+        self._send_step(message.chat.id, steps.task_category(message, user_data))
 
     def process_task_tags(self, message, user_data):
         """
         Сохраняет теги или пропускает, спрашивает дедлайн.
         """
-        if message.text != '/skip':
-            tags = [tag.strip() for tag in message.text.split(',') if tag.strip()]
-            user_data['tags'] = tags
-        msg = self.bot.send_message(
-            message.chat.id,
-            "⏰ Введите дедлайн задачи (например: 'сегодня в 9:00', 'через 2 дня', "
-            "'завтра 18:00', '31.12.2023 23:59') или /skip:"
-        )
-        self.bot.register_next_step_handler(msg, self.process_task_deadline, user_data)
+        self._send_step(message.chat.id, steps.task_tags(message, user_data))
 
     def process_task_deadline(self, message, user_data):
         """
         Сохраняет дедлайн (или пропускает), сохраняет задачу в БД, показывает результат.
         """
         chat_id = message.chat.id
-        # Парсим введённый дедлайн
-        if message.text != '/skip':
-            try:
-                deadline = self.parser.parse_deadline(message.text)
-                user_data['deadline'] = deadline
-            except ValueError as e:
-                self.bot.send_message(
-                    chat_id,
-                    f"❌ Ошибка: {e}\nПопробуйте ещё раз."
-                )
-                msg = self.bot.send_message(
-                    chat_id,
-                    "⏰ Введите дедлайн задачи (например: 'сегодня в 9:00', "
-                    "'через 2 дня', 'завтра 18:00', '31.12.2023 23:59') или /skip:"
-                )
-                self.bot.register_next_step_handler(msg, self.process_task_deadline, user_data)
-                return
-
-        # Сохраняем задачу в БД
-        conn = self.db.get_db_connection()
-        cur = conn.cursor()
+        # Дедлайн не разобран — спрашиваем ещё раз
+        retry = steps.task_deadline(message, user_data, self.parser)
+        if retry is not None:
+            self._send_step(chat_id, retry)
+            return
+
+        # Регистрируем пользователя (если ещё нет) и вставляем задачу одним запросом;
+        # RETURNING отдаёт все поля карточки — повторный SELECT не нужен
         try:
-            # 1) Регистрируем пользователя, если ещё нет
-            cur.execute(
-                "INSERT INTO users (user_id, username) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING",
-                (message.from_user.id, message.from_user.username)
-            )
-            # 2) Вставляем задачу
-            cur.execute(
-                """
-                INSERT INTO tasks
-                    (user_id, title, description, priority, category, tags, deadline, status)
-                VALUES
-                    (%s, %s, %s, %s, %s, %s, %s, 'active')
-                RETURNING task_id
-                """,
-                (
-                    user_data['user_id'],
-                    user_data['title'],
-                    user_data.get('description'),
-                    user_data.get('priority', 'medium'),
-                    user_data.get('category'),
-                    user_data.get('tags'),
-                    user_data.get('deadline')
-                )
-            )
-            task_id = cur.fetchone()[0]
-
-            # 3) Извлекаем запись для форматирования
-            cur.execute("SELECT * FROM tasks WHERE task_id = %s", (task_id,))
-            record = cur.fetchone()
-            columns = [desc[0] for desc in cur.description]
-            task = dict(zip(columns, record))
-            conn.commit()
-
-            # 4) Отправляем подтверждение и главное меню
-            formatted = self.formatter.format_task(task)
-            markup = self.ui.create_task_actions_markup(task_id)
-            self.bot.send_message(
-                chat_id,
-                f"✅ Задача создана!\n\n{formatted}",
-                reply_markup=markup,
-                parse_mode='Markdown'
-            )
-            self.ui.show_main_menu(chat_id)
-
+            task = self.repo.create(message.from_user.id, message.from_user.username, **self._new_task_fields(user_data))
         except Exception as e:
-            conn.rollback()
-            self.bot.send_message(
-                chat_id,
-                f"❌ Ошибка при создании задачи: {e}"
-            )
-            self.ui.show_main_menu(chat_id)
-        finally:
-            cur.close()
-            conn.close()
+            self._send_step(chat_id, steps.failure(f"❌ Ошибка при создании задачи: {e}"))
+            return
+
+        self._task_created(message.from_user.id, task)
+        self._send_step(chat_id, steps.task_saved("✅ Задача создана!\n\n", task, self.formatter, self.ui))
+
+    @staticmethod
+    def _new_task_fields(user_data):
+        """
+        Поля TaskRepository.create из данных диалога создания задачи.
+        """
+        return {
+            'title': user_data['title'],
+            'description': user_data.get('description'),
+            'priority': user_data.get('priority', 'medium'),
+            'category': user_data.get('category'),
+            'tags': user_data.get('tags'),
+            'deadline': user_data.get('deadline'),
+            'owner_id': user_data['user_id'],
+        }
+
+    def _task_created(self, user_id, task):
+        self.users.remember(user_id)
+        if self.reminders:
+            self.reminders.schedule(task.task_id, task.user_id, task.title, task.deadline)
 
     def show_tasks(self, message):
         """
         Обработчик /mytasks: регистрирует пользователя в БД и предлагает фильтры.
         """
-        chat_id = message.chat.id
-        user_id = message.from_user.id
-
         # Регистрируем пользователя, если ещё нет
-        conn = self.db.get_db_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                "INSERT INTO users (user_id, username) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING",
-                (user_id, message.from_user.username)
-            )
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"Error registering user from /mytasks: {e}")
-        finally:
-            cur.close()
-            conn.close()
-
-        # Клавиатура фильтров
-        markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-        markup.add(
-            '🔴 Высокий приоритет',
-            '🟡 Средний приоритет',
-            '🟢 Низкий приоритет',
-            '📅 Ближайшие дедлайны',
-            '❗️ Просроченные',
-            '✅ Завершенные',
-            '📂 Категории',
-            '🏷 Теги',
-            '📋 Все задачи'
-        )
-        msg = self.bot.send_message(
-            chat_id,
-            "🔍 Выберите фильтр для отображения задач:",
-            reply_markup=markup
-        )
-        self.bot.register_next_step_handler(msg, self.process_task_filter)
+        self._register_user(message.from_user)
+        self._send_step(message.chat.id, steps.show_filters())
 
     def process_task_filter(self, message):
         """
@@ -288,196 +213,220 @@ class TaskHandler:
         """
         chat_id = message.chat.id
         user_id = message.from_user.id
+        text = message.text
 
-        conn = self.db.get_db_connection()
-        cur = conn.cursor()
-        try:
-            text = message.text
+        # Фильтры по статусу/приоритету — постраничный список одним сообщением
+        if text not in ('📂 Категории', '🏷 Теги'):
+            self.send_task_list(chat_id, user_id, self.FILTER_BUTTONS.get(text, 'al'))
+            return
 
-            # Категории
+        # Категории или теги — спрашиваем, какие именно
+        try:
             if text == '📂 Категории':
-                cur.execute(
-                    "SELECT DISTINCT category FROM tasks WHERE user_id=%s AND category IS NOT NULL",
-                    (user_id,)
-                )
-                cats = [row[0] for row in cur.fetchall() if row[0]]
-                if cats:
-                    self.bot.send_message(
-                        chat_id,
-                        "Введите категорию из списка:\n" + "\n".join(cats)
-                    )
-                    self.bot.register_next_step_handler(message, self.show_tasks_by_category)
-                else:
-                    self.bot.send_message(chat_id, "Нет категорий.")
-                    self.ui.show_main_menu(chat_id)
-                return
-
-            # Теги
-            if text == '🏷 Теги':
-                cur.execute(
-                    "SELECT unnest(tags) FROM tasks WHERE user_id=%s",
-                    (user_id,)
-                )
-                tags = sorted({row[0] for row in cur.fetchall() if row[0]})
-                if tags:
-                    self.bot.send_message(
-                        chat_id,
-                        "Введите тег из списка:\n" + "\n".join(tags)
-                    )
-                    self.bot.register_next_step_handler(message, self.show_tasks_by_tag)
-                else:
-                    self.bot.send_message(chat_id, "Нет тегов.")
-                    self.ui.show_main_menu(chat_id)
-                return
-
-            # Прочие фильтры
-            query = "SELECT * FROM tasks WHERE user_id = %s"
-            params = [user_id]
-
-            if text == '🔴 Высокий приоритет':
-                query += " AND priority = 'high' AND status = 'active'"
-            elif text == '🟡 Средний приоритет':
-                query += " AND priority = 'medium' AND status = 'active'"
-            elif text == '🟢 Низкий приоритет':
-                query += " AND priority = 'low' AND status = 'active'"
-            elif text == '📅 Ближайшие дедлайны':
-                query += " AND deadline > NOW() AND status = 'active'"
-            elif text == '❗️ Просроченные':
-                query += " AND deadline < NOW() AND status = 'active'"
-            elif text == '✅ Завершенные':
-                query += " AND status = 'completed'"
-            else:
-                # '📋 Все задачи' или иной текст
-                query += " AND status = 'active'"
-
-            query += """
-                ORDER BY
-                  CASE priority
-                    WHEN 'high' THEN 1
-                    WHEN 'medium' THEN 2
-                    WHEN 'low' THEN 3
-                  END,
-                  deadline ASC
-            """
-            cur.execute(query, params)
-            rows = cur.fetchall()
-
-            if not rows:
-                self.bot.send_message(chat_id, "📭 Нет задач по выбранному фильтру.")
+                values = self.repo.distinct_categories(user_id)
             else:
-                for r in rows:
-                    task = dict(zip([d[0] for d in cur.description], r))
-                    formatted = self.formatter.format_task(task)
-                    markup = self.ui.create_task_actions_markup(task['task_id'])
-                    self.bot.send_message(
-                        chat_id,
-                        formatted,
-                        reply_markup=markup,
-                        parse_mode='Markdown'
-                    )
-
-            self.ui.show_main_menu(chat_id)
+                values = self.repo.distinct_tags(user_id)
         except Exception as e:
-            self.bot.send_message(chat_id, f"❌ Ошибка при загрузке задач: {e}")
-            self.ui.show_main_menu(chat_id)
-        finally:
-            cur.close()
-            conn.close()
+            self._send_step(chat_id, steps.failure(f"❌ Ошибка при загрузке задач: {e}"))
+            return
+        self._send_step(chat_id, steps.filter_values(text, values))
 
     def show_tasks_by_category(self, message):
         """
         Обработчик ввода категории: выводит задачи этой категории.
         """
-        chat_id = message.chat.id
-        user_id = message.from_user.id
         cat = message.text.strip()
+        list_key = self._list_key('c', cat)
+        self.send_task_list(message.chat.id, message.from_user.id, list_key)
 
-        conn = self.db.get_db_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                """
-                SELECT *
-                FROM tasks
-                WHERE user_id = %s AND category = %s
-                ORDER BY
-                  CASE priority
-                    WHEN 'high' THEN 1
-                    WHEN 'medium' THEN 2
-                    WHEN 'low' THEN 3
-                  END,
-                  deadline ASC
-                """,
-                (user_id, cat)
+    def show_tasks_by_tag(self, message):
+        """
+        Обработчик ввода тега: выводит задачи с этим тегом.
+        """
+        tag = message.text.strip().lstrip('#')
+        list_key = self._list_key('t', tag)
+        self.send_task_list(message.chat.id, message.from_user.id, list_key)
+
+    # ── Постраничный список задач ─────────────────────────────────
+
+    @staticmethod
+    def _hash_list_arg(kind, value):
+        return kind + hashlib.blake2b(value.encode('utf-8'), digest_size=6).hexdigest()
+
+    def _remember_list_arg(self, list_key, value):
+        with self._list_args_lock:
+            self._list_args[list_key] = value
+            self._list_args.move_to_end(list_key)
+            while len(self._list_args) > self.LIST_ARGS_LIMIT:
+                self._list_args.popitem(last=False)
+
+    def _list_key(self, kind, value):
+        """
+        Категорию/тег не уместить в 64 байта callback_data, поэтому в кнопках
+        передаётся короткий ключ — вид ('c'/'t') и хеш значения. Ключ не зависит
+        от процесса: после перезапуска или на другом экземпляре бота значение
+        находится среди категорий/тегов пользователя (см. _resolve_list_arg).
+        """
+        list_key = self._hash_list_arg(kind, value)
+        self._remember_list_arg(list_key, value)
+        return list_key
+
+    def _known_list_arg(self, list_key):
+        """
+        (True, значение) для встроенного фильтра (значение None) или ключа из памяти,
+        иначе (False, None) — значение нужно искать в БД.
+        """
+        if list_key in FILTER_WHERE:
+            return True, None
+        with self._list_args_lock:
+            value = self._list_args.get(list_key)
+        return value is not None, value
+
+    def _match_list_arg(self, list_key, values):
+        for value in values:
+            if self._hash_list_arg(list_key[0], value) == list_key:
+                self._remember_list_arg(list_key, value)
+                return value
+        return None
+
+    def _resolve_list_arg(self, user_id, list_key):
+        """
+        Значение категории/тега по ключу из кнопки или None, если его уже нет.
+        """
+        known, value = self._known_list_arg(list_key)
+        if known:
+            return value
+        if list_key.startswith('c'):
+            values = self.repo.distinct_categories(user_id, self.LIST_ARGS_LOOKUP)
+        elif list_key.startswith('t'):
+            values = self.repo.distinct_tags(user_id, self.LIST_ARGS_LOOKUP)
+        else:
+            return None
+        return self._match_list_arg(list_key, values)
+
+    def _list_filter(self, list_key, value=None):
+        """
+        По ключу списка (и значению категории/тега) возвращает
+        (заголовок, SQL-условие, параметры) или None, если ключ неизвестен.
+        """
+        if list_key in FILTER_WHERE:
+            title, where = FILTER_WHERE[list_key]
+            return title, where, ()
+        if value is None:
+            return None
+        if list_key.startswith('c'):
+            return f"📂 {value}", CATEGORY_WHERE, (value,)
+        if list_key.startswith('t'):
+            return f"🏷 #{value}", TAG_WHERE, (value,)
+        return None
+
+    def _empty_list_text(self, list_key):
+        if list_key in FILTER_WHERE:
+            return self.EMPTY_FILTER_TEXT
+        return self.EMPTY_LIST_TEXT.get(list_key[:1], self.EMPTY_FILTER_TEXT)
+
+    def _render_page(self, user_id, list_key, page=1, cursor=None, backward=False):
+        """
+        Собирает страницу списка: (текст, разметка) или None, если задач нет.
+        """
+        list_filter = self._list_filter(list_key, self._resolve_list_arg(user_id, list_key))
+        if list_filter is None:
+            return None
+        title, where, params = list_filter
+
+        result = self.repo.list_by_filter(user_id, where, params, cursor, backward, self.PAGE_SIZE)
+        return self._build_page(title, list_key, result, page, cursor, backward)
+
+    def _build_page(self, title, list_key, result, page, cursor, backward):
+        """
+        Текст и разметка страницы по результату TaskRepository.list_by_filter
+        (общая часть синхронного и асинхронного обработчика).
+        """
+        rows = result.tasks
+        if not rows:
+            return None
+
+        blocks = self.formatter.format_tasks(rows)
+        header = f"*{title}* — стр. {page}"
+        text, count = self.formatter.format_task_page(blocks, header, reverse=backward, tasks=rows)
+        shown = rows[:count]
+        more = result.has_more or count < len(rows)
+        if backward:
+            shown.reverse()
+            has_prev, has_next = more, True
+        else:
+            has_prev, has_next = cursor is not None, more
+        if not has_prev and page != 1:
+            # Листали назад и дошли до начала списка
+            page = 1
+            text, _ = self.formatter.format_task_page(
+                blocks, f"*{title}* — стр. 1", reverse=backward, tasks=rows
             )
-            rows = cur.fetchall()
 
-            if not rows:
-                self.bot.send_message(chat_id, "📭 Нет задач в этой категории.")
-            else:
-                for r in rows:
-                    task = dict(zip([d[0] for d in cur.description], r))
-                    formatted = self.formatter.format_task(task)
-                    markup = self.ui.create_task_actions_markup(task['task_id'])
-                    self.bot.send_message(
-                        chat_id,
-                        formatted,
-                        reply_markup=markup,
-                        parse_mode='Markdown'
-                    )
+        prev_data = self._page_data(list_key, page - 1, 'p', shown[0]) if has_prev else None
+        next_data = self._page_data(list_key, page + 1, 'n', shown[-1]) if has_next else None
+        markup = self.ui.create_page_markup([t['task_id'] for t in shown], prev_data, next_data)
+        return text, markup
+
+    def _page_data(self, list_key, page, direction, task):
+        """
+        callback_data кнопки листания: pg:ключ:страница:направление:курсор
+        """
+        cursor = self.repo.encode_cursor(self.repo.cursor_of(task))
+        return f"pg:{list_key}:{page}:{direction}:{cursor}"
+
+    def _parse_page_data(self, data):
+        _, list_key, page, direction, cursor = data.split(':', 4)
+        return list_key, int(page), direction == 'p', self.repo.decode_cursor(cursor)
+
+    def send_task_list(self, chat_id, user_id, list_key):
+        """
+        Отправляет первую страницу списка задач одним сообщением.
+        """
+        try:
+            page = self._render_page(user_id, list_key)
         except Exception as e:
-            self.bot.send_message(chat_id, f"❌ Ошибка: {e}")
-        finally:
-            cur.close()
-            conn.close()
+            self.bot.send_message(chat_id, f"❌ Ошибка при загрузке задач: {e}")
+            self.ui.show_main_menu(chat_id)
+            return
 
+        if page is None:
+            self.bot.send_message(chat_id, self._empty_list_text(list_key))
+        else:
+            text, markup = page
+            self.bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
         self.ui.show_main_menu(chat_id)
 
-    def show_tasks_by_tag(self, message):
+    def handle_page_callback(self, call):
         """
-        Обработчик ввода тега: выводит задачи с этим тегом.
+        Листание списка: перерисовывает то же сообщение (edit_message_text).
         """
-        chat_id = message.chat.id
-        user_id = message.from_user.id
-        tag = message.text.strip().lstrip('#')
-
-        conn = self.db.get_db_connection()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                """
-                SELECT *
-                FROM tasks
-                WHERE user_id = %s AND %s = ANY(tags)
-                ORDER BY
-                  CASE priority
-                    WHEN 'high' THEN 1
-                    WHEN 'medium' THEN 2
-                    WHEN 'low' THEN 3
-                  END,
-                  deadline ASC
-                """,
-                (user_id, tag)
-            )
-            rows = cur.fetchall()
+            list_key, page_no, backward, cursor = self._parse_page_data(call.data)
+        except ValueError:
+            self.bot.answer_callback_query(call.id, "❌ Некорректные данные страницы")
+            return
 
-            if not rows:
-                self.bot.send_message(chat_id, "📭 Нет задач с таким тегом.")
-            else:
-                for r in rows:
-                    task = dict(zip([d[0] for d in cur.description], r))
-                    formatted = self.formatter.format_task(task)
-                    markup = self.ui.create_task_actions_markup(task['task_id'])
-                    self.bot.send_message(
-                        chat_id,
-                        formatted,
-                        reply_markup=markup,
-                        parse_mode='Markdown'
-                    )
+        try:
+            page = self._render_page(call.from_user.id, list_key, page_no, cursor, backward)
         except Exception as e:
-            self.bot.send_message(chat_id, f"❌ Ошибка: {e}")
-        finally:
-            cur.close()
-            conn.close()
+            self.bot.answer_callback_query(call.id, f"❌ Ошибка: {e}")
+            return
 
-        self.ui.show_main_menu(chat_id)
+        if page is None:
+            self.bot.answer_callback_query(call.id, "📭 Список устарел, откройте /mytasks заново")
+            return
+
+        self.bot.answer_callback_query(call.id)
+        text, markup = page
+        try:
+            self.bot.edit_message_text(
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                text=text,
+                reply_markup=markup,
+                parse_mode='Markdown'
+            )
+        except apihelper.ApiException as e:
+            if 'message is not modified' not in str(e).lower():
+                raise
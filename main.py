@@ -1,11 +1,21 @@
 # main.py
 
-from bot import BotApp
+import asyncio
+
+from config import BOT_RUNTIME
 
 def main():
     """
     Инициализация и запуск TaskMaster Bot.
     """
+    if BOT_RUNTIME == 'asyncio':
+        from async_bot import AsyncBotApp
+        asyncio.run(AsyncBotApp().run())
+        return
+    if BOT_RUNTIME != 'threads':
+        raise RuntimeError(f"Неизвестный режим BOT_RUNTIME: {BOT_RUNTIME}")
+
+    from bot import BotApp
     app = BotApp()
     app.run()
 
@@ -0,0 +1,246 @@
+# metrics.py
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Границы корзин гистограммы времени обработки, секунд
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Обработчик, в котором выполняется текущий код (запросы к БД и вызовы Bot API
+# учитываются за ним; вне обработчиков — за 'background'). Одна переменная на
+# процесс: её же выставляет и читает sender.RateLimitedBot.handler_scope
+current_handler = contextvars.ContextVar('handler', default=None)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_label(v)}"' for k, v in labels.items()) + '}'
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами (как histogram в Prometheus).
+    Не потокобезопасна сама по себе — изменяется под блокировкой Metrics.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.counts):
+            self.counts[idx] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        other = Histogram(self.buckets)
+        other.counts = list(self.counts)
+        other.sum = self.sum
+        other.count = self.count
+        return other
+
+
+class Metrics:
+    """
+    Метрики бота в текстовом формате Prometheus:
+      - track(name)                 — блок обработки обновления: гистограмма времени
+                                      и ошибки по типам исключений
+      - observe_db(query, seconds, error)  — наблюдатель Database (время запросов)
+      - observe_api(method, seconds, error) — наблюдатель RateLimitedBot (время вызовов Bot API)
+      - gauge(name, help, fn)       — значение, которое читается только при сборе
+      - render()                    — текст для /metrics
+    На горячем пути — только счётчики под блокировкой; текст собирается,
+    лишь когда его запрашивают.
+    """
+
+    def __init__(self, prefix='taskmaster', buckets=LATENCY_BUCKETS):
+        """
+        :param prefix: префикс имён метрик
+        :param buckets: границы корзин гистограммы времени обработки, секунд
+        """
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._latency = {}      # обработчик → Histogram
+        self._errors = {}       # (обработчик, источник, тип) → число
+        self._db = {}           # обработчик → [секунд, запросов]
+        self._api = {}          # обработчик → [секунд, вызовов]
+        self._gauges = []       # (имя, описание, функция)
+
+    # ── Сбор ──────────────────────────────────────────────────────
+
+    @contextmanager
+    def track(self, name):
+        token = current_handler.set(name)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._error(name, 'handler', e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            current_handler.reset(token)
+            with self._lock:
+                histogram = self._latency.get(name)
+                if histogram is None:
+                    histogram = self._latency[name] = Histogram(self.buckets)
+                histogram.observe(elapsed)
+
+    def observe_db(self, query, seconds, error=None):
+        self._add(self._db, 'db', seconds, error)
+
+    def observe_api(self, method, seconds, error=None):
+        self._add(self._api, 'api', seconds, error)
+
+    def gauge(self, name, help, fn):
+        """
+        :param fn: функция без аргументов → число или None (метрика не выводится)
+        """
+        self._gauges.append((name, help, fn))
+
+    def _add(self, totals, source, seconds, error):
+        handler = current_handler.get() or 'background'
+        with self._lock:
+            total = totals.get(handler)
+            if total is None:
+                total = totals[handler] = [0.0, 0]
+            total[0] += seconds
+            total[1] += 1
+        if error is not None:
+            self._error(handler, source, error)
+
+    def _error(self, handler, source, error):
+        key = (handler, source, type(error).__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    # ── Вывод ─────────────────────────────────────────────────────
+
+    def render(self):
+        with self._lock:
+            latency = {name: h.copy() for name, h in self._latency.items()}
+            errors = dict(self._errors)
+            db = {name: list(v) for name, v in self._db.items()}
+            api = {name: list(v) for name, v in self._api.items()}
+
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_handler_duration_seconds Время обработки обновления",
+            f"# TYPE {p}_handler_duration_seconds histogram",
+        ]
+        for name, h in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.counts):
+                cumulative += count
+                lines.append(f"{p}_handler_duration_seconds_bucket{_labels(handler=name, le=bound)} {cumulative}")
+            lines.append(f"{p}_handler_duration_seconds_bucket{_labels(handler=name, le='+Inf')} {h.count}")
+            lines.append(f"{p}_handler_duration_seconds_sum{_labels(handler=name)} {h.sum}")
+            lines.append(f"{p}_handler_duration_seconds_count{_labels(handler=name)} {h.count}")
+
+        lines += [
+            f"# HELP {p}_errors_total Исключения по обработчикам: source — handler, db или api",
+            f"# TYPE {p}_errors_total counter",
+        ]
+        for (name, source, kind), count in sorted(errors.items()):
+            lines.append(f"{p}_errors_total{_labels(handler=name, source=source, type=kind)} {count}")
+
+        for source, totals, what in (('db', db, 'запросов к БД'), ('api', api, 'вызовов Bot API')):
+            lines += [
+                f"# HELP {p}_{source}_seconds_total Время {what} по обработчикам",
+                f"# TYPE {p}_{source}_seconds_total counter",
+            ]
+            lines += [f"{p}_{source}_seconds_total{_labels(handler=n)} {v[0]}" for n, v in sorted(totals.items())]
+            lines += [
+                f"# HELP {p}_{source}_calls_total Число {what} по обработчикам",
+                f"# TYPE {p}_{source}_calls_total counter",
+            ]
+            lines += [f"{p}_{source}_calls_total{_labels(handler=n)} {v[1]}" for n, v in sorted(totals.items())]
+
+        for name, help, fn in self._gauges:
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Ошибка при чтении метрики {name}: {e}")
+                continue
+            if value is None:
+                continue
+            lines += [f"# HELP {p}_{name} {help}", f"# TYPE {p}_{name} gauge", f"{p}_{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    HTTP-сервер со страницей /metrics (формат Prometheus) и дополнительными
+    текстовыми страницами (например, /queries — топ запросов к БД).
+    Слушает только локальный адрес по умолчанию; работает в фоновом потоке:
+      - start() / shutdown()
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, metrics, host='127.0.0.1', port=9100, path='/metrics', pages=None):
+        """
+        :param metrics: экземпляр Metrics
+        :param host: адрес, на котором слушает сервер
+        :param port: порт сервера
+        :param path: путь страницы метрик
+        :param pages: dict путь → функция без аргументов, возвращающая текст страницы
+        """
+        self.metrics = metrics
+        self.path = path
+        self.pages = {path: metrics.render, **(pages or {})}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def server_address(self):
+        return self._httpd.server_address
+
+    def _make_request_handler(self):
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = server.pages.get(self.path.split('?', 1)[0])
+                if page is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = page().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', server.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return RequestHandler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,6 +1,6 @@
-import os
-import dotenv
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 import pytz
@@ -8,6 +8,40 @@ import pytz
 from config import MOSCOW_TZ
 
 
+# Необязательное время «[в] HH:MM» — общее окончание для всех вариантов.
+# Для 'через N часов/минут' оно не допускается (проверяется после совпадения).
+_TIME = r'(?:\s*(?:в)?\s*(?P<hh>\d{1,2}):(?P<mm>\d{2}))?'
+_MINUTES = r'(?:минута|минуты|минут|минуту)'
+
+# Вся грамматика — одно регулярное выражение: одна попытка совпадения на ввод,
+# вариант определяется по заполненной именованной группе.
+_DEADLINE_RE = re.compile(
+    r'(?:'
+    r'через\s+(?P<n>\d+)\s*(?:'
+    rf'(?P<hours>час|часа|часов)(?:\s+(?P<hmin>\d+)\s*{_MINUTES})?'
+    rf'|(?P<mins>{_MINUTES})'
+    r'|(?P<days>день|дня|дней)'
+    r')'
+    r'|(?P<word>сегодня|завтра)'
+    r'|(?P<d>\d{1,2})\.(?P<m>\d{1,2})\.(?P<y>\d{2,4})'
+    r'|(?P<md>\d{1,2})\s+(?P<mon>[а-яё]+)'
+    r')'
+    + _TIME + r'$'
+)
+
+MONTHS = {
+    name: number for number, name in enumerate((
+        "января", "февраля", "марта", "апреля", "мая", "июня",
+        "июля", "августа", "сентября", "октября", "ноября", "декабря"
+    ), start=1)
+}
+
+
+def _local_dt(tz, year, month, day, hour=23, minute=59):
+    naive = datetime(year, month, day, hour, minute)
+    return tz.localize(naive).astimezone(pytz.utc)
+
+
 class DeadlineParser:
     """
     Преобразует текстовый ввод пользователя в UTC-время дедлайна.
@@ -19,98 +53,156 @@ class DeadlineParser:
       5) 'завтра [в HH:MM]'
       6) 'DD.MM.YYYY[ HH:MM]'
       7) 'D месяц [в HH:MM]'
+    Результаты разбора кешируются (LRU) по нормализованному тексту и текущей
+    минуте: внутри минуты абсолютные даты не меняются, а для вариантов 1–2
+    хранится смещение, которое прибавляется к точному «сейчас».
+      - parse_deadline(text, now=None) → datetime (UTC)
+      - parse_many(texts, now=None) → (results, errors) — пачка строк без исключений
+      - stats() → попадания и промахи кеша
     """
 
-    def __init__(self, timezone: pytz.BaseTzInfo = MOSCOW_TZ):
+    def __init__(self, timezone: pytz.BaseTzInfo = MOSCOW_TZ, cache_size=1024):
+        """
+        :param timezone: часовой пояс пользовательского ввода
+        :param cache_size: сколько результатов разбора держать (0 — без кеша)
+        """
         self.timezone = timezone
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # (текст, минута) → datetime или timedelta
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
 
-    def parse_deadline(self, text: str) -> datetime:
-        moscow = self.timezone
-        now = datetime.now(moscow)
+    def parse_deadline(self, text: str, now: datetime = None) -> datetime:
+        now = datetime.now(self.timezone) if now is None else now.astimezone(self.timezone)
         text = text.lower().strip()
+        key = (text, int(now.timestamp()) // 60)
+
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+
+        if result is None:
+            result = self._parse(text, now)
+            if self.cache_size:
+                with self._lock:
+                    self._cache[key] = result
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+        if isinstance(result, timedelta):
+            return (now + result).astimezone(pytz.utc)
+        return result
+
+    def parse_many(self, texts, now: datetime = None):
+        """
+        Разбор пачки строк (импорт, повторяющиеся задачи) без исключений.
+        «Сейчас» и часовой пояс определяются один раз, одинаковые строки
+        разбираются один раз, а календарные варианты (3–7) с одинаковыми
+        датой и временем переводятся в UTC один раз.
+        :param texts: итерируемое строк (можно генератор); не строки попадают в errors
+        :param now: момент, от которого считать относительные сроки
+        :return: (results, errors) — results[i] datetime (UTC) или None,
+                 errors — {индекс: текст ошибки}
+        """
+        now = datetime.now(self.timezone) if now is None else now.astimezone(self.timezone)
+        now_utc = now.astimezone(pytz.utc)
+        texts = [t.lower().strip() if isinstance(t, str) else None for t in texts]
 
-        def local_dt(year, month, day, hour=23, minute=59):
-            naive = datetime(year, month, day, hour, minute)
-            return moscow.localize(naive).astimezone(pytz.utc)
-
-        # 1) 'через N часов [M минут]'
-        match = re.match(
-            r'через\s+(\d+)\s*(?:час|часа|часов)'
-            r'(?:\s+(\d+)\s*(?:минута|минуты|минут|минуту))?$',
-            text
-        )
-        if match:
-            hours = int(match.group(1))
-            minutes = int(match.group(2)) if match.group(2) else 0
-            return (now + timedelta(hours=hours, minutes=minutes)) \
-                .astimezone(pytz.utc)
-
-        # 2) 'через N минут'
-        match = re.match(
-            r'через\s+(\d+)\s*(?:минута|минуты|минут|минуту)$',
-            text
-        )
-        if match:
-            minutes = int(match.group(1))
-            return (now + timedelta(minutes=minutes)) \
-                .astimezone(pytz.utc)
+        # Группируем уникальные строки по семейству варианта
+        relative, calendar, failed = {}, {}, {}
+        for text in dict.fromkeys(t for t in texts if t is not None):
+            try:
+                kind, value = self._match(text, now)
+            except ValueError as e:
+                failed[text] = str(e)
+                continue
+            (relative if kind == 'rel' else calendar)[text] = value
+
+        resolved = {text: now_utc + delta for text, delta in relative.items()}
+        local = {}
+        for text, parts in calendar.items():
+            if parts not in local:
+                try:
+                    local[parts] = _local_dt(self.timezone, *parts)
+                except ValueError as e:
+                    local[parts] = e
+            value = local[parts]
+            if isinstance(value, ValueError):
+                failed[text] = str(value)
+            else:
+                resolved[text] = value
+
+        results, errors = [], {}
+        for i, text in enumerate(texts):
+            if text is None:
+                results.append(None)
+                errors[i] = "Ожидалась строка с дедлайном."
+                continue
+            results.append(resolved.get(text))
+            if text in failed:
+                errors[i] = failed[text]
+        return results, errors
+
+    def _parse(self, text, now):
+        """
+        Для 'через N часов/минут' возвращает timedelta от «сейчас»,
+        для остальных вариантов — datetime в UTC.
+        """
+        kind, value = self._match(text, now)
+        if kind == 'rel':
+            return value
+        return _local_dt(self.timezone, *value)
+
+    def _match(self, text, now):
+        """
+        Один проход по грамматике:
+          ('rel', timedelta) — варианты 1–2
+          ('local', (год, месяц, день, час, минута)) — варианты 3–7, местное время
+        """
+        match = _DEADLINE_RE.match(text)
+        if match is None:
+            raise ValueError("Неверный формат даты.")
+        g = match.groupdict()
+
+        # 1) 'через N часов [M минут]' и 2) 'через N минут' — без «в HH:MM»
+        if g['hours'] or g['mins']:
+            if g['hh']:
+                raise ValueError("Неверный формат даты.")
+            if g['hours']:
+                return 'rel', timedelta(hours=int(g['n']), minutes=int(g['hmin'] or 0))
+            return 'rel', timedelta(minutes=int(g['n']))
+
+        hour = int(g['hh']) if g['hh'] else 23
+        minute = int(g['mm']) if g['mm'] else 59
 
         # 3) 'через N дней [в HH:MM]'
-        time_pt = r'(?:\s*(?:в)?\s*(\d{1,2}):(\d{2}))?'
-        match = re.match(
-            rf'через\s+(\d+)\s*(?:день|дня|дней){time_pt}$',
-            text
-        )
-        if match:
-            days = int(match.group(1))
-            hour = int(match.group(2)) if match.group(2) else 23
-            minute = int(match.group(3)) if match.group(3) else 59
-            future = now + timedelta(days=days)
-            return local_dt(future.year, future.month, future.day, hour, minute)
-
-        # 4) 'сегодня [в HH:MM]'
-        match = re.match(rf'сегодня{time_pt}$', text)
-        if match:
-            hour = int(match.group(1)) if match.group(1) else 23
-            minute = int(match.group(2)) if match.group(2) else 59
-            return local_dt(now.year, now.month, now.day, hour, minute)
-
-        # 5) 'завтра [в HH:MM]'
-        match = re.match(rf'завтра{time_pt}$', text)
-        if match:
-            hour = int(match.group(1)) if match.group(1) else 23
-            minute = int(match.group(2)) if match.group(2) else 59
-            tm = now + timedelta(days=1)
-            return local_dt(tm.year, tm.month, tm.day, hour, minute)
+        if g['days']:
+            future = now + timedelta(days=int(g['n']))
+            return 'local', (future.year, future.month, future.day, hour, minute)
+
+        # 4) 'сегодня [в HH:MM]' и 5) 'завтра [в HH:MM]'
+        if g['word']:
+            day = now if g['word'] == 'сегодня' else now + timedelta(days=1)
+            return 'local', (day.year, day.month, day.day, hour, minute)
 
         # 6) 'DD.MM.YYYY[ HH:MM]'
-        match = re.match(
-            rf'(\d{{1,2}})\.(\d{{1,2}})\.(\d{{2,4}}){time_pt}$',
-            text
-        )
-        if match:
-            d, m, y = map(int, match.groups()[:3])
+        if g['d']:
+            y = int(g['y'])
             y += 2000 if y < 100 else 0
-            hour = int(match.group(4)) if match.group(4) else 23
-            minute = int(match.group(5)) if match.group(5) else 59
-            return local_dt(y, m, d, hour, minute)
+            return 'local', (y, int(g['m']), int(g['d']), hour, minute)
 
         # 7) 'D месяц [в HH:MM]'
-        match = re.match(rf'(\d{{1,2}})\s+([а-яё]+){time_pt}$', text)
-        if match:
-            day = int(match.group(1))
-            month_str = match.group(2)
-            month_names = [
-                "января", "февраля", "марта", "апреля", "мая", "июня",
-                "июля", "августа", "сентября", "октября", "ноября", "декабря"
-            ]
-            try:
-                month = month_names.index(month_str) + 1
-            except ValueError:
-                raise ValueError("Неверное название месяца")
-            hour = int(match.group(3)) if match.group(3) else 23
-            minute = int(match.group(4)) if match.group(4) else 59
-            return local_dt(now.year, month, day, hour, minute)
-
-        # Если ни один шаблон не подошёл
-        raise ValueError("Неверный формат даты.")
+        month = MONTHS.get(g['mon'])
+        if month is None:
+            raise ValueError("Неверное название месяца")
+        return 'local', (now.year, month, int(g['md']), hour, minute)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result['size'] = len(self._cache)
+        return result
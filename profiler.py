@@ -0,0 +1,220 @@
+# profiler.py
+
+import collections
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер обработчиков, который включается на время, без перезапуска бота:
+      - start(updates, seconds, on_done) — профилировать следующие updates обновлений
+                                           и/или seconds секунд
+      - run(name, fn, *args)             — выполнить обработчик name под профайлером
+      - run_async(name, fn, *args)       — то же для обработчика-корутины (AsyncBotApp)
+      - stop(timeout)                    — закончить досрочно
+      - toggle(updates)                  — включить на updates обновлений или выключить (SIGUSR1)
+      - command(text, updates, on_done)  — разбор команды /profile → текст ответа
+      - active                           — идёт ли профилирование
+    Поток-сэмплер раз в interval снимает стеки только тех потоков, которые
+    сейчас выполняют обработчик, и сводит их в формат collapsed stacks
+    («обработчик;файл:функция;... число» — flamegraph.pl, speedscope, inferno).
+    Корень каждого стека — имя обработчика, под которым он зарегистрирован в BotApp.
+    В потоке цикла событий одновременно ждут несколько корутин-обработчиков:
+    сэмпл относится к той, чей кадр run_async окажется в снятом стеке, а если
+    ни одна сейчас не выполняется (цикл ждёт ввода-вывода), сэмпл не учитывается.
+    Пока профилирование выключено, обработчики вызываются напрямую.
+    """
+
+    def __init__(self, out_dir='profiles', interval=0.005, max_seconds=300.0, max_depth=128):
+        """
+        :param out_dir: куда записывать файлы профилей
+        :param interval: период снятия стеков, секунд
+        :param max_seconds: предельная длительность профилирования, секунд
+        :param max_depth: сколько кадров стека учитывать
+        """
+        self.out_dir = out_dir
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self.active = False
+        self._lock = threading.Lock()
+        self._threads = {}       # id потока → (обработчик, кадр run)
+        self._coroutines = {}    # id кадра run_async → (id потока, обработчик, кадр)
+        self._stop = threading.Event()
+        self._thread = None
+        self._updates = 0
+        self._limit = None
+        self._on_done = None
+
+    def start(self, updates=None, seconds=None, on_done=None):
+        """
+        Начинает профилирование. Без updates и seconds — до stop() или max_seconds.
+        :param on_done: функция (путь к файлу, сэмплов, обновлений) — вызывается после записи
+        :return: False, если профилирование уже идёт
+        """
+        with self._lock:
+            if self.active:
+                return False
+            self.active = True
+            self._updates = 0
+            self._limit = updates
+            self._on_done = on_done
+            self._stop.clear()
+            duration = min(seconds, self.max_seconds) if seconds else self.max_seconds
+            self._thread = threading.Thread(
+                target=self._sample, args=(time.monotonic() + duration,), name='profiler', daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def stop(self, timeout=None):
+        """
+        Останавливает сэмплер; файл профиля записывает сам поток-сэмплер.
+        :param timeout: сколько секунд ждать записи файла (None — не ждать)
+        """
+        self._stop.set()
+        thread = self._thread
+        if timeout is not None and thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def toggle(self, updates):
+        if self.active:
+            self.stop()
+        else:
+            self.start(updates)
+            print(f"Профилирование включено: {updates} обновлений")
+
+    def command(self, text, updates, on_done=None):
+        """
+        /profile [N | Ns | stop] — профилировать следующие N обновлений (по умолчанию
+        updates) или N секунд; stop — закончить досрочно.
+        :return: текст ответа администратору или None
+        """
+        arg = (text.split(maxsplit=1)[1:] or [''])[0].strip().lower()
+        if arg == 'stop':
+            if not self.active:
+                return "Профилирование не запущено."
+            self.stop()
+            return None
+
+        seconds = None
+        try:
+            if arg.endswith('s'):
+                updates, seconds = None, float(arg[:-1])
+            elif arg:
+                updates = int(arg)
+        except ValueError:
+            return "Использование: /profile [N | Ns | stop]"
+
+        if not self.start(updates, seconds, on_done=on_done):
+            return "Профилирование уже идёт (/profile stop — закончить)."
+        what = f"{seconds:g} с" if seconds else f"{updates} обновлений"
+        return f"📊 Профилирование включено: {what}."
+
+    def run(self, name, fn, *args):
+        if not self.active:
+            return fn(*args)
+        ident = threading.get_ident()
+        with self._lock:
+            previous = self._threads.get(ident)
+            # Кадр run — граница стека: всё, что выше, к обработчику не относится
+            self._threads[ident] = (name, sys._getframe())
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                if previous is None:
+                    self._threads.pop(ident, None)
+                else:
+                    self._threads[ident] = previous
+                done = self._count_update()
+            if done:
+                self.stop()
+
+    async def run_async(self, name, fn, *args):
+        if not self.active:
+            return await fn(*args)
+        frame = sys._getframe()
+        key = id(frame)
+        with self._lock:
+            self._coroutines[key] = (threading.get_ident(), name, frame)
+        try:
+            return await fn(*args)
+        finally:
+            with self._lock:
+                self._coroutines.pop(key, None)
+                done = self._count_update()
+            if done:
+                self.stop()
+
+    def _count_update(self):
+        # Под self._lock
+        self._updates += 1
+        return self._limit is not None and self._updates >= self._limit
+
+    # ── Поток-сэмплер ─────────────────────────────────────────────
+
+    @staticmethod
+    def _frame_name(code):
+        name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        # Пробел отделяет число в строке collapsed stacks
+        return name.replace(' ', '_').replace(';', ',')
+
+    def _sample(self, deadline):
+        stacks = collections.Counter()
+        samples = 0
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            running = {}    # id потока → {id кадра-границы: обработчик}
+            with self._lock:
+                for ident, (name, boundary) in self._threads.items():
+                    running.setdefault(ident, {})[id(boundary)] = name
+                for key, (ident, name, _) in self._coroutines.items():
+                    running.setdefault(ident, {})[key] = name
+            for ident, boundaries in running.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and id(frame) not in boundaries and len(stack) < self.max_depth:
+                    stack.append(self._frame_name(frame.f_code))
+                    frame = frame.f_back
+                if frame is None:
+                    # Обработчик уже вернулся (или корутины ждут ввода-вывода) — не его сэмпл
+                    continue
+                name = boundaries.get(id(frame))
+                if name is None:
+                    # Стек глубже max_depth: обработчик известен, только если он в потоке один
+                    if len(boundaries) != 1:
+                        continue
+                    name = next(iter(boundaries.values()))
+                stack.append(name)
+                stacks[';'.join(reversed(stack))] += 1
+                samples += 1
+            del frames
+
+        with self._lock:
+            self.active = False
+            self._threads.clear()
+            self._coroutines.clear()
+            updates, on_done = self._updates, self._on_done
+        try:
+            path = self._write(stacks)
+        except OSError as e:
+            print(f"Не удалось записать профиль: {e}")
+            return
+        print(f"Профиль записан: {path} ({samples} сэмплов, {updates} обновлений)")
+        if on_done is not None:
+            try:
+                on_done(path, samples, updates)
+            except Exception as e:
+                print(f"Ошибка при уведомлении о профиле: {e}")
+
+    def _write(self, stacks):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, time.strftime('profile-%Y%m%d-%H%M%S.folded'))
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
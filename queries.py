@@ -0,0 +1,187 @@
+# queries.py
+
+from datetime import datetime
+
+import pytz
+
+
+# Ключ списка → (заголовок, SQL-условие) для фильтров /mytasks.
+# Просроченные задачи помечает sweeper.OverdueSweeper (status = 'overdue'), но фильтр
+# 'od' от него не зависит: активная задача с прошедшим дедлайном попадает в список сразу
+# (и при SWEEPER_ENABLED=0). С OR ни один частичный индекс не отдаёт строки в порядке
+# списка, поэтому страница собирается из двух половин (UNION_WHERE): каждая читается
+# по своему индексу (idx_tasks_overdue_rank, idx_tasks_open_rank) уже отсортированной.
+OVERDUE_STATUS_WHERE = "status = 'overdue'"
+ACTIVE_PAST_WHERE = "status = 'active' AND deadline < NOW()"
+OVERDUE_WHERE = f"({OVERDUE_STATUS_WHERE} OR ({ACTIVE_PAST_WHERE}))"
+OPEN_STATUS = "status IN ('active', 'overdue')"
+FILTER_WHERE = {
+    'hi': ('🔴 Высокий приоритет', f"priority_rank = 1 AND {OPEN_STATUS}"),
+    'md': ('🟡 Средний приоритет', f"priority_rank = 2 AND {OPEN_STATUS}"),
+    'lo': ('🟢 Низкий приоритет', f"priority_rank = 3 AND {OPEN_STATUS}"),
+    'up': ('📅 Ближайшие дедлайны', "deadline > NOW() AND status = 'active'"),
+    'od': ('❗️ Просроченные', OVERDUE_WHERE),
+    'dn': ('✅ Завершенные', "status = 'completed'"),
+    'al': ('📋 Все задачи', OPEN_STATUS),
+}
+# Условие списка → непересекающиеся половины: запрос страницы — UNION ALL
+# половин с общим курсором (TaskRepository.build_page_query)
+UNION_WHERE = {OVERDUE_WHERE: (OVERDUE_STATUS_WHERE, ACTIVE_PAST_WHERE)}
+# Списки по категории и по тегу (значение — параметр запроса).
+# tags @> ARRAY[...] (а не = ANY) использует GIN-индекс idx_tasks_tags_gin
+CATEGORY_WHERE = "category = %s"
+TAG_WHERE = "tags @> ARRAY[%s]::varchar(255)[]"
+
+# Порядок сортировки списков: приоритет, дедлайн (без дедлайна — в конце), id.
+# priority_rank — хранимая колонка (см. Database.init_db), под этот ключ построены
+# частичные индексы idx_tasks_open_rank и idx_tasks_completed_rank.
+PRIORITY_RANK = {'high': 1, 'medium': 2, 'low': 3}
+RANK_SQL = "priority_rank"
+DEADLINE_SQL = "COALESCE(deadline, 'infinity'::timestamptz)"
+
+# Только те колонки, которые нужны TaskFormatter.format_task и кнопкам списка
+# (updated_at — версия задачи для кеша карточек)
+LIST_COLUMNS = ('task_id', 'title', 'description', 'priority', 'tags', 'deadline', 'updated_at')
+# Карточка задачи после создания/изменения: колонки списка + то, что нужно
+# напоминаниям (user_id, status) и кнопкам (status). Запросы возвращают их
+# через RETURNING, без повторного SELECT.
+TASK_COLUMNS = LIST_COLUMNS + ('user_id', 'category', 'status')
+TASK_RETURNING = ', '.join(TASK_COLUMNS)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+# Запросы обработчиков. Общие для синхронного (psycopg2) и asyncio-режима (psycopg 3):
+# оба драйвера понимают параметры %s.
+REGISTER_USER_SQL = (
+    "INSERT INTO users (user_id, username) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING"
+)
+INSERT_TASK_SQL = """
+    INSERT INTO tasks
+        (user_id, title, description, priority, category, tags, deadline, status)
+    VALUES
+        (%s, %s, %s, %s, %s, %s, %s, 'active')
+    RETURNING """ + TASK_RETURNING
+# Регистрация пользователя и вставка задачи одним запросом: проверка внешнего
+# ключа выполняется в конце оператора и уже видит строку из CTE
+INSERT_TASK_WITH_USER_SQL = """
+    WITH new_user AS (
+        INSERT INTO users (user_id, username) VALUES (%s, %s)
+        ON CONFLICT (user_id) DO NOTHING
+    )
+""" + INSERT_TASK_SQL
+TASK_BY_ID_SQL = f"SELECT {TASK_RETURNING} FROM tasks WHERE task_id = %s"
+# Задача из кнопки списка: чужую задачу не показываем (callback_data можно подделать)
+USER_TASK_SQL = f"SELECT {TASK_RETURNING} FROM tasks WHERE task_id = %s AND user_id = %s"
+TASK_DEADLINE_SQL = "SELECT deadline FROM tasks WHERE task_id = %s"
+TASK_EDIT_FIELDS_SQL = """
+    SELECT title, description, priority, category, tags, deadline
+    FROM tasks
+    WHERE task_id = %s
+"""
+COMPLETE_TASK_SQL = (
+    "UPDATE tasks SET status = 'completed', updated_at = NOW() WHERE task_id = %s "
+    f"RETURNING {TASK_RETURNING}"
+)
+DELETE_TASK_SQL = "DELETE FROM tasks WHERE task_id = %s RETURNING title"
+# Просроченная задача с новым дедлайном в будущем снова становится активной
+RESCHEDULE_TASK_SQL = f"""
+    UPDATE tasks
+       SET deadline   = %s,
+           status     = CASE WHEN status = 'overdue' AND %s::timestamptz > NOW()
+                             THEN 'active' ELSE status END,
+           updated_at = NOW()
+     WHERE task_id = %s
+     RETURNING {TASK_RETURNING}
+"""
+UPDATE_TASK_SQL = f"""
+    UPDATE tasks
+       SET title       = %s,
+           description = %s,
+           priority    = %s,
+           category    = %s,
+           tags        = %s,
+           deadline    = %s,
+           status      = CASE WHEN status = 'overdue' AND %s::timestamptz > NOW()
+                              THEN 'active' ELSE status END,
+           updated_at  = NOW()
+     WHERE task_id = %s
+     RETURNING {TASK_RETURNING}
+"""
+CATEGORIES_SQL = """
+    SELECT DISTINCT category FROM tasks
+    WHERE user_id = %s AND category IS NOT NULL AND category <> ''
+    ORDER BY category
+    LIMIT %s
+"""
+TAGS_SQL = """
+    SELECT DISTINCT tag FROM tasks, unnest(tags) AS tag
+    WHERE user_id = %s AND tag <> ''
+    ORDER BY tag
+    LIMIT %s
+"""
+
+# Горячие запросы обработчиков — серверные подготовленные операторы (db.StatementRegistry).
+# Запросы страниц списков собираются на лету и готовятся автоматически после нескольких выполнений.
+PREPARED_STATEMENTS = {
+    'register_user': REGISTER_USER_SQL,
+    'insert_task': INSERT_TASK_WITH_USER_SQL,
+    'task_by_id': TASK_BY_ID_SQL,
+    'user_task': USER_TASK_SQL,
+    'complete_task': COMPLETE_TASK_SQL,
+    'delete_task': DELETE_TASK_SQL,
+    'reschedule_task': RESCHEDULE_TASK_SQL,
+    'update_task': UPDATE_TASK_SQL,
+    'user_categories': CATEGORIES_SQL,
+    'user_tags': TAGS_SQL,
+}
+
+
+class TaskRecord:
+    """
+    Строка задачи (TASK_COLUMNS; из списков — только LIST_COLUMNS, остальное None).
+    Поля в __slots__ вместо dict на каждую строку; task['title'] и
+    task.get('title') работают как у словаря, поэтому TaskFormatter,
+    курсоры списков и напоминания принимают и то, и другое.
+      - TaskRecord(*row) — из строки SELECT LIST_COLUMNS / RETURNING TASK_RETURNING
+    """
+
+    __slots__ = TASK_COLUMNS
+
+    def __init__(self, task_id, title, description, priority, tags, deadline, updated_at,
+                 user_id=None, category=None, status=None):
+        self.task_id = task_id
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.tags = tags
+        self.deadline = deadline
+        self.updated_at = updated_at
+        self.user_id = user_id
+        self.category = category
+        self.status = status
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"TaskRecord(task_id={self.task_id!r}, title={self.title!r}, status={self.status!r})"
+
+
+class TaskPage:
+    """
+    Одна страница списка: задачи и признак «есть продолжение».
+    """
+
+    __slots__ = ('tasks', 'has_more')
+
+    def __init__(self, tasks, has_more):
+        self.tasks = tasks
+        self.has_more = has_more
+
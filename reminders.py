@@ -0,0 +1,266 @@
+# reminders.py
+
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+
+# Напоминание забирает тот экземпляр бота, чей UPDATE изменил строку: остальные
+# после блокировки строки перечитывают условие и получают 0 строк. Условие на
+# deadline отбрасывает таймер, если дедлайн успели перенести, а status — если
+# задачу завершили в другом экземпляре.
+CLAIM_REMINDER_SQL = """
+    UPDATE tasks
+       SET reminded_for = deadline
+     WHERE task_id = %s
+       AND status = 'active'
+       AND deadline = %s
+       AND reminded_for IS DISTINCT FROM deadline
+     RETURNING task_id
+"""
+
+
+class TimingWheel:
+    """
+    Хешированное колесо таймеров: slots ячеек по tick секунд.
+    Горизонт колеса — slots * tick секунд; всё, что дальше, не принимается
+    (такие напоминания дочитываются из БД следующим окном).
+      - add(key, when, payload) → False, если when за горизонтом
+      - remove(key)
+      - advance(now) → список payload, чьё время наступило
+    Вставка, удаление и срабатывание — O(1) на элемент.
+    """
+
+    def __init__(self, tick=1.0, slots=3600, now=None):
+        self.tick = tick
+        self.slots = slots
+        self._wheel = [dict() for _ in range(slots)]
+        self._where = {}                 # key → номер тика
+        self._current = self._tick_of(time.time() if now is None else now)
+
+    def _tick_of(self, ts):
+        return int(ts // self.tick)
+
+    @property
+    def horizon(self):
+        """
+        Время (epoch), до которого колесо принимает таймеры.
+        """
+        return (self._current + self.slots) * self.tick
+
+    def __len__(self):
+        return len(self._where)
+
+    def add(self, key, when, payload):
+        tick_no = max(self._tick_of(when), self._current + 1)
+        if tick_no - self._current >= self.slots:
+            return False
+        self.remove(key)
+        self._wheel[tick_no % self.slots][key] = payload
+        self._where[key] = tick_no
+        return True
+
+    def remove(self, key):
+        tick_no = self._where.pop(key, None)
+        if tick_no is None:
+            return False
+        self._wheel[tick_no % self.slots].pop(key, None)
+        return True
+
+    def advance(self, now):
+        """
+        Прокручивает колесо до now и возвращает сработавшие payload.
+        """
+        target = self._tick_of(now)
+        due = []
+        # Если поток проспал больше оборота, хватит одного полного прохода
+        start = max(self._current + 1, target - self.slots + 1)
+        for tick_no in range(start, target + 1):
+            slot = self._wheel[tick_no % self.slots]
+            if slot:
+                for key, payload in slot.items():
+                    del self._where[key]
+                    due.append(payload)
+                slot.clear()
+        self._current = max(self._current, target)
+        return due
+
+
+class ReminderScheduler:
+    """
+    Напоминания о дедлайнах задач:
+      - раз в полгоризонта подгружает из БД задачи, чьё время напоминания
+        попадает в горизонт колеса (частичный индекс idx_tasks_active_deadline)
+      - держит их в TimingWheel и отправляет через очередь с лимитами
+      - schedule()/cancel() — точечные обновления из обработчиков
+        (создание, перенос, редактирование, завершение, удаление задачи)
+    Несколько экземпляров бота держат одни и те же таймеры, но каждое
+    напоминание перед отправкой забирается в БД (CLAIM_REMINDER_SQL,
+    колонка reminded_for) — пользователь получает его один раз.
+    """
+
+    def __init__(self, db, bot, formatter, lead=3600, tick=1.0, horizon=3600, clock=time.time):
+        """
+        :param db: экземпляр Database
+        :param bot: экземпляр RateLimitedBot (нужен queue_message)
+        :param formatter: экземпляр TaskFormatter
+        :param lead: за сколько секунд до дедлайна напоминать
+        :param tick: шаг колеса в секундах
+        :param horizon: сколько секунд вперёд держать в памяти
+        :param clock: источник текущего времени (epoch), подменяется в тестах
+        """
+        self.db = db
+        self.bot = bot
+        self.formatter = formatter
+        self.lead = lead
+        self.tick = tick
+        self.clock = clock
+
+        self._wheel = TimingWheel(tick, max(1, int(horizon // tick)), now=clock())
+        self._lock = threading.Lock()
+        self._loaded_until = None    # до какого времени напоминаний окно уже прочитано
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'loaded': 0, 'scheduled': 0, 'cancelled': 0, 'fired': 0, 'skipped': 0, 'load_errors': 0}
+
+    # ── Обновления из обработчиков ────────────────────────────────
+
+    def schedule(self, task_id, user_id, title, deadline):
+        """
+        Задача создана или её дедлайн изменился.
+        """
+        with self._lock:
+            self._wheel.remove(task_id)
+            if deadline is None:
+                return
+            now = self.clock()
+            dl_ts = deadline.timestamp()
+            if dl_ts <= now:
+                return
+            fire_at = max(dl_ts - self.lead, now)
+            # За горизонтом колеса add() откажет — задачу подберёт загрузка окна.
+            # Повторное чтение той же задачи окном лишь перезапишет таймер по task_id.
+            if self._wheel.add(task_id, fire_at, (task_id, user_id, title, deadline)):
+                self._stats['scheduled'] += 1
+
+    def cancel(self, task_id):
+        """
+        Задача завершена или удалена.
+        """
+        with self._lock:
+            if self._wheel.remove(task_id):
+                self._stats['cancelled'] += 1
+
+    # ── Загрузка окна и срабатывание ──────────────────────────────
+
+    def _load_window(self, now):
+        """
+        Дочитывает задачи, чьё время напоминания в [loaded_until, горизонт колеса).
+        Первая загрузка берёт все дедлайны от now: задачам, у которых время
+        напоминания уже прошло (дедлайн ближе lead), напоминание отправляется сразу.
+        """
+        with self._lock:
+            first = self._loaded_until is None
+            start = now if first else self._loaded_until
+            end = self._wheel.horizon
+        if end <= start:
+            return
+        since = now if first else start + self.lead
+
+        utc = pytz.utc
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    """
+                    SELECT task_id, user_id, title, deadline
+                    FROM tasks
+                    WHERE status = 'active'
+                      AND deadline IS NOT NULL
+                      AND deadline >= %s AND deadline < %s
+                      AND reminded_for IS DISTINCT FROM deadline
+                    ORDER BY deadline
+                    """,
+                    (
+                        datetime.fromtimestamp(since, utc),
+                        datetime.fromtimestamp(end + self.lead, utc),
+                    )
+                )
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+
+        with self._lock:
+            for task_id, user_id, title, deadline in rows:
+                fire_at = max(deadline.timestamp() - self.lead, now)
+                self._wheel.add(task_id, fire_at, (task_id, user_id, title, deadline))
+            self._loaded_until = end
+            self._stats['loaded'] += len(rows)
+
+    def _claim(self, task_id, deadline):
+        """
+        True, если напоминание досталось этому экземпляру.
+        """
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(CLAIM_REMINDER_SQL, (task_id, deadline))
+                claimed = cur.fetchone() is not None
+            finally:
+                cur.close()
+            conn.commit()
+        return claimed
+
+    def _fire(self, payload):
+        task_id, user_id, title, deadline = payload
+        if not self._claim(task_id, deadline):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return
+        text = f"🔔 Напоминание: *{title}*\n{self.formatter.format_deadline(deadline)}"
+        # Личный чат пользователя совпадает с его user_id
+        self.bot.queue_message(user_id, text, parse_mode='Markdown')
+        with self._lock:
+            self._stats['fired'] += 1
+
+    def _loop(self):
+        reload_every = max(self.tick, self._wheel.slots * self.tick / 2)
+        next_load = 0.0
+        while not self._stop.is_set():
+            now = self.clock()
+            if now >= next_load:
+                try:
+                    self._load_window(now)
+                    next_load = now + reload_every
+                except Exception as e:
+                    with self._lock:
+                        self._stats['load_errors'] += 1
+                    print(f"Ошибка загрузки напоминаний: {e}")
+                    next_load = now + min(reload_every, 30)
+
+            with self._lock:
+                due = self._wheel.advance(now)
+            for payload in due:
+                try:
+                    self._fire(payload)
+                except Exception as e:
+                    print(f"Ошибка отправки напоминания: {e}")
+
+            self._stop.wait(self.tick)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='reminders', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            result['pending'] = len(self._wheel)
+        return result
@@ -0,0 +1,325 @@
+# repository.py
+
+from datetime import timedelta
+
+from queries import (
+    TaskRecord, TaskPage, LIST_COLUMNS, RANK_SQL, DEADLINE_SQL, PRIORITY_RANK, EPOCH,
+    FILTER_WHERE, UNION_WHERE, CATEGORY_WHERE, TAG_WHERE,
+    REGISTER_USER_SQL, INSERT_TASK_WITH_USER_SQL, TASK_BY_ID_SQL, USER_TASK_SQL, TASK_DEADLINE_SQL,
+    TASK_EDIT_FIELDS_SQL, COMPLETE_TASK_SQL, DELETE_TASK_SQL, RESCHEDULE_TASK_SQL,
+    UPDATE_TASK_SQL, CATEGORIES_SQL, TAGS_SQL,
+)
+
+
+# Колонки TASK_EDIT_FIELDS_SQL — поля диалога редактирования (в том же порядке)
+EDIT_COLUMNS = ('title', 'description', 'priority', 'category', 'tags', 'deadline')
+
+
+class TaskRepository:
+    """
+    Доступ к задачам для всех обработчиков: SQL из queries.py, соединения из пула,
+    транзакции и разбор строк — в одном месте:
+      - register_user(user_id, username)
+      - create(user_id, username, title, ...) → TaskRecord
+      - get(task_id, user_id=None) → TaskRecord или None (с user_id — только задача этого пользователя)
+      - deadline(task_id) → дедлайн или None (нет дедлайна или задачи)
+      - edit_fields(task_id) → dict полей EDIT_COLUMNS или None
+      - complete(task_id) / reschedule(task_id, deadline) / update(task_id, ...) → TaskRecord или None
+      - delete(task_id) → название удалённой задачи или None
+      - list_by_filter(user_id, where, params, cursor, backward, limit) → TaskPage
+      - distinct_categories(user_id, limit) / distinct_tags(user_id, limit) → список строк
+      - то же с суффиксом _async — для asyncio-режима
+      - build_page_query(...) → (sql, args) — запрос страницы без выполнения
+      - page_statements() → dict имя → SQL всех форм запроса страницы (для PREPARE)
+      - cursor_of(task) / encode_cursor / decode_cursor — курсор (ранг, дедлайн, task_id)
+    Каждый метод — один оператор SQL в своей транзакции; изменения фиксируются
+    сразу, при ошибке транзакция откатывается, а исключение передаётся вызывающему.
+    Строки разбираются по позиции колонок (TaskRecord), без cursor.description.
+    """
+
+    def __init__(self, db):
+        """
+        :param db: экземпляр Database
+        """
+        self.db = db
+
+    # ── Выполнение ────────────────────────────────────────────────
+
+    def _fetch(self, query, args, many=False, commit=False):
+        """
+        Один оператор → первая строка (или None) либо все строки при many=True.
+        commit=True — зафиксировать изменения, если оператор их сделал.
+        """
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(query, args)
+                result = cur.fetchall() if many else cur.fetchone()
+            finally:
+                cur.close()
+            if commit and result:
+                conn.commit()
+        return result
+
+    async def _fetch_async(self, query, args, many=False):
+        # Асинхронный пул фиксирует транзакцию при возврате соединения.
+        # Готовятся только зарегистрированные запросы (Database.statements),
+        # остальные psycopg 3 выполняет без PREPARE (prepare=None — по порогу драйвера)
+        prepare = True if self.db.is_prepared(query) else None
+        async with self.db.connection_async() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, args, prepare=prepare)
+                return await (cur.fetchall() if many else cur.fetchone())
+
+    @staticmethod
+    def _record(row):
+        return TaskRecord(*row) if row else None
+
+    # ── Пользователи и создание задач ─────────────────────────────
+
+    def register_user(self, user_id, username):
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(REGISTER_USER_SQL, (user_id, username))
+            finally:
+                cur.close()
+            conn.commit()
+
+    async def register_user_async(self, user_id, username):
+        prepare = True if self.db.is_prepared(REGISTER_USER_SQL) else None
+        async with self.db.connection_async() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(REGISTER_USER_SQL, (user_id, username), prepare=prepare)
+
+    @staticmethod
+    def _create_args(user_id, username, title, description, priority, category, tags, deadline, owner_id):
+        return (
+            user_id, username, user_id if owner_id is None else owner_id,
+            title, description, priority, category, tags, deadline,
+        )
+
+    def create(self, user_id, username, title, description=None, priority='medium',
+               category=None, tags=None, deadline=None, owner_id=None):
+        """
+        Регистрирует пользователя (если ещё нет) и создаёт задачу одним оператором.
+        :param owner_id: владелец задачи, если это не user_id
+        :return: TaskRecord новой задачи (из RETURNING)
+        """
+        args = self._create_args(user_id, username, title, description, priority, category, tags,
+                                 deadline, owner_id)
+        return self._record(self._fetch(INSERT_TASK_WITH_USER_SQL, args, commit=True))
+
+    async def create_async(self, user_id, username, title, description=None, priority='medium',
+                           category=None, tags=None, deadline=None, owner_id=None):
+        args = self._create_args(user_id, username, title, description, priority, category, tags,
+                                 deadline, owner_id)
+        return self._record(await self._fetch_async(INSERT_TASK_WITH_USER_SQL, args))
+
+    # ── Одна задача ───────────────────────────────────────────────
+
+    @staticmethod
+    def _get_query(task_id, user_id):
+        if user_id is None:
+            return TASK_BY_ID_SQL, (task_id,)
+        return USER_TASK_SQL, (task_id, user_id)
+
+    def get(self, task_id, user_id=None):
+        return self._record(self._fetch(*self._get_query(task_id, user_id)))
+
+    async def get_async(self, task_id, user_id=None):
+        return self._record(await self._fetch_async(*self._get_query(task_id, user_id)))
+
+    def deadline(self, task_id):
+        row = self._fetch(TASK_DEADLINE_SQL, (task_id,))
+        return row[0] if row else None
+
+    async def deadline_async(self, task_id):
+        row = await self._fetch_async(TASK_DEADLINE_SQL, (task_id,))
+        return row[0] if row else None
+
+    def edit_fields(self, task_id):
+        row = self._fetch(TASK_EDIT_FIELDS_SQL, (task_id,))
+        return dict(zip(EDIT_COLUMNS, row)) if row else None
+
+    async def edit_fields_async(self, task_id):
+        row = await self._fetch_async(TASK_EDIT_FIELDS_SQL, (task_id,))
+        return dict(zip(EDIT_COLUMNS, row)) if row else None
+
+    def complete(self, task_id):
+        return self._record(self._fetch(COMPLETE_TASK_SQL, (task_id,), commit=True))
+
+    async def complete_async(self, task_id):
+        return self._record(await self._fetch_async(COMPLETE_TASK_SQL, (task_id,)))
+
+    def reschedule(self, task_id, deadline):
+        """
+        Новый дедлайн; просроченная задача с дедлайном в будущем снова активна.
+        """
+        args = (deadline, deadline, task_id)
+        return self._record(self._fetch(RESCHEDULE_TASK_SQL, args, commit=True))
+
+    async def reschedule_async(self, task_id, deadline):
+        args = (deadline, deadline, task_id)
+        return self._record(await self._fetch_async(RESCHEDULE_TASK_SQL, args))
+
+    def update(self, task_id, title=None, description=None, priority=None, category=None,
+               tags=None, deadline=None):
+        """
+        Перезаписывает все редактируемые поля (EDIT_COLUMNS) задачи.
+        """
+        args = (title, description, priority, category, tags, deadline, deadline, task_id)
+        return self._record(self._fetch(UPDATE_TASK_SQL, args, commit=True))
+
+    async def update_async(self, task_id, title=None, description=None, priority=None, category=None,
+                           tags=None, deadline=None):
+        args = (title, description, priority, category, tags, deadline, deadline, task_id)
+        return self._record(await self._fetch_async(UPDATE_TASK_SQL, args))
+
+    def delete(self, task_id):
+        row = self._fetch(DELETE_TASK_SQL, (task_id,), commit=True)
+        return row[0] if row else None
+
+    async def delete_async(self, task_id):
+        row = await self._fetch_async(DELETE_TASK_SQL, (task_id,))
+        return row[0] if row else None
+
+    # ── Списки с keyset-пагинацией ────────────────────────────────
+
+    @classmethod
+    def build_page_query(cls, user_id, where, params=(), cursor=None, backward=False, limit=10):
+        """
+        Текст запроса страницы и его параметры (без выполнения) — используется
+        также проверкой планов в benchmarks/explain_indexes.py.
+        Условие из UNION_WHERE разбивается на половины: каждая читает не больше
+        limit + 1 строк по своему индексу, внешний запрос сливает их в порядке списка.
+        """
+        parts = UNION_WHERE.get(where)
+        if parts is None:
+            return cls._page_select(LIST_COLUMNS, user_id, where, params, cursor, backward, limit)
+
+        halves = [
+            cls._page_select(LIST_COLUMNS + (RANK_SQL,), user_id, part, params, cursor, backward, limit)
+            for part in parts
+        ]
+        query = (
+            f"SELECT {', '.join(LIST_COLUMNS)} FROM ("
+            + " UNION ALL ".join(f"({sql})" for sql, _ in halves)
+            + f") AS page ORDER BY {cls._page_order(backward)} LIMIT %s"
+        )
+        args = [arg for _, half_args in halves for arg in half_args]
+        args.append(limit + 1)
+        return query, args
+
+    @staticmethod
+    def _page_order(backward):
+        order = "DESC" if backward else "ASC"
+        return f"{RANK_SQL} {order}, {DEADLINE_SQL} {order}, task_id {order}"
+
+    @classmethod
+    def _page_select(cls, columns, user_id, where, params, cursor, backward, limit):
+        query = (
+            f"SELECT {', '.join(columns)} FROM tasks"
+            f" WHERE user_id = %s AND {where}"
+        )
+        args = [user_id, *params]
+        if cursor is not None:
+            query += (
+                f" AND ({RANK_SQL}, {DEADLINE_SQL}, task_id)"
+                f" {'<' if backward else '>'} (%s, %s::timestamptz, %s)"
+            )
+            args.extend(cursor)
+        query += f" ORDER BY {cls._page_order(backward)} LIMIT %s"
+        # Лишняя строка нужна только для признака has_more
+        args.append(limit + 1)
+        return query, args
+
+    @classmethod
+    def page_statements(cls):
+        """
+        Все формы запроса страницы: каждый фильтр (FILTER_WHERE, категория, тег)
+        без курсора, вперёд и назад от курсора. Значения фильтра, курсор и limit —
+        параметры, поэтому форм конечное число и их можно подготовить заранее.
+        """
+        wheres = {key: (where, ()) for key, (_, where) in FILTER_WHERE.items()}
+        wheres['category'] = (CATEGORY_WHERE, ('',))
+        wheres['tag'] = (TAG_WHERE, ('',))
+        statements = {}
+        for key, (where, params) in wheres.items():
+            for suffix, cursor, backward in (('', None, False), ('_next', (0, 0, 0), False),
+                                             ('_prev', (0, 0, 0), True)):
+                sql, _ = cls.build_page_query(0, where, params, cursor, backward)
+                statements[f"page_{key}{suffix}"] = sql
+        return statements
+
+    def list_by_filter(self, user_id, where, params=(), cursor=None, backward=False, limit=10):
+        """
+        Строки строго после (backward=False) или до (backward=True) курсора.
+        При backward=True строки возвращаются в обратном порядке — от курсора.
+        Стоимость страницы не зависит от общего числа задач пользователя:
+        читается не больше limit + 1 строк.
+        """
+        query, args = self.build_page_query(user_id, where, params, cursor, backward, limit)
+        return self._to_page(self._fetch(query, args, many=True), limit)
+
+    async def list_by_filter_async(self, user_id, where, params=(), cursor=None, backward=False, limit=10):
+        query, args = self.build_page_query(user_id, where, params, cursor, backward, limit)
+        return self._to_page(await self._fetch_async(query, args, many=True), limit)
+
+    @staticmethod
+    def _to_page(rows, limit):
+        return TaskPage(
+            [TaskRecord(*r) for r in rows[:limit]],
+            len(rows) > limit,
+        )
+
+    def distinct_categories(self, user_id, limit=100):
+        """
+        Категории пользователя (по алфавиту, не больше limit).
+        """
+        return [row[0] for row in self._fetch(CATEGORIES_SQL, (user_id, limit), many=True)]
+
+    def distinct_tags(self, user_id, limit=100):
+        """
+        Теги пользователя (по алфавиту, не больше limit).
+        """
+        return [row[0] for row in self._fetch(TAGS_SQL, (user_id, limit), many=True)]
+
+    async def distinct_categories_async(self, user_id, limit=100):
+        return [row[0] for row in await self._fetch_async(CATEGORIES_SQL, (user_id, limit), many=True)]
+
+    async def distinct_tags_async(self, user_id, limit=100):
+        return [row[0] for row in await self._fetch_async(TAGS_SQL, (user_id, limit), many=True)]
+
+    # ── Курсор списка ─────────────────────────────────────────────
+
+    @staticmethod
+    def cursor_of(task):
+        """
+        Курсор (ранг приоритета, дедлайн, task_id) для строки списка.
+        """
+        deadline = task.get('deadline')
+        return (
+            PRIORITY_RANK.get(task.get('priority'), 4),
+            'infinity' if deadline is None else deadline,
+            task['task_id'],
+        )
+
+    @staticmethod
+    def encode_cursor(cursor):
+        """
+        Компактная строка для callback_data: ранг:дедлайн:id.
+        Дедлайн кодируется в микросекундах от эпохи (точно, без потерь), 'i' — нет дедлайна.
+        """
+        rank, deadline, task_id = cursor
+        dl = 'i' if deadline == 'infinity' else str((deadline - EPOCH) // timedelta(microseconds=1))
+        return f"{rank}:{dl}:{task_id}"
+
+    @staticmethod
+    def decode_cursor(text):
+        """
+        Обратное к encode_cursor. ValueError при неверном формате.
+        """
+        rank, dl, task_id = text.split(':')
+        deadline = 'infinity' if dl == 'i' else EPOCH + timedelta(microseconds=int(dl))
+        return int(rank), deadline, int(task_id)
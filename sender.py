@@ -0,0 +1,601 @@
+# sender.py
+
+import asyncio
+import collections
+import contextlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telebot import apihelper, asyncio_helper
+
+from metrics import current_handler
+
+
+# Приоритеты очередей: чем меньше число, тем раньше отправка
+PRIORITY_HIGH = 0     # ответы на callback-запросы
+PRIORITY_NORMAL = 1   # обычные ответы в диалоге
+PRIORITY_BULK = 2     # массовый вывод списков задач
+
+class TokenBucket:
+    """
+    Классическое «ведро токенов»: rate токенов в секунду, не больше capacity.
+    Не потокобезопасно — используется под замком OutboundSender.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now):
+        """
+        Сколько секунд ждать до появления токена (0 — можно отправлять).
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now, seconds):
+        """
+        Полная пауза после 429 Too Many Requests.
+        """
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class _Job:
+    __slots__ = ('method', 'args', 'kwargs', 'chat_id', 'priority', 'future', 'attempts')
+
+    def __init__(self, method, args, kwargs, chat_id, priority):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.chat_id = chat_id
+        self.priority = priority
+        self.future = Future()
+        self.attempts = 0
+
+
+class OutboundSender:
+    """
+    Центральная очередь исходящих вызовов Bot API:
+      - глобальное ведро токенов и отдельное ведро на каждый чат
+      - приоритетные очереди (HIGH → NORMAL → BULK)
+      - вызовы одного чата уходят строго по порядку и не больше одного «в полёте»,
+        приоритет влияет на очерёдность между разными чатами
+      - при 429 ставит чат (или весь бот) на паузу retry_after и повторяет вызов
+      - submit(...) → Future, stats() — счётчики
+    """
+
+    def __init__(self, bot, global_rate=30.0, chat_rate=1.0, chat_burst=3,
+                 group_rate=20 / 60, workers=4, max_retries=5, scan_limit=64):
+        """
+        :param bot: экземпляр telebot.TeleBot, через который идут реальные вызовы
+        :param global_rate: лимит сообщений в секунду на весь бот
+        :param chat_rate: лимит сообщений в секунду в личный чат
+        :param chat_burst: сколько сообщений в чат можно отправить «пачкой»
+        :param group_rate: лимит сообщений в секунду в группу (chat_id < 0)
+        :param workers: число потоков, выполняющих HTTP-запросы
+        :param max_retries: сколько раз повторять вызов после 429
+        :param scan_limit: сколько заданий просматривать в очереди в поисках готового
+        """
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.scan_limit = scan_limit
+
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chats = {}
+        self._in_flight = set()
+        self._pending = {}       # chat_id → deque ещё не отправленных заданий чата
+        self._lanes = [collections.deque() for _ in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_BULK)]
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        self._stats = {
+            'submitted': 0,
+            'sent': 0,
+            'failed': 0,
+            'retries_429': 0,
+            'throttled_waits': 0,
+        }
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tg-send')
+        self._thread = threading.Thread(target=self._loop, name='tg-sender', daemon=True)
+        self._thread.start()
+
+    # ── Публичный API ──────────────────────────────────────────────
+
+    def submit(self, method, *args, rate_key=None, priority=PRIORITY_NORMAL, **kwargs):
+        """
+        Ставит вызов bot.<method>(*args, **kwargs) в очередь.
+        rate_key — id чата для поштучного лимита; None — только глобальный лимит.
+        """
+        job = _Job(method, args, kwargs, rate_key, priority)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("OutboundSender остановлен")
+            self._lanes[priority].append(job)
+            if rate_key is not None:
+                self._pending.setdefault(rate_key, collections.deque()).append(job)
+            self._stats['submitted'] += 1
+            self._cond.notify()
+        return job.future
+
+    def call(self, method, *args, rate_key=None, priority=PRIORITY_NORMAL, timeout=None, **kwargs):
+        """
+        Блокирующий вариант submit: ждёт результата вызова.
+        """
+        future = self.submit(method, *args, rate_key=rate_key, priority=priority, **kwargs)
+        return future.result(timeout)
+
+    def stats(self):
+        with self._cond:
+            result = dict(self._stats)
+            result['queued'] = [len(lane) for lane in self._lanes]
+            result['in_flight'] = len(self._in_flight)
+            result['chats_tracked'] = len(self._chats)
+        return result
+
+    def stop(self, timeout=None):
+        """
+        Дожидается отправки уже поставленных вызовов и останавливает потоки.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+
+    # ── Планировщик ────────────────────────────────────────────────
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune_buckets(self, now):
+        # Полные и не заблокированные ведра ничего не помнят — их можно выбросить
+        for chat_id in [c for c, b in self._chats.items()
+                        if c not in self._in_flight and b.is_idle(now)]:
+            del self._chats[chat_id]
+
+    def _pick(self, now):
+        """
+        Ищет первое готовое к отправке задание с учётом приоритета и лимитов.
+        Возвращает (job, 0) или (None, сколько подождать).
+        """
+        global_wait = self._global.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        min_wait = None
+        for lane in self._lanes:
+            for idx, job in enumerate(lane):
+                if idx >= self.scan_limit:
+                    break
+                if job.chat_id is None:
+                    wait = 0.0
+                elif job.chat_id in self._in_flight or self._pending[job.chat_id][0] is not job:
+                    # В этом чате есть более раннее задание
+                    continue
+                else:
+                    wait = self._chat_bucket(job.chat_id).wait_time(now)
+                if wait <= 0:
+                    del lane[idx]
+                    if job.chat_id is not None:
+                        pending = self._pending[job.chat_id]
+                        pending.popleft()
+                        if not pending:
+                            del self._pending[job.chat_id]
+                    return job, 0.0
+                if min_wait is None or wait < min_wait:
+                    min_wait = wait
+        return None, min_wait
+
+    def _loop(self):
+        last_prune = time.monotonic()
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    job, wait = self._pick(now)
+                    if job is not None:
+                        break
+                    if self._stopped and not any(self._lanes) and not self._in_flight:
+                        return
+                    if wait is not None:
+                        self._stats['throttled_waits'] += 1
+                    # wait=None: очереди пусты или все чаты «в полёте» — ждём сигнала
+                    self._cond.wait(wait if wait is not None else 1.0)
+
+                self._global.consume(now)
+                if job.chat_id is not None:
+                    self._chat_bucket(job.chat_id).consume(now)
+                    self._in_flight.add(job.chat_id)
+
+                if now - last_prune > 60 and len(self._chats) > 1000:
+                    self._prune_buckets(now)
+                    last_prune = now
+
+            self._executor.submit(self._execute, job)
+
+    def _execute(self, job):
+        try:
+            result = getattr(self.bot, job.method)(*job.args, **job.kwargs)
+        except apihelper.ApiTelegramException as e:
+            if e.error_code == 429 and job.attempts < self.max_retries:
+                self._retry_later(job, e)
+                return
+            self._finish(job)
+            job.future.set_exception(e)
+            return
+        except Exception as e:
+            self._finish(job)
+            job.future.set_exception(e)
+            return
+        self._finish(job, sent=True)
+        job.future.set_result(result)
+
+    def _retry_later(self, job, error):
+        params = (error.result_json or {}).get('parameters') or {}
+        retry_after = float(params.get('retry_after', 1))
+        with self._cond:
+            now = time.monotonic()
+            if job.chat_id is not None:
+                self._chat_bucket(job.chat_id).block(now, retry_after)
+                self._in_flight.discard(job.chat_id)
+            else:
+                self._global.block(now, retry_after)
+            job.attempts += 1
+            self._stats['retries_429'] += 1
+            # Возвращаем в начало очередей, чтобы не нарушить порядок в чате
+            self._lanes[job.priority].appendleft(job)
+            if job.chat_id is not None:
+                self._pending.setdefault(job.chat_id, collections.deque()).appendleft(job)
+            self._cond.notify()
+
+    def _finish(self, job, sent=False):
+        with self._cond:
+            if job.chat_id is not None:
+                self._in_flight.discard(job.chat_id)
+            self._stats['sent' if sent else 'failed'] += 1
+            self._cond.notify()
+
+
+class _HandlerCounters:
+    """
+    Учёт исходящих вызовов по обработчикам (общий для потокового и asyncio-режима):
+      - handler_scope(name) — вызовы внутри блока считаются за обработчиком name
+      - stats() → {обработчик: {метод: число вызовов}}
+    """
+
+    def _init_counters(self):
+        self._counts = collections.Counter()   # (обработчик, метод) → число вызовов
+        self._counts_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def handler_scope(self, name):
+        token = current_handler.set(name)
+        try:
+            yield
+        finally:
+            current_handler.reset(token)
+
+    def _count(self, method):
+        # Вызовы вне обработчиков — напоминания и другие фоновые задачи
+        handler = current_handler.get() or 'background'
+        with self._counts_lock:
+            self._counts[(handler, method)] += 1
+
+    def stats(self):
+        with self._counts_lock:
+            counts = list(self._counts.items())
+        result = {}
+        for (handler, method), count in sorted(counts):
+            result.setdefault(handler, {})[method] = count
+        return result
+
+
+class RateLimitedBot(_HandlerCounters):
+    """
+    Обёртка над TeleBot для обработчиков: исходящие вызовы идут через
+    OutboundSender, всё остальное (register_next_step_handler и т.п.)
+    передаётся исходному боту.
+      - send_message / edit_message_* / answer_callback_query — блокирующие, с лимитами
+      - queue_message — неблокирующая отправка с приоритетом BULK (для списков)
+      - handler_scope(name) — исходящие вызовы внутри блока считаются за обработчиком name
+      - stats() → {обработчик: {метод: число вызовов}}
+    """
+
+    def __init__(self, bot, sender, keyboards=None, observer=None):
+        """
+        :param bot: экземпляр TeleBot
+        :param sender: экземпляр OutboundSender
+        :param keyboards: ReplyKeyboardTracker (какая клавиатура показана в чате) или None
+        :param observer: функция (метод, секунд, исключение) — сколько обработчик ждал
+                         блокирующего вызова (метрики); None — не замерять
+        """
+        self._bot = bot
+        self.sender = sender
+        self.keyboards = keyboards
+        self.observer = observer
+        self._init_counters()
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+    def _call(self, method, *args, **kwargs):
+        if self.observer is None:
+            return self.sender.call(method, *args, **kwargs)
+        started = time.perf_counter()
+        error = None
+        try:
+            return self.sender.call(method, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.observer(method, time.perf_counter() - started, error)
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._count('send_message')
+        result = self._call('send_message', chat_id, text, rate_key=chat_id, **kwargs)
+        if self.keyboards is not None:
+            self.keyboards.observe(chat_id, kwargs.get('reply_markup'))
+        return result
+
+    def queue_message(self, chat_id, text, priority=PRIORITY_BULK, **kwargs):
+        """
+        Отправка без ожидания результата; ошибки только логируются.
+        """
+        self._count('send_message')
+        future = self.sender.submit(
+            'send_message', chat_id, text, rate_key=chat_id, priority=priority, **kwargs
+        )
+        if self.keyboards is not None and kwargs.get('reply_markup') is not None:
+            # Внутри чата отправка идёт по порядку — клавиатуру учитываем сразу,
+            # а если сообщение не дошло, состояние чата считаем неизвестным
+            self.keyboards.observe(chat_id, kwargs['reply_markup'])
+
+            def forget_on_failure(done):
+                if done.exception() is not None:
+                    self.keyboards.forget(chat_id)
+            future.add_done_callback(forget_on_failure)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def edit_message_text(self, *args, **kwargs):
+        self._count('edit_message_text')
+        return self._call('edit_message_text', *args, rate_key=kwargs.get('chat_id'), **kwargs)
+
+    def edit_message_reply_markup(self, *args, **kwargs):
+        self._count('edit_message_reply_markup')
+        return self._call('edit_message_reply_markup', *args, rate_key=kwargs.get('chat_id'), **kwargs)
+
+    def answer_callback_query(self, callback_query_id, *args, **kwargs):
+        self._count('answer_callback_query')
+        return self._call(
+            'answer_callback_query', callback_query_id, *args, priority=PRIORITY_HIGH, **kwargs
+        )
+
+
+class AsyncRateLimitedBot(_HandlerCounters):
+    """
+    То же, что OutboundSender + RateLimitedBot, для asyncio-режима (AsyncTeleBot):
+      - те же ведра токенов: глобальное и на каждый чат
+      - вызовы одного чата выполняются строго в порядке вызова методов,
+        включая неблокирующие queue_message
+      - при 429 чат (или весь бот) ждёт retry_after, и вызов повторяется
+      - send_message / edit_message_* / answer_callback_query — корутины
+      - queue_message — без ожидания; можно вызывать и из других потоков
+        (напоминания), если цикл событий задан через attach(loop)
+    Очередей с приоритетами нет: ожидание токена не занимает поток.
+    """
+
+    def __init__(self, bot, global_rate=30.0, chat_rate=1.0, chat_burst=3,
+                 group_rate=20 / 60, max_retries=5, keyboards=None, observer=None):
+        """
+        :param bot: экземпляр telebot.async_telebot.AsyncTeleBot
+        остальные параметры — как у OutboundSender и RateLimitedBot
+        """
+        self._bot = bot
+        self.observer = observer
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.keyboards = keyboards
+        self.loop = None
+
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chats = {}
+        self._tails = {}     # chat_id → последняя поставленная задача чата
+        self._stats = {'submitted': 0, 'sent': 0, 'failed': 0, 'retries_429': 0, 'throttled_waits': 0}
+        self._init_counters()
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+    def attach(self, loop):
+        """
+        Цикл событий, в котором выполняются вызовы (нужен queue_message из других потоков).
+        """
+        self.loop = loop
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _schedule(self, rate_key, method, args, kwargs):
+        """
+        Ставит вызов в очередь чата. Вызывается синхронно в потоке цикла,
+        поэтому порядок вызовов внутри чата совпадает с порядком постановки.
+        """
+        previous = self._tails.get(rate_key) if rate_key is not None else None
+        task = asyncio.get_running_loop().create_task(self._run(previous, rate_key, method, args, kwargs))
+        self._stats['submitted'] += 1
+        if rate_key is not None:
+            self._tails[rate_key] = task
+
+            def release(done):
+                if self._tails.get(rate_key) is done:
+                    del self._tails[rate_key]
+            task.add_done_callback(release)
+        return task
+
+    async def _run(self, previous, rate_key, method, args, kwargs):
+        if previous is not None:
+            # Ждём предыдущий вызов чата; его ошибка — не наша
+            await asyncio.wait([previous])
+        attempts = 0
+        while True:
+            await self._acquire(rate_key)
+            try:
+                result = await getattr(self._bot, method)(*args, **kwargs)
+            except asyncio_helper.ApiTelegramException as e:
+                if e.error_code == 429 and attempts < self.max_retries:
+                    attempts += 1
+                    self._block(rate_key, e)
+                    continue
+                self._stats['failed'] += 1
+                raise
+            except Exception:
+                self._stats['failed'] += 1
+                raise
+            self._stats['sent'] += 1
+            return result
+
+    async def _acquire(self, rate_key):
+        while True:
+            now = time.monotonic()
+            wait = self._global.wait_time(now)
+            if rate_key is not None:
+                wait = max(wait, self._chat_bucket(rate_key).wait_time(now))
+            if wait <= 0:
+                self._global.consume(now)
+                if rate_key is not None:
+                    self._chat_bucket(rate_key).consume(now)
+                return
+            self._stats['throttled_waits'] += 1
+            await asyncio.sleep(wait)
+
+    def _block(self, rate_key, error):
+        params = (error.result_json or {}).get('parameters') or {}
+        retry_after = float(params.get('retry_after', 1))
+        now = time.monotonic()
+        if rate_key is not None:
+            self._chat_bucket(rate_key).block(now, retry_after)
+        else:
+            self._global.block(now, retry_after)
+        self._stats['retries_429'] += 1
+
+    async def _call(self, rate_key, method, args, kwargs):
+        if self.observer is None:
+            return await self._schedule(rate_key, method, args, kwargs)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await self._schedule(rate_key, method, args, kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.observer(method, time.perf_counter() - started, error)
+
+    # ── Методы Bot API ────────────────────────────────────────────
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._count('send_message')
+        result = await self._call(chat_id, 'send_message', (chat_id, text), kwargs)
+        if self.keyboards is not None:
+            self.keyboards.observe(chat_id, kwargs.get('reply_markup'))
+        return result
+
+    def queue_message(self, chat_id, text, priority=PRIORITY_BULK, **kwargs):
+        """
+        Отправка без ожидания результата; ошибки только логируются.
+        priority принимается для совместимости с RateLimitedBot.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is None or (self.loop is not None and running is not self.loop):
+            # Из другого потока (напоминания) — передаём вызов в цикл бота
+            if self.loop is None:
+                raise RuntimeError("AsyncRateLimitedBot: цикл событий не задан (attach)")
+            self.loop.call_soon_threadsafe(lambda: self.queue_message(chat_id, text, **kwargs))
+            return None
+
+        self._count('send_message')
+        task = self._schedule(chat_id, 'send_message', (chat_id, text), kwargs)
+        if self.keyboards is not None and kwargs.get('reply_markup') is not None:
+            self.keyboards.observe(chat_id, kwargs['reply_markup'])
+
+            def forget_on_failure(done):
+                if done.cancelled() or done.exception() is not None:
+                    self.keyboards.forget(chat_id)
+            task.add_done_callback(forget_on_failure)
+        task.add_done_callback(_log_failure)
+        return task
+
+    async def edit_message_text(self, *args, **kwargs):
+        self._count('edit_message_text')
+        return await self._call(kwargs.get('chat_id'), 'edit_message_text', args, kwargs)
+
+    async def edit_message_reply_markup(self, *args, **kwargs):
+        self._count('edit_message_reply_markup')
+        return await self._call(kwargs.get('chat_id'), 'edit_message_reply_markup', args, kwargs)
+
+    async def answer_callback_query(self, callback_query_id, *args, **kwargs):
+        self._count('answer_callback_query')
+        return await self._call(None, 'answer_callback_query', (callback_query_id, *args), kwargs)
+
+    def sender_stats(self):
+        """
+        Счётчики отправки (как OutboundSender.stats()).
+        """
+        return dict(self._stats)
+
+
+def _log_failure(future):
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        print(f"Ошибка при отправке сообщения: {error}")
@@ -0,0 +1,136 @@
+# sweeper.py
+
+import threading
+import time
+from collections import deque
+
+
+# Одна порция: блокируем только то, что обновляем, и не ждём чужих блокировок
+SWEEP_BATCH_SQL = """
+    UPDATE tasks
+       SET status = 'overdue', updated_at = NOW()
+     WHERE task_id IN (
+            SELECT task_id
+              FROM tasks
+             WHERE status = 'active'
+               AND deadline IS NOT NULL
+               AND deadline < NOW()
+             ORDER BY deadline
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+           )
+    RETURNING task_id
+"""
+
+
+class OverdueSweeper:
+    """
+    Фоновый перевод просроченных активных задач в status = 'overdue'.
+    Каждый проход обновляет задачи порциями по batch_size, каждая порция —
+    отдельная короткая транзакция (FOR UPDATE SKIP LOCKED), поэтому
+    несколько экземпляров бота не мешают друг другу и обработчикам.
+      - sweep_once() → (число строк, длительность)
+      - start() / stop()
+      - stats() — итоги последнего прохода и история
+      - register_gauges(metrics) — итоги проходов в /metrics
+    """
+
+    def __init__(self, db, batch_size=500, interval=60.0, max_batches=100, history=100):
+        """
+        :param db: экземпляр Database
+        :param batch_size: сколько задач обновлять одной транзакцией
+        :param interval: пауза между проходами, секунд
+        :param max_batches: предел порций за проход (остаток — в следующем проходе)
+        :param history: сколько последних проходов хранить в stats()
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_batches = max_batches
+
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)   # [(время начала, строк, секунд, порций)]
+        self._stats = {'passes': 0, 'rows_total': 0, 'errors': 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sweep_batch(self):
+        with self.db.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(SWEEP_BATCH_SQL, (self.batch_size,))
+                count = cur.rowcount
+                conn.commit()
+            finally:
+                cur.close()
+        return count
+
+    def sweep_once(self):
+        """
+        Один проход: порции до тех пор, пока очередная не окажется неполной.
+        """
+        started_at = time.time()
+        t0 = time.perf_counter()
+        rows = 0
+        batches = 0
+        while batches < self.max_batches:
+            count = self._sweep_batch()
+            batches += 1
+            rows += count
+            if count < self.batch_size:
+                break
+        duration = time.perf_counter() - t0
+
+        with self._lock:
+            self._history.append((started_at, rows, duration, batches))
+            self._stats['passes'] += 1
+            self._stats['rows_total'] += rows
+        return rows, duration
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep_once()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                print(f"Ошибка при пометке просроченных задач: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='overdue-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def register_gauges(self, metrics):
+        """
+        :param metrics: экземпляр Metrics (BotApp и AsyncBotApp)
+        """
+        metrics.gauge('sweeper_passes', "Проходы OverdueSweeper с запуска",
+                      lambda: self.stats()['passes'])
+        metrics.gauge('sweeper_rows', "Задачи, помеченные просроченными, с запуска",
+                      lambda: self.stats()['rows_total'])
+        metrics.gauge('sweeper_errors', "Ошибки проходов OverdueSweeper",
+                      lambda: self.stats()['errors'])
+        metrics.gauge('sweeper_last_rows', "Задачи, помеченные последним проходом",
+                      lambda: self.stats().get('last_rows'))
+        metrics.gauge('sweeper_last_duration_seconds', "Длительность последнего прохода",
+                      lambda: self.stats().get('last_duration'))
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats)
+            if self._history:
+                started_at, rows, duration, batches = self._history[-1]
+                result.update(
+                    last_started_at=started_at,
+                    last_rows=rows,
+                    last_duration=duration,
+                    last_batches=batches,
+                )
+            result['history'] = list(self._history)
+        return result
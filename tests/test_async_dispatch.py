@@ -0,0 +1,84 @@
+# tests/test_async_dispatch.py
+"""
+Ограниченные очереди AsyncDispatchingTeleBot: отказ сверх предела (webhook),
+ожидание места (polling) и порядок обработки внутри чата.
+"""
+
+import asyncio
+
+from telebot import types
+
+from async_bot import AsyncDispatchingTeleBot
+
+
+def update(update_id, chat_id):
+    return types.Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': 0, 'text': str(update_id),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'u'},
+        },
+    })
+
+
+def make_bot(seen, gate, **kwargs):
+    bot = AsyncDispatchingTeleBot('1:TEST', **kwargs)
+
+    async def handler(message):
+        await gate.wait()
+        seen.append((message.chat.id, int(message.text)))
+
+    bot.register_message_handler(handler)
+    return bot
+
+
+def test_dispatch_rejects_over_chat_and_global_limits():
+    async def run():
+        seen, gate = [], asyncio.Event()
+        bot = make_bot(seen, gate, max_pending=3, chat_pending=2)
+        results = [bot.dispatch(update(i, 1)) for i in range(3)]
+        results.append(bot.dispatch(update(3, 2)))
+        results.append(bot.dispatch(update(4, 3)))
+        gate.set()
+        await bot.drain()
+        return results, bot.stats(), seen
+
+    results, stats, seen = asyncio.run(run())
+    assert results == [True, True, False, True, False]
+    assert stats == {'pending': 0, 'waiting': 0, 'chats': 0, 'rejected': 2}
+    assert sorted(seen) == [(1, 0), (1, 1), (2, 3)]
+
+
+def test_polling_waits_for_room_and_keeps_chat_order():
+    async def run():
+        seen, gate = [], asyncio.Event()
+        bot = make_bot(seen, gate, max_pending=100, chat_pending=2)
+        intake = asyncio.create_task(bot.process_new_updates([update(i, 1) for i in range(6)]))
+        await asyncio.sleep(0.01)
+        # В очереди чата не больше chat_pending, остальные ждут места
+        waiting = (bot.pending, bot.stats()['waiting'])
+        gate.set()
+        accepted = await intake
+        await bot.drain()
+        return waiting, accepted, seen
+
+    waiting, accepted, seen = asyncio.run(run())
+    assert waiting == (2, 4)
+    assert accepted is True
+    assert seen == [(1, i) for i in range(6)]
+
+
+def test_get_updates_waits_while_full():
+    async def run():
+        seen, gate = [], asyncio.Event()
+        bot = make_bot(seen, gate, max_pending=1)
+        assert bot.dispatch(update(0, 1))
+        room = asyncio.create_task(bot._wait_room())
+        await asyncio.sleep(0.01)
+        blocked = not room.done()
+        gate.set()
+        await asyncio.wait_for(room, 1)
+        return blocked
+
+    assert asyncio.run(run()) is True
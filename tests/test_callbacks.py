@@ -0,0 +1,37 @@
+# tests/test_callbacks.py
+"""
+CallbackHandler.open_task: карточка открывается только владельцу задачи.
+"""
+
+from benchmarks.handler_stubs import StubBot, USER_ID, build, call
+from benchmarks.memory_db import MemoryDatabase
+from handlers.task_handlers import TaskHandler
+from handlers.callback_handlers import CallbackHandler
+
+
+class RecordingBot(StubBot):
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+        return super().send_message(chat_id, text, **kwargs)
+
+
+def open_task(owner_id):
+    """
+    Пользователь USER_ID открывает задачу владельца owner_id → отправленные тексты.
+    """
+    db, bot = MemoryDatabase(), RecordingBot()
+    task_id, = db.seed(owner_id, 1)
+    _, callbacks = build(TaskHandler, CallbackHandler, bot, db)
+    callbacks.open_task(call(f'open_{task_id}'), task_id)
+    return bot.sent
+
+
+def test_open_own_task():
+    assert "Задача 0" in open_task(USER_ID)[0]
+
+
+def test_open_foreign_task_is_not_found():
+    assert open_task(USER_ID + 1) == ["❌ Задача не найдена."]
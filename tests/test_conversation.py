@@ -0,0 +1,111 @@
+# tests/test_conversation.py
+"""
+Хранилища шагов диалога: TTL и LRU в памяти, кеш PostgresStateStore
+и его сброс при записи и удалении.
+"""
+
+import contextlib
+import time
+
+from conversation import MemoryStateStore, PostgresStateStore, dump_state
+
+
+def test_memory_store_expires_after_ttl():
+    store = MemoryStateStore(ttl=0.05)
+    store.set(1, 'process_task_title', {'title': 'x'})
+    assert store.get(1) == ('process_task_title', {'title': 'x'})
+    time.sleep(0.1)
+    assert store.get(1) is None
+    stats = store.stats()
+    assert (stats['expired'], stats['size']) == (1, 0)
+
+
+def test_memory_store_evicts_least_recently_set():
+    store = MemoryStateStore(max_size=2)
+    store.set(1, 'a', None)
+    store.set(2, 'b', None)
+    store.set(1, 'a2', None)       # 1 снова самый свежий
+    store.set(3, 'c', None)
+    assert store.get(2) is None
+    assert store.get(1) == ('a2', None)
+    assert store.get(3) == ('c', None)
+    assert store.stats()['evicted'] == 1
+
+
+class FakeDatabase:
+    """
+    Таблица conversation_state в словаре; считает SELECT.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.selects = 0
+        self.rowcount = 0
+        self._row = None
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, args):
+        if query.lstrip().startswith('SELECT'):
+            self.selects += 1
+            raw = self.rows.get(args[1])
+            self._row = None if raw is None else (raw, 100.0)
+        elif query.lstrip().startswith('INSERT'):
+            self.rows[args[0]] = args[1]
+        elif 'chat_id' in query:
+            self.rows.pop(args[0], None)
+
+    def fetchone(self):
+        return self._row
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_postgres_store_caches_reads():
+    db = FakeDatabase()
+    db.rows[1] = dump_state('process_task_title', None)
+    store = PostgresStateStore(db)
+    assert store.get(1) == ('process_task_title', None)
+    assert store.get(1) == ('process_task_title', None)
+    assert store.get(2) is None
+    assert store.get(2) is None
+    assert db.selects == 2
+
+
+def test_postgres_store_set_replaces_cached_absence():
+    db = FakeDatabase()
+    store = PostgresStateStore(db)
+    assert store.get(1) is None
+    store.set(1, 'process_task_title', {'title': 'x'})
+    assert store.get(1) == ('process_task_title', {'title': 'x'})
+    assert db.selects == 1
+
+
+def test_postgres_store_delete_is_cached():
+    db = FakeDatabase()
+    store = PostgresStateStore(db)
+    store.set(1, 'process_task_title', None)
+    store.delete(1)
+    assert store.get(1) is None
+    assert db.selects == 0 and db.rows == {}
+
+
+def test_postgres_store_without_cache_reads_every_time():
+    db = FakeDatabase()
+    store = PostgresStateStore(db, cache_ttl=0)
+    store.set(1, 'a', None)
+    db.rows[1] = dump_state('b', None)     # запись другого экземпляра бота
+    assert store.get(1) == ('b', None)
+    assert db.selects == 1
@@ -0,0 +1,40 @@
+# tests/test_dispatcher.py
+"""
+ChatDispatcher: порядок внутри чата и отказ при заполненной очереди.
+"""
+
+import threading
+
+from dispatcher import ChatDispatcher
+
+
+def test_fifo_within_chat():
+    dispatcher = ChatDispatcher(workers=4, maxsize=0)
+    seen = {chat: [] for chat in range(3)}
+    for i in range(200):
+        chat = i % 3
+        dispatcher.submit(chat, seen[chat].append, i)
+    dispatcher.stop(timeout=5)
+    for chat, items in seen.items():
+        assert items == list(range(chat, 200, 3))
+
+
+def test_submit_rejects_when_lane_is_full():
+    dispatcher = ChatDispatcher(workers=1, maxsize=2)
+    gate, started = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait(5)
+
+    assert dispatcher.submit(1, hold)
+    assert started.wait(5)          # воркер занят, очередь пуста
+    assert dispatcher.submit(1, lambda: None)
+    assert dispatcher.submit(1, lambda: None)
+    assert dispatcher.submit(1, lambda: None) is False
+    assert dispatcher.stats()['rejected'] == 1
+
+    gate.set()
+    dispatcher.stop(timeout=5)
+    stats = dispatcher.stats()
+    assert (stats['processed'], stats['depth']) == (3, 0)
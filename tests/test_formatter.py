@@ -0,0 +1,58 @@
+# tests/test_formatter.py
+"""
+TaskFormatter.format_task_page: карточка длиннее лимита сообщения
+укорачивается без поломки разметки Markdown.
+"""
+
+from datetime import datetime
+
+import pytz
+
+from formatter import MESSAGE_LIMIT, TaskFormatter, cut_markdown, tg_len
+
+
+HEADER = "*Все задачи* — стр. 1"
+
+LONG_TASK = {
+    'task_id': 1,
+    'title': 'Отчёт',
+    'priority': 'high',
+    'description': "Раздел *важно* и _курсив_ и `код`. " * 200,
+    'deadline': pytz.utc.localize(datetime(2025, 3, 10, 9, 0)),
+    'tags': ['работа'],
+}
+
+
+def assert_balanced(text):
+    for mark in ('*', '_', '`'):
+        assert text.count(mark) % 2 == 0, mark
+
+
+def test_long_card_cut_inside_description():
+    formatter = TaskFormatter()
+    blocks = formatter.format_tasks([LONG_TASK])
+    assert tg_len(blocks[0]) > MESSAGE_LIMIT
+
+    text, count = formatter.format_task_page(blocks, HEADER, tasks=[LONG_TASK])
+    assert count == 1
+    assert tg_len(text) <= MESSAGE_LIMIT
+    assert_balanced(text)
+    assert "🔴 *Отчёт*" in text
+    assert "🏷 #работа" in text
+    assert "…" in text
+
+
+def test_long_card_without_tasks_is_cut_balanced():
+    formatter = TaskFormatter()
+    blocks = formatter.format_tasks([LONG_TASK])
+
+    text, count = formatter.format_task_page(blocks, HEADER)
+    assert count == 1
+    assert tg_len(text) <= MESSAGE_LIMIT
+    assert_balanced(text)
+    assert "🔴 *Отчёт*" in text
+
+
+def test_cut_markdown_drops_unclosed_entity():
+    assert cut_markdown("a *bold* and _it", 100) == "a *bold* and "
+    assert cut_markdown("*bold text*", 6) == ""
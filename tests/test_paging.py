@@ -0,0 +1,133 @@
+# tests/test_paging.py
+"""
+Keyset-пагинация списков: курсор в callback_data и листание вперёд и назад
+по списку с задачами без дедлайна и одинаковыми дедлайнами.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from benchmarks.handler_stubs import StubBot, build
+from benchmarks.memory_db import MemoryDatabase
+from handlers.task_handlers import TaskHandler
+from handlers.callback_handlers import CallbackHandler
+from queries import FILTER_WHERE
+from repository import TaskRepository
+
+
+USER_ID = 42
+
+
+@pytest.mark.parametrize('cursor', [
+    (1, 'infinity', 7),
+    (3, datetime(2025, 3, 10, 9, 0, 0, 123456, tzinfo=pytz.utc), 2 ** 31 - 1),
+    (2, datetime(1969, 12, 31, 23, 59, 59, tzinfo=pytz.utc), 1),
+])
+def test_cursor_round_trip(cursor):
+    text = TaskRepository.encode_cursor(cursor)
+    assert TaskRepository.decode_cursor(text) == cursor
+
+
+def test_no_deadline_is_encoded_as_i():
+    assert TaskRepository.encode_cursor((1, 'infinity', 7)) == "1:i:7"
+    with pytest.raises(ValueError):
+        TaskRepository.decode_cursor("1:x:7")
+
+
+def make_handler():
+    db = MemoryDatabase()
+    deadline = datetime.now(pytz.utc) + timedelta(days=1)
+    for i in range(37):
+        # Одинаковые ранг и дедлайн у целых групп, каждая пятая — без дедлайна
+        db._add_task(USER_ID, f"Задача {i}", None, ('high', 'medium', 'low')[i % 3], None, None,
+                     None if i % 5 == 0 else deadline + timedelta(hours=i % 2))
+    tasks, _ = build(TaskHandler, CallbackHandler, StubBot(), db)
+    return tasks, db
+
+
+def page_of(markup):
+    """
+    (id задач на странице, callback_data ◀️, callback_data ▶️) из JSON разметки.
+    """
+    ids, nav = [], {}
+    for row in json.loads(markup)['inline_keyboard']:
+        for button in row:
+            data = button['callback_data']
+            if data.startswith('open_'):
+                ids.append(int(data[5:]))
+            else:
+                nav[data.split(':')[3]] = data
+    return ids, nav.get('p'), nav.get('n')
+
+
+def turn(tasks, data):
+    list_key, page, backward, cursor = tasks._parse_page_data(data)
+    return page_of(tasks._render_page(USER_ID, list_key, page, cursor, backward)[1])
+
+
+def test_pages_forward_and_backward_cover_every_task_once():
+    tasks, db = make_handler()
+    expected = [t['task_id'] for t in sorted(db.tasks.values(), key=lambda t: (
+        t['priority_rank'], t['deadline'] or datetime.max.replace(tzinfo=pytz.utc), t['task_id']))]
+
+    ids, prev_data, next_data = page_of(tasks._render_page(USER_ID, 'al')[1])
+    assert prev_data is None
+    forward = [ids]
+    while next_data:
+        ids, prev_data, next_data = turn(tasks, next_data)
+        forward.append(ids)
+    assert [i for page in forward for i in page] == expected
+    assert len(forward) > 2
+
+    backward = [forward[-1]]
+    while prev_data:
+        ids, prev_data, _ = turn(tasks, prev_data)
+        backward.append(ids)
+    assert backward[::-1] == forward
+
+
+def test_page_callback_data_fits_64_bytes():
+    tasks, _ = make_handler()
+    # Самые длинные значения: task_id — SERIAL (int4), дедлайн — конец 9999 года
+    task = {
+        'priority': 'low', 'task_id': 2 ** 31 - 1,
+        'deadline': datetime(9999, 12, 31, 23, 59, 59, 999999, tzinfo=pytz.utc),
+    }
+    list_key = tasks._hash_list_arg('c', "категория" * 20)
+    data = tasks._page_data(list_key, 99999, 'p', task)
+    assert len(data.encode('utf-8')) <= 64, data
+
+
+def test_overdue_list_is_union_of_two_ordered_halves():
+    sql, args = TaskRepository.build_page_query(USER_ID, FILTER_WHERE['od'][1], cursor=(2, 'infinity', 9))
+    assert sql.count(' UNION ALL ') == 1 and sql.count(' LIMIT %s') == 3
+    assert " OR " not in sql
+    assert len(args) == sql.count('%s')
+
+
+def test_overdue_pages_merge_both_halves():
+    db = MemoryDatabase()
+    now = datetime.now(pytz.utc)
+    for i in range(30):
+        status, deadline = [
+            ('overdue', now - timedelta(days=1)),
+            ('active', now - timedelta(hours=i % 4 + 1)),
+            ('active', now + timedelta(days=1)),        # не просрочена
+        ][i % 3]
+        db._add_task(USER_ID, f"Задача {i}", None, ('high', 'low')[i % 2], None, None,
+                     None if i % 7 == 0 and status == 'overdue' else deadline, status)
+    tasks, _ = build(TaskHandler, CallbackHandler, StubBot(), db)
+    expected = sorted(
+        (t for t in db.tasks.values() if t['status'] == 'overdue' or t['deadline'] < now),
+        key=lambda t: (t['priority_rank'], t['deadline'] or datetime.max.replace(tzinfo=pytz.utc), t['task_id']),
+    )
+
+    ids, _, next_data = page_of(tasks._render_page(USER_ID, 'od')[1])
+    seen = ids
+    while next_data:
+        ids, _, next_data = turn(tasks, next_data)
+        seen += ids
+    assert seen == [t['task_id'] for t in expected]
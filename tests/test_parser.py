@@ -0,0 +1,85 @@
+# tests/test_parser.py
+"""
+DeadlineParser: все варианты ввода, ошибки, кеш по минуте и пакетный разбор parse_many.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from parser import DeadlineParser
+
+
+MOSCOW = pytz.timezone('Europe/Moscow')
+NOW = MOSCOW.localize(datetime(2025, 3, 10, 12, 30, 15))
+
+
+def test_parse_many_accepts_generator():
+    parser = DeadlineParser(MOSCOW)
+    results, errors = parser.parse_many((t for t in ['завтра', 'через 5 минут']), now=NOW)
+    assert errors == {}
+    assert results == [
+        parser.parse_deadline('завтра', now=NOW),
+        parser.parse_deadline('через 5 минут', now=NOW),
+    ]
+
+
+def test_parse_many_reports_non_strings_by_index():
+    parser = DeadlineParser(MOSCOW)
+    results, errors = parser.parse_many(['сегодня', None, 42, 'ерунда'], now=NOW)
+    assert results[0] == parser.parse_deadline('сегодня', now=NOW)
+    assert results[1:] == [None, None, None]
+    assert sorted(errors) == [1, 2, 3]
+    assert errors[3] == "Неверный формат даты."
+
+
+def utc(*args):
+    return MOSCOW.localize(datetime(*args)).astimezone(pytz.utc)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('через 2 часа 15 минут', NOW + timedelta(hours=2, minutes=15)),
+    ('через 10 минут', NOW + timedelta(minutes=10)),
+    ('через 3 дня в 9:00', utc(2025, 3, 13, 9, 0)),
+    ('через 1 день', utc(2025, 3, 11, 23, 59)),
+    ('сегодня в 18:30', utc(2025, 3, 10, 18, 30)),
+    ('Завтра', utc(2025, 3, 11, 23, 59)),
+    ('31.12.2025 14:30', utc(2025, 12, 31, 14, 30)),
+    ('1.4.25', utc(2025, 4, 1, 23, 59)),
+    ('5 мая в 10:00', utc(2025, 5, 5, 10, 0)),
+])
+def test_variants(text, expected):
+    assert DeadlineParser(MOSCOW).parse_deadline(text, now=NOW) == expected
+
+
+@pytest.mark.parametrize('text, message', [
+    ('ерунда', "Неверный формат даты."),
+    ('через 2 часа в 10:00', "Неверный формат даты."),
+    ('5 мартобря', "Неверное название месяца"),
+    ('31.02.2025', "day is out of range for month"),
+    ('сегодня в 25:00', "hour must be in 0..23"),
+])
+def test_invalid_input(text, message):
+    with pytest.raises(ValueError, match=message):
+        DeadlineParser(MOSCOW).parse_deadline(text, now=NOW)
+
+
+def test_past_date_is_returned_as_is():
+    # Проверки «дедлайн в прошлом» у парсера нет: это решает вызывающий
+    assert DeadlineParser(MOSCOW).parse_deadline('01.01.2020 10:00', now=NOW) == utc(2020, 1, 1, 10, 0)
+
+
+def test_cache_hit_keeps_relative_deadline_exact():
+    parser = DeadlineParser(MOSCOW)
+    later = NOW + timedelta(seconds=30)     # та же минута — тот же ключ кеша
+    assert parser.parse_deadline('через 2 часа', now=NOW) == NOW + timedelta(hours=2)
+    assert parser.parse_deadline('через 2 часа', now=later) == later + timedelta(hours=2)
+    assert parser.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_cache_key_changes_with_minute():
+    parser = DeadlineParser(MOSCOW)
+    parser.parse_deadline('сегодня', now=NOW)
+    parser.parse_deadline('сегодня', now=NOW + timedelta(minutes=1))
+    assert parser.stats() == {'hits': 0, 'misses': 2, 'size': 2}
@@ -0,0 +1,115 @@
+# tests/test_reminders.py
+"""
+TimingWheel и ReminderScheduler с подставными часами: срабатывание, отмена,
+переход через конец колеса и загрузка окна после перезапуска.
+"""
+
+import contextlib
+from datetime import datetime
+
+import pytz
+
+from reminders import ReminderScheduler, TimingWheel
+
+
+T0 = 1_000_000.0
+
+
+def test_wheel_fires_on_its_tick():
+    wheel = TimingWheel(tick=1.0, slots=10, now=T0)
+    assert wheel.add('a', T0 + 3.5, 'A')
+    assert wheel.advance(T0 + 2.9) == []
+    assert wheel.advance(T0 + 3.0) == ['A']
+    assert len(wheel) == 0
+
+
+def test_wheel_cancel_and_reschedule():
+    wheel = TimingWheel(tick=1.0, slots=10, now=T0)
+    wheel.add('a', T0 + 2, 'A')
+    wheel.add('b', T0 + 2, 'B')
+    assert wheel.remove('a')
+    assert not wheel.remove('a')
+    wheel.add('b', T0 + 5, 'B2')           # тот же ключ — таймер переносится
+    assert wheel.advance(T0 + 4) == []
+    assert wheel.advance(T0 + 5) == ['B2']
+
+
+def test_wheel_wraps_around_and_rejects_beyond_horizon():
+    wheel = TimingWheel(tick=1.0, slots=10, now=T0)
+    assert not wheel.add('far', T0 + 10, 'FAR')
+    wheel.add('a', T0 + 5, 'A')
+    assert wheel.advance(T0 + 8) == ['A']
+    # Слот 5 снова используется на следующем обороте
+    assert wheel.add('b', T0 + 15, 'B')
+    assert wheel.horizon == T0 + 18
+    assert wheel.advance(T0 + 14) == []
+    assert wheel.advance(T0 + 15) == ['B']
+
+
+def test_wheel_catches_up_after_long_sleep():
+    wheel = TimingWheel(tick=1.0, slots=10, now=T0)
+    wheel.add('a', T0 + 2, 'A')
+    wheel.add('b', T0 + 9, 'B')
+    assert sorted(wheel.advance(T0 + 100)) == ['A', 'B']
+    assert wheel.advance(T0 + 100) == []
+
+
+class FakeDatabase:
+    """
+    Отдаёт заданные строки на любой SELECT и запоминает параметры.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, args=None):
+        self.queries.append(args)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def at(ts):
+    return datetime.fromtimestamp(ts, pytz.utc)
+
+
+def test_load_window_after_restart():
+    now = T0
+    rows = [
+        (1, 10, 'скоро', at(now + 600)),          # время напоминания прошло, пока бот лежал
+        (2, 10, 'позже', at(now + 3000)),
+    ]
+    db = FakeDatabase(rows)
+    scheduler = ReminderScheduler(db, None, None, lead=1800, horizon=3600, clock=lambda: now)
+    scheduler._load_window(now)
+
+    since, until = db.queries[0]
+    assert since == at(now)
+    assert until == at(scheduler._wheel.horizon + 1800)
+    assert scheduler.stats()['pending'] == 2
+
+    # fire_at = max(deadline - lead, now): первое — на ближайшем тике, второе — за lead до дедлайна
+    assert [p[0] for p in scheduler._wheel.advance(now + 1)] == [1]
+    assert scheduler._wheel.advance(now + 1199) == []
+    assert [p[0] for p in scheduler._wheel.advance(now + 1200)] == [2]
+
+
+def test_schedule_uses_injected_clock():
+    now = T0
+    scheduler = ReminderScheduler(FakeDatabase([]), None, None, lead=60, horizon=3600, clock=lambda: now)
+    scheduler.schedule(1, 10, 'задача', at(now + 120))
+    scheduler.schedule(2, 10, 'в прошлом', at(now - 1))
+    scheduler.schedule(3, 10, 'далеко', at(now + 7200))
+    assert scheduler.stats()['scheduled'] == 1
+    assert [p[0] for p in scheduler._wheel.advance(now + 60)] == [1]
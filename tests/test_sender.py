@@ -0,0 +1,79 @@
+# tests/test_sender.py
+"""
+TokenBucket и OutboundSender: приоритеты очередей и повтор после 429.
+"""
+
+import threading
+import time
+
+from telebot import apihelper
+
+from sender import PRIORITY_BULK, PRIORITY_HIGH, OutboundSender, TokenBucket
+
+
+class FakeBot:
+    """
+    Записывает вызовы; первые failures вызовов отвечают 429 с retry_after.
+    """
+
+    def __init__(self, failures=0, retry_after=0.2):
+        self.calls = []
+        self.failures = failures
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **kwargs):
+        with self._lock:
+            self.calls.append((time.monotonic(), chat_id, text))
+            if self.failures:
+                self.failures -= 1
+                raise apihelper.ApiTelegramException('sendMessage', None, {
+                    'error_code': 429, 'description': 'Too Many Requests',
+                    'parameters': {'retry_after': self.retry_after},
+                })
+        return text
+
+    def answer_callback_query(self, callback_query_id, **kwargs):
+        with self._lock:
+            self.calls.append((time.monotonic(), None, callback_query_id))
+        return True
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    bucket.updated = 100.0
+    bucket.consume(100.0)
+    bucket.consume(100.0)
+    assert bucket.wait_time(100.0) == 0.5
+    assert bucket.wait_time(100.5) == 0.0
+
+    bucket.block(100.5, 3.0)
+    assert bucket.wait_time(101.0) == 2.5
+    assert bucket.wait_time(103.5) == 0.0
+    assert bucket.is_idle(104.5)
+
+
+def test_high_priority_sent_before_bulk():
+    bot = FakeBot()
+    sender = OutboundSender(bot, workers=1)
+    # Пока замок у теста, планировщик не выбирает задания: все три уже в очередях
+    with sender._cond:
+        bulk = [sender.submit('send_message', chat, f'список {chat}', rate_key=chat, priority=PRIORITY_BULK)
+                for chat in (1, 2)]
+        high = sender.submit('answer_callback_query', 'cb', priority=PRIORITY_HIGH)
+    for future in (high, *bulk):
+        future.result(5)
+    sender.stop(5)
+    assert [text for _, _, text in bot.calls] == ['cb', 'список 1', 'список 2']
+
+
+def test_429_is_retried_after_retry_after():
+    bot = FakeBot(failures=1, retry_after=0.2)
+    sender = OutboundSender(bot, workers=1)
+    assert sender.call('send_message', 5, 'привет', rate_key=5, timeout=5) == 'привет'
+    sender.stop(5)
+
+    (first, _, _), (second, _, _) = bot.calls
+    assert second - first >= 0.2
+    stats = sender.stats()
+    assert (stats['sent'], stats['failed'], stats['retries_429']) == (1, 0, 1)
@@ -0,0 +1,53 @@
+# tests/test_statement_count.py
+"""
+Число SQL-операторов на каждый обработчик: создание, правка, завершение,
+перенос, удаление и открытие задачи — ровно один оператор, повторные
+/start и /mytasks известного пользователя — ни одного.
+"""
+
+import asyncio
+
+import pytest
+
+from handlers.task_handlers import TaskHandler
+from handlers.callback_handlers import CallbackHandler
+from handlers.async_handlers import AsyncTaskHandler, AsyncCallbackHandler
+from benchmarks.handler_stubs import RecordingDatabase, StubBot, AsyncStubBot, scenarios, build
+
+
+# Ожидаемое число операторов: имя сценария → число
+EXPECTED = {
+    'send_welcome (повторно)': 0,
+    'show_tasks (повторно)': 0,
+    'process_task_deadline': 1,
+    'complete_task': 1,
+    'process_reschedule_deadline': 1,
+    'process_edit_deadline': 1,
+    'delete_task': 1,
+    'open_task': 1,
+}
+
+
+def run_sync(name):
+    db = RecordingDatabase()
+    tasks, callbacks = build(TaskHandler, CallbackHandler, StubBot(), db)
+    dict(scenarios(tasks, callbacks))[name]()
+    return db.statements
+
+
+def run_async(name):
+    db = RecordingDatabase()
+    tasks, callbacks = build(AsyncTaskHandler, AsyncCallbackHandler, AsyncStubBot(), db)
+    asyncio.run(dict(scenarios(tasks, callbacks))[name]())
+    return db.statements
+
+
+def test_every_scenario_has_expectation():
+    assert {name for name, _ in scenarios(None, None)} == set(EXPECTED)
+
+
+@pytest.mark.parametrize('run', [run_sync, run_async], ids=['sync', 'asyncio'])
+@pytest.mark.parametrize('name', list(EXPECTED))
+def test_statement_count(run, name):
+    statements = run(name)
+    assert len(statements) == EXPECTED[name], statements
@@ -0,0 +1,36 @@
+# tests/test_users.py
+"""
+KnownUsers и BloomFilter: вытесненные из точного набора пользователи
+не регистрируются повторно, заполнение и доля ложных срабатываний фильтра.
+"""
+
+from users import BloomFilter, KnownUsers
+
+
+def test_bloom_fill_and_false_positive_rate_at_capacity():
+    bloom = BloomFilter(10000, error_rate=0.01)
+    for key in range(10000):
+        bloom.add(key)
+    assert all(key in bloom for key in range(10000))
+    assert 0.4 < bloom.fill_ratio() < 0.6
+    assert bloom.false_positive_rate() < 0.02
+
+    false_positives = sum(key in bloom for key in range(10**6, 10**6 + 20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_evicted_user_is_known_through_bloom():
+    users = KnownUsers(max_size=2, bloom_capacity=100)
+    assert users.stats()['bloom_fill'] == 0
+    assert users.remember(1) and users.remember(2) and users.remember(3)   # 1 вытеснен в фильтр
+    assert users.remember(1) is False
+    stats = users.stats()
+    assert (stats['new'], stats['bloom_known'], stats['size']) == (3, 1, 2)
+    assert stats['bloom_fill'] > 0
+
+
+def test_without_bloom_evicted_user_is_new_again():
+    users = KnownUsers(max_size=2)
+    users.remember(1), users.remember(2), users.remember(3)
+    assert users.remember(1) is True
+    assert 'bloom_fill' not in users.stats()
@@ -0,0 +1,109 @@
+# users.py
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+
+class BloomFilter:
+    """
+    Фильтр Блума для целых id: «точно не встречался» или «возможно встречался».
+      - add(key)
+      - key in filter
+      - fill_ratio() → доля установленных битов
+      - false_positive_rate() → оценка доли ложных срабатываний: fill_ratio ** hashes
+    Память — bits / 8 байт независимо от числа добавленных ключей;
+    удалить ключ нельзя. При capacity ключах заполнена примерно половина битов.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: сколько ключей рассчитываем хранить
+        :param error_rate: доля ложных «возможно встречался» при capacity ключах
+        """
+        bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.bits = bits
+        self.hashes = max(1, round(bits / capacity * math.log(2)))
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key):
+        # Двойное хеширование: k позиций из двух 64-битных половин одного blake2b
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def fill_ratio(self):
+        return bin(int.from_bytes(self._array, 'little')).count('1') / self.bits
+
+    def false_positive_rate(self):
+        return self.fill_ratio() ** self.hashes
+
+
+class KnownUsers:
+    """
+    Пользователи, уже записанные в таблицу users этим процессом, —
+    чтобы INSERT ... ON CONFLICT DO NOTHING шёл только при первой встрече.
+      - remember(user_id) → True, если пользователь новый (нужно записать в БД)
+      - forget(user_id)   — запись не удалась, при следующей встрече повторить
+      - stats() → new / known / bloom_known, size; с фильтром — bloom_fill и bloom_fp_rate
+    Точный набор ограничен max_size (давно не встречавшиеся вытесняются).
+    С bloom_capacity > 0 вытесненные из набора переходят в фильтр Блума
+    и повторно не записываются. Фильтр содержит только вытесненных, поэтому
+    пока пользователей не больше max_size, он пуст и не нужен; bloom_capacity
+    имеет смысл ставить порядка числа пользователей сверх max_size.
+    Ложное срабатывание (bloom_fp_rate, растёт выше bloom_error_rate, когда
+    вытесненных больше bloom_capacity) лишь пропускает регистрацию на пути
+    чтения — создание задачи регистрирует пользователя в том же запросе всегда.
+    """
+
+    def __init__(self, max_size=100000, bloom_capacity=0, bloom_error_rate=0.01):
+        """
+        :param max_size: сколько пользователей помнить точно
+        :param bloom_capacity: на сколько пользователей рассчитан фильтр Блума (0 — без фильтра)
+        :param bloom_error_rate: доля ложных срабатываний фильтра
+        """
+        self.max_size = max_size
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity > 0 else None
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'new': 0, 'known': 0, 'bloom_known': 0}
+
+    def remember(self, user_id):
+        with self._lock:
+            if user_id in self._users:
+                self._users.move_to_end(user_id)
+                self._stats['known'] += 1
+                return False
+            self._users[user_id] = True
+            while len(self._users) > self.max_size:
+                evicted, _ = self._users.popitem(last=False)
+                if self.bloom is not None:
+                    self.bloom.add(evicted)
+            if self.bloom is not None and user_id in self.bloom:
+                self._stats['bloom_known'] += 1
+                return False
+            self._stats['new'] += 1
+            return True
+
+    def forget(self, user_id):
+        # В фильтр попадают только вытесненные из точного набора, поэтому
+        # забытый пользователь будет записан при следующей встрече
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats, size=len(self._users))
+            if self.bloom is not None:
+                result['bloom_fill'] = self.bloom.fill_ratio()
+                result['bloom_fp_rate'] = self.bloom.false_positive_rate()
+        return result
@@ -0,0 +1,169 @@
+# webhook.py
+
+import hmac
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookServer:
+    """
+    Встроенный HTTP-сервер для приёма обновлений Telegram через webhook:
+      - проверяет путь и заголовок X-Telegram-Bot-Api-Secret-Token
+      - сразу отвечает 200, а обработку отдаёт пулу воркеров
+        (workers=0 — process_update вызывается в потоке запроса и должен
+        лишь поставить обновление в очередь; вернул False — ответ 503)
+      - при переполнении очереди отвечает 503 (Telegram повторит доставку)
+      - stats() — счётчики принятых, отклонённых и обработанных обновлений
+    """
+
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+    def __init__(self, process_update, host='0.0.0.0', port=8443, path='/webhook',
+                 secret_token='', workers=8, max_pending=1000, max_body=1024 * 1024):
+        """
+        :param process_update: функция, принимающая dict обновления
+                               (при workers=0 False в ответ — очередь переполнена)
+        :param host: адрес, на котором слушает сервер
+        :param port: порт сервера
+        :param path: путь webhook-а
+        :param secret_token: ожидаемое значение секретного заголовка ('' — не проверять)
+        :param workers: число потоков-обработчиков (0 — без пула, в потоке запроса)
+        :param max_pending: сколько обновлений может ждать обработки
+        :param max_body: максимальный размер тела запроса в байтах
+        """
+        self.process_update = process_update
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body = max_body
+
+        self._executor = None
+        if workers:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook')
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats = {
+            'accepted': 0,
+            'rejected_secret': 0,
+            'rejected_overload': 0,
+            'bad_request': 0,
+            'processed': 0,
+            'errors': 0,
+        }
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_request_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def server_address(self):
+        return self._httpd.server_address
+
+    def _inc(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _make_request_handler(self):
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, code):
+                self.send_response(code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                if self.path != server.path:
+                    return self._reply(404)
+
+                # Секретный токен сравниваем за постоянное время
+                if server.secret_token:
+                    got = self.headers.get(server.SECRET_HEADER, '')
+                    if not hmac.compare_digest(got, server.secret_token):
+                        server._inc('rejected_secret')
+                        return self._reply(403)
+
+                # Длину проверяем до чтения тела: нечисловая, отрицательная
+                # или больше max_body — 400, тело не читается
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    length = -1
+                if length <= 0 or length > server.max_body:
+                    self.close_connection = True
+                    server._inc('bad_request')
+                    return self._reply(400)
+                try:
+                    update = json.loads(self.rfile.read(length))
+                except ValueError:
+                    server._inc('bad_request')
+                    return self._reply(400)
+
+                if not server.submit(update):
+                    return self._reply(503)
+                self._reply(200)
+
+            def log_message(self, format, *args):
+                # Не пишем строку в stderr на каждый запрос
+                pass
+
+        return RequestHandler
+
+    def submit(self, update):
+        """
+        Ставит обновление в очередь обработки. False — очередь переполнена.
+        """
+        if not self._pending.acquire(blocking=False):
+            self._inc('rejected_overload')
+            return False
+        if self._executor is not None:
+            self._inc('accepted')
+            self._executor.submit(self._run, update)
+            return True
+        if self._run(update) is False:
+            self._inc('rejected_overload')
+            return False
+        self._inc('accepted')
+        return True
+
+    def _run(self, update):
+        try:
+            result = self.process_update(update)
+            if result is not False:
+                self._inc('processed')
+            return result
+        except Exception as e:
+            # Повторная доставка не поможет — отвечаем как принятому
+            self._inc('errors')
+            print(f"Ошибка при обработке обновления: {e}")
+        finally:
+            self._pending.release()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def serve_forever(self):
+        """
+        Блокирующий запуск сервера.
+        """
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self.shutdown()
+
+    def start(self):
+        """
+        Запуск сервера в фоновом потоке (для тестов и бенчмарков).
+        """
+        thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)